@@ -1,3 +1,6 @@
 # SPDX-FileCopyrightText: 2022-present ImAKappa <imaninconsp1cuouskappa@gmail.com>
 #
 # SPDX-License-Identifier: MIT
+
+from pylox.engine.program import compile, Program, CompileError
+from pylox.engine.interpreter import LoxRuntimeError, BudgetExceededError
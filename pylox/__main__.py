@@ -3,11 +3,20 @@
 Main module for running the pylox application
 """
 
+import os
+import sys
 import pylox.cli.loxcli as loxcli
 from pylox.pylox import run
 
 def main():
     args = loxcli.get_args()
-    run(args)
+    try:
+        run(args)
+    except BrokenPipeError:
+        # Output was piped into something that stopped reading, e.g. head.
+        # Point stdout at devnull so the final flush at exit doesn't fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
     
 main()
\ No newline at end of file
@@ -3,12 +3,10 @@
 Module for printing the Abstract Syntax Tree
 """
 
-# TODO: Update to handle Statements and not just Expressions
-
 from pylox.engine.loxtoken import Token, TokenType
-from pylox.engine.expr import Visitor, Expr, Binary, Grouping, Literal, Unary, Variable, Assign
+from pylox.engine.expr import Visitor, Expr, Binary, Grouping, Literal, Unary, Variable, Assign, Call
 import pylox.engine.expr as expr
-from pylox.engine.stmt import Stmt, Expression
+from pylox.engine.stmt import Stmt, Expression, Print, Var, Block, If, While, Function, Return
 import pylox.engine.stmt as stmt
 
 class AstPrinter(expr.Visitor, stmt.Visitor):
@@ -20,7 +18,7 @@ class AstPrinter(expr.Visitor, stmt.Visitor):
     def print(self, expr: Expr | Stmt):
         return expr.accept(self)
 
-    def parenthesize(self, name: str, *exprs: list[Expr]):
+    def parenthesize(self, name: str, *exprs: list[Expr | Stmt]):
         if self.rev_polish_notation:
             out = ""
             for expr in exprs:
@@ -39,6 +37,34 @@ class AstPrinter(expr.Visitor, stmt.Visitor):
     def visit_expression(self, stmt: Expression):
         return stmt.expression.accept(self)
 
+    def visit_print(self, stmt: Print):
+        return self.parenthesize("print", stmt.expression)
+
+    def visit_var(self, stmt: Var):
+        if stmt.initializer is None:
+            return self.parenthesize(f"var {stmt.name.lexeme}")
+        return self.parenthesize(f"var {stmt.name.lexeme}", stmt.initializer)
+
+    def visit_block(self, stmt: Block):
+        return self.parenthesize("block", *stmt.statements)
+
+    def visit_function(self, stmt: Function):
+        params = " ".join(param.lexeme for param in stmt.params)
+        return self.parenthesize(f"fun {stmt.name.lexeme}({params})", *stmt.body)
+
+    def visit_return(self, stmt: Return):
+        if stmt.value is None:
+            return self.parenthesize("return")
+        return self.parenthesize("return", stmt.value)
+
+    def visit_if(self, stmt: If):
+        if stmt.else_branch is None:
+            return self.parenthesize("if", stmt.condition, stmt.then_branch)
+        return self.parenthesize("if", stmt.condition, stmt.then_branch, stmt.else_branch)
+
+    def visit_while(self, stmt: While):
+        return self.parenthesize("while", stmt.condition, stmt.body)
+
     # --- expressions
 
     def visit_binary(self, expr: Binary):
@@ -48,9 +74,11 @@ class AstPrinter(expr.Visitor, stmt.Visitor):
         return self.parenthesize("group", expr.expression)
 
     def visit_literal(self, expr: Literal):
+        if expr.folded:
+            return self.parenthesize(f"folded {self.visit_literal(Literal(expr.value))}")
         if isinstance(expr.value, bool):
             return f"'{str(expr.value).lower()}'"
-        if expr.value:
+        if expr.value is not None:
             return f"'{expr.value}'"
         return "'nil'"
 
@@ -63,6 +91,9 @@ class AstPrinter(expr.Visitor, stmt.Visitor):
     def visit_assign(self, expr: Assign):
         return self.parenthesize("=", expr.value)
 
+    def visit_call(self, expr: Call):
+        return self.parenthesize(f"call {expr.callee.accept(self)}", *expr.arguments)
+
 if __name__ == "__main__":
     expression: Expr = Binary(
         Unary(Token(TokenType.MINUS, "-", None, 1), Literal(123)),
@@ -0,0 +1,137 @@
+"""batch.py
+
+Module for running many Lox scripts in one go, across a pool of worker processes.
+Every script gets a fresh Lox instance (and so a fresh Interpreter) and its output captured,
+and comes back as a BatchResult with its exit code and timing
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import io
+import json
+import os
+import time
+import traceback
+from rich.console import Console
+from rich.table import Table
+from pylox.engine.lox import Lox
+
+# Exit codes, as set by Lox.run_file, plus the ones only a batch can have
+STATUSES = {
+    0: "ok",
+    1: "crashed",
+    65: "error",
+    66: "missing",
+    70: "runtime error",
+}
+
+@dataclass
+class BatchOptions:
+    """Options every script runs with, the same as the single-script flags"""
+    engine: str = "tree"
+    optimise: bool = True
+    quicken: bool = True
+    intern_strings: bool = False
+    scanner: str = "fast"
+    stream: bool = False
+    cache: bool = False
+    max_steps: int | None = None
+    timeout: float | None = None
+
+@dataclass
+class BatchResult:
+    path: str
+    exit_code: int
+    seconds: float
+    stdout: str
+    stderr: str
+
+    @property
+    def status(self) -> str:
+        return STATUSES.get(self.exit_code, f"exit {self.exit_code}")
+
+def collect(paths: list[Path]) -> list[Path]:
+    """Scripts to run: files as given, and every .lox file under a directory, in order.
+    Missing paths are kept, so they get reported
+    """
+    scripts = []
+    for path in paths:
+        if path.is_dir():
+            scripts.extend(sorted(path.rglob("*.lox")))
+        else:
+            scripts.append(path)
+    return scripts
+
+def run_script(path: Path, options: BatchOptions) -> BatchResult:
+    """Runs one script in a fresh Lox instance. Runs in a worker process, so it must never raise"""
+    if not path.is_file():
+        return BatchResult(str(path), 66, 0.0, "", f"[Error] Could not find file: '{path}'\n")
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            Lox(**asdict(options)).run_file(path)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            # A bug in pylox (or e.g. a RecursionError) fails this script only
+            traceback.print_exc()
+            exit_code = 1
+    seconds = time.perf_counter() - start
+    return BatchResult(str(path), exit_code, seconds, stdout.getvalue(), stderr.getvalue())
+
+def run_batch(paths: list[Path], options: BatchOptions, jobs: int | None = None) -> list[BatchResult]:
+    """Runs the scripts, in order of the results, on jobs worker processes (default: one per core).
+    With a single job, scripts run one after the other in this process
+    """
+    scripts = collect(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(scripts) <= 1:
+        return [run_script(script, options) for script in scripts]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(scripts))) as pool:
+        return list(pool.map(run_script, scripts, [options] * len(scripts)))
+
+def exit_code(results: list[BatchResult]) -> int:
+    """0 if every script succeeded, otherwise the highest exit code, so runtime errors (70) outrank static ones (65)"""
+    return max((result.exit_code for result in results), default=0)
+
+def write_report(path: Path, results: list[BatchResult], options: BatchOptions, jobs: int | None) -> None:
+    report = {
+        "options": asdict(options),
+        "jobs": jobs,
+        "results": [asdict(result) for result in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with io.open(path, mode="w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+def print_results(results: list[BatchResult], elapsed: float, console: Console) -> None:
+    failed = sum(1 for result in results if result.exit_code != 0)
+    table = Table(title=f"pylox batch: {len(results)} scripts, {failed} failed, {elapsed:.2f}s")
+    table.add_column("script")
+    table.add_column("status")
+    table.add_column("exit", justify="right")
+    table.add_column("time (s)", justify="right")
+    for result in results:
+        status = result.status if result.exit_code == 0 else f"[red]{result.status}[/red]"
+        table.add_row(result.path, status, str(result.exit_code), f"{result.seconds:.4f}")
+    console.print(table)
+
+def run_batch_command(paths: list[Path], options: BatchOptions, jobs: int | None = None, report: Path | None = None, console: Console | None = None) -> int:
+    """Runs the scripts, prints a summary and optionally writes every result (with its output) as JSON.
+    Returns the exit code for the whole batch
+    """
+    console = Console() if console is None else console
+    start = time.perf_counter()
+    results = run_batch(paths, options, jobs)
+    elapsed = time.perf_counter() - start
+
+    if report is not None:
+        write_report(report, results, options, jobs)
+    print_results(results, elapsed, console)
+    return exit_code(results)
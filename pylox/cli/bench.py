@@ -0,0 +1,298 @@
+"""bench.py
+
+Module for benchmarking the interpreter against the Lox scripts in tests/samples/benchmark
+"""
+
+from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from rich.console import Console
+from rich.table import Table
+from pylox.__about__ import __version__
+from pylox.engine.errors import Error
+from pylox.engine.lox import Lox, SCANNERS
+from pylox.engine.loxparser import Parser
+from pylox.engine.instrumentation import count_nodes
+from pylox.cli.loxcli import SAMPLES_DIR, BENCHMARK_DIR
+
+@dataclass
+class BenchResult:
+    name: str
+    status: str
+    timings: list[float] = field(default_factory=list)
+    median: float | None = None
+    stdev: float | None = None
+    baseline: float | None = None
+
+    @property
+    def ratio(self) -> float | None:
+        """Median time relative to the baseline median (> 1.0 is slower)"""
+        if self.median is None or not self.baseline:
+            return None
+        return self.median / self.baseline
+
+@dataclass
+class BenchOptions:
+    directory: Path = BENCHMARK_DIR
+    warmup: int = 1
+    runs: int = 5
+    filter: str | None = None
+    output: Path | None = None
+    baseline: Path | None = None
+    threshold: float = 1.10
+    engine: str = "tree"
+    quicken: bool = True
+    intern_strings: bool = False
+    # Run under a Budget, to measure what enforcing it costs
+    max_steps: int | None = None
+    timeout: float | None = None
+
+def run_once(source: str, engine: str = "tree", max_steps: int | None = None, timeout: float | None = None, quicken: bool = True, intern_strings: bool = False) -> tuple[float, str]:
+    """Runs a script in a fresh interpreter, returning the elapsed time and exit status.
+    Anything the script prints is discarded so console rendering doesn't skew the timings.
+    """
+    lox = Lox(engine, max_steps=max_steps, timeout=timeout, quicken=quicken, intern_strings=intern_strings)
+    sink = io.StringIO()
+    with redirect_stdout(sink), redirect_stderr(sink):
+        start = time.perf_counter()
+        lox.run(source)
+        elapsed = time.perf_counter() - start
+
+    if lox.had_error: return elapsed, "error"
+    if lox.had_runtime_error: return elapsed, "runtime error"
+    return elapsed, "ok"
+
+def bench_script(script: Path, options: BenchOptions) -> BenchResult:
+    source = script.read_text(encoding="utf-8")
+    result = BenchResult(script.stem, "ok")
+
+    for _ in range(options.warmup):
+        _, result.status = run_once(source, options.engine, options.max_steps, options.timeout, options.quicken, options.intern_strings)
+        if result.status != "ok":
+            return result
+
+    for _ in range(options.runs):
+        elapsed, result.status = run_once(source, options.engine, options.max_steps, options.timeout, options.quicken, options.intern_strings)
+        if result.status != "ok":
+            return result
+        result.timings.append(elapsed)
+
+    result.median = statistics.median(result.timings)
+    result.stdev = statistics.stdev(result.timings) if len(result.timings) > 1 else 0.0
+    return result
+
+def load_baseline(path: Path) -> dict[str, float]:
+    with io.open(path, mode="r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {
+        name: result["median"]
+        for name, result in report["results"].items()
+        if result["median"] is not None
+    }
+
+def write_report(path: Path, results: list[BenchResult], options: BenchOptions) -> None:
+    report = {
+        "pylox": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "warmup": options.warmup,
+        "runs": options.runs,
+        "engine": options.engine,
+        "quicken": options.quicken,
+        "intern_strings": options.intern_strings,
+        "max_steps": options.max_steps,
+        "timeout": options.timeout,
+        "results": {result.name: asdict(result) for result in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with io.open(path, mode="w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+def print_results(results: list[BenchResult], options: BenchOptions, console: Console) -> None:
+    table = Table(title=f"pylox benchmarks ({options.engine})")
+    table.add_column("benchmark")
+    table.add_column("status")
+    table.add_column("median (s)", justify="right")
+    table.add_column("stdev (s)", justify="right")
+    table.add_column("vs baseline", justify="right")
+
+    for result in results:
+        median = "-" if result.median is None else f"{result.median:.4f}"
+        stdev = "-" if result.stdev is None else f"{result.stdev:.4f}"
+        ratio = result.ratio
+        if ratio is None:
+            change = "-"
+        elif ratio > options.threshold:
+            change = f"[red]{ratio:.2f}x[/red]"
+        else:
+            change = f"[green]{ratio:.2f}x[/green]"
+        table.add_row(result.name, result.status, median, stdev, change)
+
+    console.print(table)
+
+def run_benchmarks(options: BenchOptions, console: Console | None = None) -> list[BenchResult]:
+    """Runs every benchmark script, then reports and compares the results with the baseline.
+    If the baseline file doesn't exist yet, the results are saved as the new baseline.
+    """
+    console = Console() if console is None else console
+    scripts = sorted(options.directory.glob("*.lox"))
+    if options.filter:
+        scripts = [script for script in scripts if options.filter in script.stem]
+
+    results = [bench_script(script, options) for script in scripts]
+
+    if options.baseline and options.baseline.exists():
+        baseline = load_baseline(options.baseline)
+        for result in results:
+            result.baseline = baseline.get(result.name)
+    elif options.baseline:
+        write_report(options.baseline, results, options)
+        console.print(f"Saved new baseline: '{options.baseline}'")
+
+    if options.output:
+        write_report(options.output, results, options)
+
+    print_results(results, options, console)
+    return results
+
+def regressions(results: list[BenchResult], threshold: float) -> list[BenchResult]:
+    return [result for result in results if result.ratio is not None and result.ratio > threshold]
+
+def scanner_throughput(scanner: str, sources: list[str], runs: int) -> float:
+    """Best-of-runs scanning speed over all sources, in MB/s of UTF-8 source"""
+    size = sum(len(source.encode("utf-8")) for source in sources)
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        for source in sources:
+            try:
+                SCANNERS[scanner](source).scan_tokens()
+            except Error:
+                pass
+        best = min(best, time.perf_counter() - start)
+    return size / best / 1e6
+
+def run_scanner_benchmark(runs: int = 5, directory: Path = SAMPLES_DIR, console: Console | None = None) -> dict[str, float]:
+    """Scans every sample script with each scanner and reports the throughput"""
+    console = Console() if console is None else console
+    sources = [path.read_text(encoding="utf-8") for path in sorted(directory.rglob("*.lox"))]
+    results = {scanner: scanner_throughput(scanner, sources, runs) for scanner in SCANNERS}
+
+    table = Table(title=f"Scanner throughput ({len(sources)} files)")
+    table.add_column("scanner")
+    table.add_column("MB/s", justify="right")
+    for scanner, throughput in results.items():
+        table.add_row(scanner, f"{throughput:.2f}")
+    console.print(table)
+    return results
+
+def memory_footprint(sources: list[str], scanner: str = "fast") -> tuple[float, float]:
+    """Average bytes allocated per token (scanning) and per AST node (parsing), measured with tracemalloc.
+    Sources that don't scan or parse are skipped.
+    Tokens materialised by a token buffer during parsing count towards the nodes
+    """
+    token_bytes = node_bytes = tokens = nodes = 0
+    for source in sources:
+        tracemalloc.start()
+        try:
+            scanned = SCANNERS[scanner](source).scan_tokens()
+            scanned_bytes, _ = tracemalloc.get_traced_memory()
+            statements = Parser(scanned, repl_mode=False).parse()
+            parsed_bytes, _ = tracemalloc.get_traced_memory()
+        except Error:
+            continue
+        finally:
+            tracemalloc.stop()
+        token_bytes += scanned_bytes
+        node_bytes += parsed_bytes - scanned_bytes
+        tokens += len(scanned)
+        nodes += count_nodes(statements)
+    return token_bytes / tokens, node_bytes / nodes
+
+def run_memory_benchmark(directory: Path = SAMPLES_DIR, console: Console | None = None) -> dict[str, tuple[float, float]]:
+    """Reports the memory cost of tokens and AST nodes over every sample script, for each scanner"""
+    console = Console() if console is None else console
+    sources = [path.read_text(encoding="utf-8") for path in sorted(directory.rglob("*.lox"))]
+    results = {scanner: memory_footprint(sources, scanner) for scanner in SCANNERS}
+
+    table = Table(title=f"Memory footprint ({len(sources)} files)")
+    table.add_column("scanner")
+    table.add_column("bytes/token", justify="right")
+    table.add_column("bytes/node", justify="right")
+    for scanner, (per_token, per_node) in results.items():
+        table.add_row(scanner, f"{per_token:.1f}", f"{per_node:.1f}")
+    console.print(table)
+    return results
+
+# Modules a plain script run must not import: Rich, the harnesses and what only some commands need.
+# Each of them used to be imported on every start
+LAZY_MODULES = (
+    "rich",
+    "multiprocessing",
+    "concurrent.futures",
+    "tempfile",
+    "pylox.cli.bench",
+    "pylox.cli.batch",
+    "pylox.cli.programinfo",
+    "pylox.engine.transpiler",
+)
+
+def startup_commands(script: Path) -> dict[str, list[str]]:
+    """Commands timed by the startup benchmark: the bare interpreter, importing pylox, and running a script"""
+    return {
+        "python": [sys.executable, "-c", "pass"],
+        "import pylox": [sys.executable, "-c", "import pylox"],
+        "pylox --src": [sys.executable, "-m", "pylox", "--src", str(script)],
+    }
+
+def startup_time(command: list[str], runs: int) -> tuple[float, float]:
+    """Median and best wall time of a fresh process running the command, in seconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+def eager_imports(command: list[str]) -> list[str]:
+    """Modules in LAZY_MODULES (or inside them) that the command imports, according to -X importtime"""
+    process = subprocess.run([command[0], "-X", "importtime", *command[1:]], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in process.stderr.splitlines() if line.startswith("import time:")}
+    return sorted(
+        module for module in imported
+        if any(module == lazy or module.startswith(f"{lazy}.") for lazy in LAZY_MODULES)
+    )
+
+def run_startup_benchmark(runs: int = 5, console: Console | None = None) -> tuple[dict[str, tuple[float, float]], list[str]]:
+    """Times fresh processes running a one-line script, and lists the modules it imported but shouldn't have"""
+    console = Console() if console is None else console
+    with tempfile.TemporaryDirectory() as directory:
+        script = write_startup_script(Path(directory))
+        commands = startup_commands(script)
+        results = {name: startup_time(command, runs) for name, command in commands.items()}
+        eager = eager_imports(commands["pylox --src"])
+
+    table = Table(title=f"Startup time ({runs} runs)")
+    table.add_column("command")
+    table.add_column("median (ms)", justify="right")
+    table.add_column("best (ms)", justify="right")
+    for name, (median, best) in results.items():
+        table.add_row(name, f"{median * 1000:.1f}", f"{best * 1000:.1f}")
+    console.print(table)
+    if eager:
+        console.print(f"[red]Imported on startup, but should be lazy:[/red] {', '.join(eager)}")
+    return results, eager
+
+def write_startup_script(directory: Path) -> Path:
+    script = directory / "tiny.lox"
+    script.write_text('print "hello";\n', encoding="utf-8")
+    return script
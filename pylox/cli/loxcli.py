@@ -8,6 +8,10 @@ import argparse
 from pathlib import Path
 import logging
 
+# Kept here rather than in bench, so parsing arguments doesn't import the benchmark harness (and Rich)
+SAMPLES_DIR = Path(__file__).resolve().parents[2] / "tests" / "samples"
+BENCHMARK_DIR = SAMPLES_DIR / "benchmark"
+
 def toggle_debug(debug_on: bool):
     """Toggles the verbosity of the interpreter logs"""
     for logger in logging.root.manager.loggerDict.values():
@@ -23,12 +27,112 @@ class Args:
     src: Path | None
     debug: bool
     rpolish: bool
+    engine: str = "tree"
+    compile: bool = False
+    optimise: bool = True
+    quicken: bool = True
+    intern_strings: bool = False
+    scanner: str = "fast"
+    stream: bool = False
+    timings: bool = False
+    colour: bool = False
+    cache: bool = False
+    profile: bool = False
+    profile_output: Path | None = None
+    max_steps: int | None = None
+    timeout: float | None = None
+    output: Path | None = None
+    bench: Path | None = None
+    bench_warmup: int = 1
+    bench_runs: int = 5
+    bench_filter: str | None = None
+    bench_output: Path | None = None
+    bench_baseline: Path | None = None
+    bench_scanner: bool = False
+    bench_memory: bool = False
+    bench_startup: bool = False
+    batch: list[Path] | None = None
+    jobs: int | None = None
+    batch_report: Path | None = None
 
 def get_args() -> Args:
     """Handles the various cli arguments"""
     parser = argparse.ArgumentParser()
-    parser.add_argument("-s", "--src", help="path to source file", type=Path, default=None)
+    parser.add_argument("-s", "--src", help="path to source file; several files or directories run as a batch", type=Path, nargs="+", default=None)
     parser.add_argument("--debug", help="switch to debug mode", action="store_true", default=False)
     parser.add_argument("--rpolish", help="ast prints using Reverse Polish Notation", action="store_true", default=False)
+    parser.add_argument("--engine", help="execution backend: tree-walking interpreter, bytecode VM or compiled closures", choices=["tree", "vm", "closure"], default="tree")
+    parser.add_argument("--scanner", help="lexer: regex-based, regex-based into an array-backed token buffer, or character-by-character", choices=["fast", "buffer", "classic"], default="fast")
+    parser.add_argument("--stream", help="scan tokens lazily as the parser consumes them, instead of all up front", action="store_true", default=False)
+    parser.add_argument("--timings", help="report wall time per phase and counters (tokens, nodes, environments, statements) on stderr", action="store_true", default=False)
+    parser.add_argument("--colour", help="colourise printed values with Rich, as the REPL does (slower)", action="store_true", default=False)
+    parser.add_argument("--cache", help="read and write resolved programs in __loxcache__ (ignored with --max-steps or --timeout)", action="store_true", default=False)
+    parser.add_argument("--no-optimise", help="skip constant folding and dead-branch pruning", dest="optimise", action="store_false", default=True)
+    parser.add_argument("--no-quicken", help="don't specialise arithmetic nodes for the operand types they see (tree engine)", dest="quicken", action="store_false", default=True)
+    parser.add_argument("--intern-strings", help="intern the results of string concatenation, so equal strings compare by identity", action="store_true", default=False)
+    parser.add_argument("--compile", help="translate the source file into a Python module instead of running it", action="store_true", default=False)
+    parser.add_argument("-o", "--output", help="path of the Python module written by --compile (default: <src>_lox.py)", type=Path, default=None)
+    profile = parser.add_argument_group("profiling")
+    profile.add_argument("--profile", help="report hit counts and time per Lox source line on stderr", action="store_true", default=False)
+    profile.add_argument("--profile-output", help="also write the profile as collapsed stacks (flamegraph.pl, speedscope) to this file", type=Path, default=None)
+    limits = parser.add_argument_group("limits")
+    limits.add_argument("--max-steps", help="abort with a runtime error after this many loop iterations and block entries", type=int, default=None)
+    limits.add_argument("--timeout", help="abort with a runtime error after this many seconds of execution", type=float, default=None)
+    batch = parser.add_argument_group("batch")
+    batch.add_argument("--jobs", help="worker processes for a batch of scripts (default: one per core); implies a batch", type=int, default=None)
+    batch.add_argument("--batch-report", help="write every script's exit code, time and output as JSON to this file", type=Path, default=None)
+    bench = parser.add_argument_group("benchmarks")
+    bench.add_argument("--bench", help="run the benchmark scripts (default: tests/samples/benchmark)", type=Path, nargs="?", const=BENCHMARK_DIR, default=None)
+    bench.add_argument("--bench-warmup", help="untimed runs per script", type=int, default=1)
+    bench.add_argument("--bench-runs", help="timed runs per script", type=int, default=5)
+    bench.add_argument("--bench-filter", help="only run scripts whose name contains this text", default=None)
+    bench.add_argument("--bench-output", help="write the results as JSON to this file", type=Path, default=None)
+    bench.add_argument("--bench-baseline", help="compare against this JSON baseline (created if missing)", type=Path, default=None)
+    bench.add_argument("--bench-scanner", help="measure scanner throughput (MB/s) on the sample scripts instead", action="store_true", default=False)
+    bench.add_argument("--bench-memory", help="measure bytes per token and per AST node on the sample scripts instead", action="store_true", default=False)
+    bench.add_argument("--bench-startup", help="time fresh processes running a one-line script, and fail if it imports modules that should be lazy", action="store_true", default=False)
     args = parser.parse_args()
-    return Args(args.src, args.debug, args.rpolish)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    # One file runs as before; several files, a directory or --jobs make a batch
+    src, batch = None, None
+    if args.src and (len(args.src) > 1 or args.src[0].is_dir() or args.jobs is not None or args.batch_report is not None):
+        batch = args.src
+        if args.compile:
+            parser.error("--compile takes a single source file")
+    elif args.src:
+        src = args.src[0]
+    if args.max_steps is not None and args.max_steps < 0:
+        parser.error("--max-steps must not be negative")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    return Args(
+        src, args.debug, args.rpolish,
+        engine=args.engine,
+        compile=args.compile,
+        optimise=args.optimise,
+        quicken=args.quicken,
+        intern_strings=args.intern_strings,
+        scanner=args.scanner,
+        stream=args.stream,
+        timings=args.timings,
+        colour=args.colour,
+        cache=args.cache,
+        profile=args.profile,
+        profile_output=args.profile_output,
+        max_steps=args.max_steps,
+        timeout=args.timeout,
+        output=args.output,
+        bench=args.bench,
+        bench_warmup=args.bench_warmup,
+        bench_runs=args.bench_runs,
+        bench_filter=args.bench_filter,
+        bench_output=args.bench_output,
+        bench_baseline=args.bench_baseline,
+        bench_scanner=args.bench_scanner,
+        bench_memory=args.bench_memory,
+        bench_startup=args.bench_startup,
+        batch=batch,
+        jobs=args.jobs,
+        batch_report=args.batch_report,
+    )
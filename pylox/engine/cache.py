@@ -0,0 +1,188 @@
+"""cache.py
+
+Module for the on-disk cache of resolved (and optimised) programs, Lox's take on .pyc files.
+Programs are written into a __loxcache__ directory next to the script, behind a header holding
+a hash of everything that went into them, so repeated runs of an unchanged script skip scanning,
+parsing, optimising and resolving altogether.
+Anyone who can write to that directory can also compute the header, so entries are plain JSON data that
+can only be decoded back into AST nodes and tokens (never pickles, which can run code when loaded)
+"""
+
+from dataclasses import fields
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+import sys
+from types import NoneType, UnionType
+from typing import get_args, get_origin
+# logs
+from pylox.utils import new_logger
+logger = new_logger(__name__)
+# app
+from pylox.__about__ import __version__
+from pylox.engine.loxtoken import Token, TokenType
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+
+CACHE_DIR = "__loxcache__"
+MAGIC = b"LOXJ"
+
+def node_classes() -> dict[str, type]:
+    # From the modules rather than __subclasses__(), which also lists the classes @dataclass(slots=True)
+    # replaced until they're garbage collected
+    return {
+        name: value
+        for module, base in ((expr, expr.Expr), (stmt, stmt.Stmt))
+        for name, value in vars(module).items()
+        if isinstance(value, type) and issubclass(value, base) and value is not base
+    }
+
+# The only classes an entry can be decoded into, by name. Quickened nodes are subclasses of these, encoded as them
+NODES = node_classes()
+
+def node_fields(cls: type) -> tuple[str, ...]:
+    # Inline caches and kept environments (compare=False) belong to an interpreter, so they aren't stored
+    return tuple(field.name for field in fields(cls) if field.compare)
+
+FIELDS = {name: node_fields(cls) for name, cls in NODES.items()}
+TYPES = {name: tuple(field.type for field in fields(cls) if field.compare) for name, cls in NODES.items()}
+
+# What a literal can hold: the only fields annotated as object are literal values
+VALUES = (NoneType, bool, float, str)
+
+def conforms(value: object, annotation: object) -> bool:
+    """Whether value has the type a node field is annotated with, down to the items of lists and frozensets"""
+    origin = get_origin(annotation)
+    if origin is UnionType:
+        return any(conforms(value, option) for option in get_args(annotation))
+    if origin in (list, frozenset):
+        item = get_args(annotation)[0]
+        return isinstance(value, origin) and all(conforms(element, item) for element in value)
+    if annotation is object:
+        return isinstance(value, VALUES)
+    return isinstance(value, annotation)
+
+def encode(value: object) -> object:
+    """value as JSON data: containers, tokens and nodes become lists tagged with what they were"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Token):
+        return ["Token", value.tokentype.name, value.lexeme, encode(value.literal), value.line]
+    if isinstance(value, list):
+        return ["list", [encode(item) for item in value]]
+    if isinstance(value, frozenset):
+        return ["frozenset", sorted(value)]
+    if isinstance(value, (expr.Expr, stmt.Stmt)):
+        name = value.GENERIC.__name__ if hasattr(value, "GENERIC") else type(value).__name__
+        return [name] + [encode(getattr(value, field)) for field in FIELDS[name]]
+    raise TypeError(f"Can't cache a {type(value).__name__}")
+
+def decode(data: object) -> object:
+    """The value encode() turned into data. Raises ValueError for anything encode() couldn't have written,
+    including nodes whose fields don't have the types they're annotated with, which would only fail once run.
+    Strings are interned, as the scanners intern identifiers, keywords and string literals
+    """
+    if isinstance(data, str):
+        return sys.intern(data)
+    if data is None or isinstance(data, (bool, int, float)):
+        return data
+    if not isinstance(data, list) or not data or not isinstance(data[0], str):
+        raise ValueError("malformed cache entry")
+    tag, arguments = data[0], data[1:]
+    if tag == "Token":
+        tokentype, lexeme, literal, line = arguments
+        literal = decode(literal)
+        if not isinstance(tokentype, str) or tokentype not in TokenType.__members__:
+            raise ValueError(f"unknown token type in cache entry: {tokentype}")
+        if not isinstance(lexeme, str) or not isinstance(literal, VALUES) or not isinstance(line, int):
+            raise ValueError("malformed token in cache entry")
+        return Token(TokenType[tokentype], sys.intern(lexeme), literal, line)
+    if tag in ("list", "frozenset"):
+        if len(arguments) != 1 or not isinstance(arguments[0], list):
+            raise ValueError(f"malformed {tag} in cache entry")
+        if tag == "frozenset" and not all(isinstance(item, int) for item in arguments[0]):
+            raise ValueError(f"malformed {tag} in cache entry")
+        return [decode(item) for item in arguments[0]] if tag == "list" else frozenset(arguments[0])
+    cls = NODES.get(tag)
+    if cls is None or len(arguments) != len(FIELDS[tag]):
+        raise ValueError(f"unknown node in cache entry: {tag}")
+    values = [decode(argument) for argument in arguments]
+    for name, value, annotation in zip(FIELDS[tag], values, TYPES[tag]):
+        if not conforms(value, annotation):
+            raise ValueError(f"{tag}.{name} in cache entry is a {type(value).__name__}")
+    return cls(*values)
+
+def fingerprint() -> bytes:
+    """Everything besides the source that decides whether a cached program can be reused:
+    the pylox and Python versions, and the shape of every AST node class
+    """
+    nodes = sorted((name, tuple(field.name for field in fields(cls))) for name, cls in NODES.items())
+    return repr((__version__, sys.version_info[:2], nodes)).encode("utf-8")
+
+class ProgramCache:
+    """Loads and stores resolved programs, counting hits and misses.
+    A cache that can't be read or written is treated as a miss; it never stops a script from running
+    """
+
+    def __init__(self):
+        self.fingerprint = fingerprint()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, file: Path, optimise: bool) -> Path:
+        # The options that change the program get their own file, so switching back and forth doesn't thrash
+        tag = "opt" if optimise else "noopt"
+        return file.parent / CACHE_DIR / f"{file.stem}.{tag}.loxc"
+
+    def key(self, source: str, optimise: bool) -> bytes:
+        digest = hashlib.sha256(self.fingerprint)
+        digest.update(b"optimise" if optimise else b"no-optimise")
+        digest.update(source.encode("utf-8"))
+        return digest.digest()
+
+    def load(self, file: Path, source: str, optimise: bool) -> list[stmt.Stmt] | None:
+        """The cached program for this source, or None on a miss"""
+        path = self.path(file, optimise)
+        header = MAGIC + self.key(source, optimise)
+        try:
+            with io.open(path, mode="rb") as f:
+                if f.read(len(header)) != header:
+                    raise ValueError("stale cache entry")
+                statements = decode(json.loads(f.read()))
+            if not isinstance(statements, list) or not all(isinstance(statement, stmt.Stmt) for statement in statements):
+                raise ValueError("not a program")
+        except Exception as e:
+            # Missing, stale, truncated or otherwise unreadable: all the same to the caller
+            logger.debug(f"Cache miss for '{file}': {e}")
+            self.misses += 1
+            return None
+
+        logger.debug(f"Cache hit for '{file}'")
+        self.hits += 1
+        return statements
+
+    def store(self, file: Path, source: str, optimise: bool, statements: list[stmt.Stmt]) -> None:
+        """Writes the program to a temporary file, then moves it into place,
+        so a concurrent run never sees a half-written entry
+        """
+        path = self.path(file, optimise)
+        header = MAGIC + self.key(source, optimise)
+        # Only a miss writes an entry, so warm runs don't import tempfile
+        import tempfile
+        try:
+            path.parent.mkdir(exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        except OSError as e:
+            logger.debug(f"Not caching '{file}': {e}")
+            return
+
+        try:
+            with os.fdopen(fd, mode="wb") as f:
+                f.write(header)
+                f.write(json.dumps(encode(statements), separators=(",", ":")).encode("utf-8"))
+            os.replace(temp, path)
+        except (OSError, RecursionError, TypeError, ValueError) as e:
+            logger.debug(f"Not caching '{file}': {e}")
+            os.unlink(temp)
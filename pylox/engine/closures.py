@@ -0,0 +1,494 @@
+"""closures.py
+
+Module for the closure-compiling engine: the resolved AST is walked once and turned into
+a tree of specialised Python closures, which then run without any visitor dispatch
+"""
+
+from typing import Callable
+# app
+from pylox.engine.loxtoken import Token, TokenType
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+from pylox.engine.stmt import Block
+from pylox.engine.environment import Environment, LocalEnvironment, BindingError, UninitializedError
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.loxfunction import LoxFunction, FRAMES_MAX, RETURN, call_stack
+from pylox.engine.interpreter import Interpreter, LoxRuntimeError
+from pylox.engine.vectors import Vector, NativeError, has_vector
+from pylox.engine.ropes import STRINGS, concatenate
+
+# A compiled expression takes the current environment and returns a value,
+# a compiled statement takes the current environment and returns RETURN if a return statement ran in it
+Closure = Callable[[Environment | LocalEnvironment], object]
+
+class CompiledFunction(LoxFunction):
+    """A LoxFunction whose body has been compiled to closures"""
+
+    __slots__ = ("body",)
+
+    def __init__(self, declaration: stmt.Function, closure, body: tuple[Closure, ...]):
+        super().__init__(declaration, closure)
+        self.body = body
+
+class ClosureCompiler(expr.Visitor, stmt.Visitor):
+    """Compiles statements annotated by the Resolver into closures"""
+
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        # Return statements compiled so far, so statements that can't return don't check for RETURN
+        self.returns = 0
+
+    def compile(self, node: expr.Expr | stmt.Stmt) -> Closure:
+        compiled = node.accept(self)
+        if not isinstance(node, stmt.Stmt):
+            return compiled
+
+        profiler = self.interpreter.profiler
+        if profiler is not None and not isinstance(node, stmt.Block):
+            compiled = profiler.timed(compiled, profiler.line(node))
+
+        timings = self.interpreter.timings
+        if timings is None:
+            return compiled
+
+        # Instrumented: wrap every statement so it gets counted
+        def counted(env):
+            timings.statements += 1
+            return compiled(env)
+        return counted
+
+    def sequence(self, statements: tuple[Closure, ...], returning: bool) -> Closure:
+        """Runs statements one after the other in the same environment. When returning, stops at a return statement"""
+        if len(statements) == 1:
+            return statements[0]
+
+        if returning:
+            def returning_sequence(env):
+                for statement in statements:
+                    if statement(env) is RETURN:
+                        return RETURN
+            return returning_sequence
+
+        def sequence(env):
+            for statement in statements:
+                statement(env)
+        return sequence
+
+    # --- Statements
+
+    def visit_expression(self, stmt: stmt.Expression) -> Closure:
+        expression = self.compile(stmt.expression)
+        if not self.interpreter.repl_mode:
+            return expression
+
+        write = self.interpreter.output.write
+
+        def expression_stmt(env):
+            write(expression(env))
+        return expression_stmt
+
+    def visit_print(self, stmt: stmt.Print) -> Closure:
+        expression = self.compile(stmt.expression)
+        write = self.interpreter.output.write
+
+        def print_stmt(env):
+            write(expression(env))
+        return print_stmt
+
+    def visit_var(self, stmt: stmt.Var) -> Closure:
+        initializer = None if stmt.initializer is None else self.compile(stmt.initializer)
+        slot = stmt.slot
+
+        if slot is None:
+            define = self.interpreter.globals.define
+            lexeme = stmt.name.lexeme
+            if initializer is None:
+                return lambda env: define(lexeme, None)
+            return lambda env: define(lexeme, initializer(env))
+
+        def var_stmt(env):
+            env.values[slot] = None if initializer is None else initializer(env)
+        return var_stmt
+
+    def visit_block(self, stmt: stmt.Block) -> Closure:
+        returns = self.returns
+        statements = tuple(self.compile(statement) for statement in stmt.statements)
+        size = stmt.size
+        timings = self.interpreter.timings
+
+        if not size:
+            # Runs in the enclosing environment
+            block = self.sequence(statements, self.returns > returns)
+        elif stmt.reused:
+            body = self.sequence(statements, self.returns > returns)
+            kept = None
+
+            def reused_block(env):
+                nonlocal kept
+                if kept is None or kept.enclosing is not env:
+                    kept = LocalEnvironment(env, size)
+                    if timings is not None:
+                        timings.environments += 1
+                return body(kept)
+            block = reused_block
+        else:
+            def block(env):
+                inner = LocalEnvironment(env, size)
+                for statement in statements:
+                    statement(inner)
+
+            if self.returns > returns:
+                def returning_block(env):
+                    inner = LocalEnvironment(env, size)
+                    for statement in statements:
+                        if statement(inner) is RETURN:
+                            return RETURN
+                block = returning_block
+
+            if timings is not None:
+                uncounted = block
+
+                def counted_block(env):
+                    timings.environments += 1
+                    return uncounted(env)
+                block = counted_block
+
+        budget = self.interpreter.budget
+        if budget is None:
+            return block
+
+        charge = budget.charge
+        where = budget.line(stmt)
+
+        def limited_block(env):
+            charge(where)
+            return block(env)
+        return limited_block
+
+    def visit_if(self, stmt: stmt.If) -> Closure:
+        condition = self.compile(stmt.condition)
+        then_branch = self.compile(stmt.then_branch)
+        is_truthy = self.interpreter.is_truthy
+
+        if stmt.else_branch is None:
+            def if_stmt(env):
+                if is_truthy(condition(env)):
+                    return then_branch(env)
+            return if_stmt
+
+        else_branch = self.compile(stmt.else_branch)
+
+        def if_else_stmt(env):
+            if is_truthy(condition(env)):
+                return then_branch(env)
+            return else_branch(env)
+        return if_else_stmt
+
+    def visit_while(self, stmt: stmt.While) -> Closure:
+        returns = self.returns
+        condition = self.compile(stmt.condition)
+        body = self.compile(stmt.body)
+        is_truthy = self.interpreter.is_truthy
+        returning = self.returns > returns
+
+        budget = self.interpreter.budget
+        # When the body is a block, entering it charges the iteration
+        if budget is not None and not isinstance(stmt.body, Block):
+            charge = budget.charge
+            where = budget.line(stmt)
+
+            def limited_while(env):
+                while is_truthy(condition(env)):
+                    charge(where)
+                    if body(env) is RETURN:
+                        return RETURN
+            return limited_while
+
+        if returning:
+            def returning_while(env):
+                while is_truthy(condition(env)):
+                    if body(env) is RETURN:
+                        return RETURN
+            return returning_while
+
+        def while_stmt(env):
+            while is_truthy(condition(env)):
+                body(env)
+        return while_stmt
+
+    def visit_function(self, stmt: stmt.Function) -> Closure:
+        body = tuple(self.compile(statement) for statement in stmt.body)
+        slot = stmt.slot
+
+        if slot is None:
+            define = self.interpreter.globals.define
+            lexeme = stmt.name.lexeme
+            return lambda env: define(lexeme, CompiledFunction(stmt, env, body))
+
+        def function_stmt(env):
+            env.values[slot] = CompiledFunction(stmt, env, body)
+        return function_stmt
+
+    def visit_return(self, stmt: stmt.Return) -> Closure:
+        self.returns += 1
+        value = None if stmt.value is None else self.compile(stmt.value)
+        interpreter = self.interpreter
+
+        def return_stmt(env):
+            interpreter.returned = None if value is None else value(env)
+            return RETURN
+        return return_stmt
+
+    # --- Expressions
+
+    def visit_literal(self, expr: expr.Literal) -> Closure:
+        value = expr.value
+        return lambda env: value
+
+    def visit_grouping(self, expr: expr.Grouping) -> Closure:
+        return self.compile(expr.expression)
+
+    def visit_unary(self, expr: expr.Unary) -> Closure:
+        right = self.compile(expr.right)
+        operator = expr.operator
+
+        match operator.tokentype:
+            case TokenType.MINUS:
+                def negate(env):
+                    value = right(env)
+                    if isinstance(value, (float, Vector)):
+                        return -value
+                    raise LoxRuntimeError(operator, "Operand must be a number.")
+                return negate
+            case TokenType.BANG:
+                is_truthy = self.interpreter.is_truthy
+                return lambda env: not is_truthy(right(env))
+
+        raise LoxRuntimeError(operator, f"Unknown unary operator '{operator.lexeme}'.")
+
+    def visit_binary(self, expr: expr.Binary) -> Closure:
+        left = self.compile(expr.left)
+        right = self.compile(expr.right)
+        operator = expr.operator
+        check_number_operands = self.interpreter.check_number_operands
+        check_vector_sum = self.interpreter.check_vector_sum
+
+        # Numeric operators take the fast path when both operands are non-zero floats,
+        # anything else goes through check_number_operands, which raises the same error as the tree-walker
+        # (or lets vectors through, whose operators broadcast)
+        match operator.tokentype:
+            case TokenType.PLUS:
+                interning = self.interpreter.interning
+
+                def add(env):
+                    l = left(env)
+                    r = right(env)
+                    if isinstance(l, float) and isinstance(r, float):
+                        return l + r
+                    if isinstance(l, STRINGS) and isinstance(r, STRINGS):
+                        return concatenate(l, r, interning)
+                    if has_vector(l, r):
+                        check_vector_sum(operator, l, r)
+                        return l + r
+                    raise LoxRuntimeError(operator, "Operands must be two numbers or two strings")
+                return add
+            case TokenType.MINUS:
+                def subtract(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l - r
+                return subtract
+            case TokenType.STAR:
+                def multiply(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l * r
+                return multiply
+            case TokenType.SLASH:
+                def divide(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l / r
+                return divide
+            case TokenType.GREATER:
+                def greater(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l > r
+                return greater
+            case TokenType.GREATER_EQUAL:
+                def greater_equal(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l >= r
+                return greater_equal
+            case TokenType.LESS:
+                def less(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l < r
+                return less
+            case TokenType.LESS_EQUAL:
+                def less_equal(env):
+                    l = left(env)
+                    r = right(env)
+                    if not (isinstance(l, float) and isinstance(r, float)) or r == 0:
+                        check_number_operands(operator, l, r)
+                    return l <= r
+                return less_equal
+            # Interpreter.is_equal, inlined
+            case TokenType.EQUAL_EQUAL:
+                return lambda env: left(env) == right(env)
+            case TokenType.BANG_EQUAL:
+                return lambda env: left(env) != right(env)
+
+        raise LoxRuntimeError(operator, f"Unknown binary operator '{operator.lexeme}'.")
+
+    def visit_variable(self, expr: expr.Variable) -> Closure:
+        name = expr.name
+        depth = expr.depth
+        slot = expr.slot
+
+        if depth is None:
+            return self.global_variable(name)
+
+        def uninitialized():
+            return UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+
+        if depth == 0:
+            def get_local(env):
+                value = env.values[slot]
+                if value is None:
+                    raise uninitialized()
+                return value
+            return get_local
+
+        def get_enclosing(env):
+            for _ in range(depth):
+                env = env.enclosing
+            value = env.values[slot]
+            if value is None:
+                raise uninitialized()
+            return value
+        return get_enclosing
+
+    def global_variable(self, name: Token) -> Closure:
+        """Reads a global through an inline cache: the closure keeps the cell it found,
+        and only looks the name up again after a define changed the globals' version
+        """
+        globals = self.interpreter.globals
+        lookup = globals.lookup
+        version, cell = None, None
+
+        def get_global(env):
+            nonlocal version, cell
+            if version != globals.version:
+                version, cell = globals.version, lookup(name)
+            value = cell.value
+            if value is None:
+                raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+            return value
+        return get_global
+
+    def visit_assign(self, expr: expr.Assign) -> Closure:
+        value = self.compile(expr.value)
+        name = expr.name
+        depth = expr.depth
+        slot = expr.slot
+
+        if depth is None:
+            globals = self.interpreter.globals
+            lookup = globals.lookup
+            # Inline cache, as in global_variable
+            version, cell = None, None
+
+            def assign_global(env):
+                nonlocal version, cell
+                result = value(env)
+                if version != globals.version:
+                    version, cell = globals.version, lookup(name)
+                cell.value = result
+                return result
+            return assign_global
+
+        def assign_local(env):
+            result = value(env)
+            target = env
+            for _ in range(depth):
+                target = target.enclosing
+            target.values[slot] = result
+            return result
+        return assign_local
+
+    def visit_call(self, expr: expr.Call) -> Closure:
+        callee = self.compile(expr.callee)
+        arguments = tuple(self.compile(argument) for argument in expr.arguments)
+        paren = expr.paren
+        interpreter = self.interpreter
+        call_function = interpreter.call_function
+
+        def call(env):
+            function = callee(env)
+            values = [argument(env) for argument in arguments]
+
+            if function.__class__ is CompiledFunction:
+                if len(values) != function.parameters:
+                    raise LoxRuntimeError(paren, f"Expected {function.parameters} arguments but got {len(values)}.")
+                if interpreter.depth == FRAMES_MAX:
+                    raise LoxRuntimeError(paren, "Stack overflow.")
+                try:
+                    return call_function(function, values)
+                except RecursionError:
+                    # Python's stack ran out first, as in Interpreter.visit_call
+                    raise LoxRuntimeError(paren, "Stack overflow.")
+
+            if not isinstance(function, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+            if len(values) != function.arity():
+                raise LoxRuntimeError(paren, f"Expected {function.arity()} arguments but got {len(values)}.")
+
+            try:
+                return function.call(interpreter, values)
+            except NativeError as e:
+                raise LoxRuntimeError(paren, e.message)
+        return call
+
+class ClosureInterpreter(Interpreter):
+    """Drop-in replacement for the tree-walking Interpreter that compiles statements to closures before running them"""
+
+    def call_function(self, function: CompiledFunction, arguments: list[object]) -> object:
+        frame = function.frame(arguments)
+        self.depth += 1
+        try:
+            for statement in function.body:
+                if statement(frame) is RETURN:
+                    return self.returned
+            return None
+        finally:
+            self.depth -= 1
+            function.release(frame)
+
+    def interpret(self, statements: list[stmt.Stmt]):
+        compiler = ClosureCompiler(self)
+        compiled = [compiler.compile(statement) for statement in statements]
+        try:
+            with call_stack():
+                for statement in compiled:
+                    statement(self.globals)
+        except BindingError as e:
+            raise LoxRuntimeError(e.token, e.message)
+        except UninitializedError as e:
+            raise LoxRuntimeError(e.token, e.message)
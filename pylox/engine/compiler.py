@@ -0,0 +1,435 @@
+"""compiler.py
+
+Module for compiling a resolved Lox AST into bytecode for the stack-based VM
+"""
+
+from enum import IntEnum, auto
+from typing import NamedTuple
+from pylox.engine.loxtoken import Token, TokenType
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+from pylox.engine.stmt import Block
+from pylox.engine.profiler import first_line
+
+class OpCode(IntEnum):
+    CONSTANT = auto()       # [const]      push constants[const]
+    NIL = auto()
+    TRUE = auto()
+    FALSE = auto()
+    POP = auto()
+    GET_LOCAL = auto()      # [slot, name] push locals[slot]
+    SET_LOCAL = auto()      # [slot]       locals[slot] = top, leaves value on the stack
+    DEFINE_LOCAL = auto()   # [slot]       locals[slot] = pop
+    GET_CELL = auto()       # [slot, name] push locals[slot].value, for locals captured by nested functions
+    SET_CELL = auto()       # [slot]       locals[slot].value = top, leaves value on the stack
+    DEFINE_CELL = auto()    # [slot]       locals[slot] = a new cell holding pop
+    GET_UPVALUE = auto()    # [index, name] push cells[index].value, the running function's captured variables
+    SET_UPVALUE = auto()    # [index]      cells[index].value = top, leaves value on the stack
+    GET_GLOBAL = auto()     # [name]
+    SET_GLOBAL = auto()     # [name]       leaves value on the stack
+    DEFINE_GLOBAL = auto()  # [name]       pops the value
+    EQUAL = auto()
+    NOT_EQUAL = auto()
+    GREATER = auto()
+    GREATER_EQUAL = auto()
+    LESS = auto()
+    LESS_EQUAL = auto()
+    ADD = auto()
+    SUBTRACT = auto()
+    MULTIPLY = auto()
+    DIVIDE = auto()
+    NOT = auto()
+    NEGATE = auto()
+    PRINT = auto()
+    PRINT_EXPR = auto()     # REPL expression statements: print and pop
+    JUMP = auto()           # [target]
+    JUMP_IF_FALSE = auto()  # [target]     pops the condition
+    CALL = auto()           # [argc]
+    CLOSURE = auto()        # [const]      push a function for the FunctionChunk constants[const], capturing its upvalues
+    RETURN = auto()         # returns pop from a function, ends the program at the top level
+    CHECK = auto()          # charge a step to the budget, only emitted for limited runs
+    ENTER = auto()          # start timing the statement on this line, only emitted for profiled runs
+    EXIT = auto()           # stop timing the statement entered last, only emitted for profiled runs
+
+# Number of operands following each opcode in the code array
+OPERANDS = {
+    OpCode.CONSTANT: 1,
+    OpCode.GET_LOCAL: 2,
+    OpCode.SET_LOCAL: 1,
+    OpCode.DEFINE_LOCAL: 1,
+    OpCode.GET_CELL: 2,
+    OpCode.SET_CELL: 1,
+    OpCode.DEFINE_CELL: 1,
+    OpCode.GET_UPVALUE: 2,
+    OpCode.SET_UPVALUE: 1,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.CALL: 1,
+    OpCode.CLOSURE: 1,
+}
+
+BINARY_OPS = {
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.SLASH: OpCode.DIVIDE,
+}
+
+class Chunk:
+    """A compiled program: a flat code array of opcodes and their operands,
+    a constant pool, and a line table with the source line of every entry in the code array
+    """
+
+    def __init__(self):
+        self.code: list[int] = []
+        self.lines: list[int] = []
+        self.constants: list[object] = []
+        self.constant_index: dict[tuple, int] = dict()
+        self.num_locals = 0
+        # Inline caches of GET_GLOBAL and SET_GLOBAL, by the position of their operand: (version, cell)
+        self.caches: list[tuple | None] = []
+
+    def write(self, byte: int, line: int) -> int:
+        self.code.append(byte)
+        self.lines.append(line)
+        return len(self.code) - 1
+
+    def add_constant(self, value: object) -> int:
+        # Names are deduplicated by lexeme and line (so errors report the right line), functions aren't at all,
+        # other constants by type and repr (so 1 and true, or 0 and -0, stay distinct)
+        if isinstance(value, Token):
+            key = ("name", value.lexeme, value.line)
+        elif isinstance(value, FunctionChunk):
+            key = ("function", id(value))
+        else:
+            key = (type(value), repr(value))
+        index = self.constant_index.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.constant_index[key] = index
+        return index
+
+    def finish(self) -> None:
+        """Called once the code is complete"""
+        self.caches = [None] * len(self.code)
+
+    def disassemble(self) -> str:
+        """The code, followed by that of the functions it declares"""
+        out = []
+        offset = 0
+        while offset < len(self.code):
+            op = OpCode(self.code[offset])
+            operands = self.code[offset + 1:offset + 1 + OPERANDS.get(op, 0)]
+            text = f"{offset:04d} {self.lines[offset]:4d} {op.name:<14}"
+            if op in (OpCode.CONSTANT, OpCode.GET_GLOBAL, OpCode.SET_GLOBAL, OpCode.DEFINE_GLOBAL, OpCode.CLOSURE):
+                constant = self.constants[operands[0]]
+                text += f" {operands[0]} ({constant.lexeme if isinstance(constant, Token) else repr(constant)})"
+            elif operands:
+                text += " " + " ".join(str(operand) for operand in operands)
+            out.append(text)
+            offset += 1 + len(operands)
+        for constant in self.constants:
+            if isinstance(constant, FunctionChunk):
+                out.append(f"== {constant.name} ==")
+                out.append(constant.disassemble())
+        return "\n".join(out)
+
+class FunctionChunk(Chunk):
+    """The compiled body of a function declaration. Calling it runs the code with its own locals,
+    which start with the arguments
+    """
+
+    def __init__(self, declaration: stmt.Function):
+        super().__init__()
+        self.name = declaration.name.lexeme
+        self.arity = len(declaration.params)
+        # Parameters captured by nested functions, boxed into cells when a call starts
+        self.boxed = tuple(slot for slot in range(self.arity) if slot in declaration.captured)
+        # Where the function's captured variables come from when it's created: (True, index) is a local
+        # of the enclosing function, (False, index) is one of the enclosing function's own upvalues
+        self.upvalues: list[tuple[bool, int]] = []
+        self.upvalue_index: dict[tuple[bool, int], int] = dict()
+        # Locals after the parameters, appended to the arguments of a call
+        self.padding: list[None] = []
+
+    def finish(self) -> None:
+        super().finish()
+        self.padding = [None] * (self.num_locals - self.arity)
+
+    def __repr__(self):
+        return f"<fn {self.name}>"
+
+class Scope(NamedTuple):
+    """A block or function scope being compiled. Its locals are at base + their Resolver slot in the locals of chunk"""
+    chunk: Chunk
+    base: int
+    captured: frozenset[int]
+
+class Compiler(expr.Visitor, stmt.Visitor):
+    """Compiles statements annotated by the Resolver into a Chunk, and every function declaration into a FunctionChunk.
+    The locals of the program, and of each call, live in one flat array in the VM: a local's index is the base of
+    its block plus its Resolver slot. Locals captured by nested functions are boxed into cells, which functions
+    keep as upvalues when they're created
+    """
+
+    def __init__(self, repl_mode: bool = False, limited: bool = False, profiled: bool = False):
+        self.repl_mode = repl_mode
+        # Emit a CHECK at every loop iteration, block entry and function call, for runs with a Budget
+        self.limited = limited
+        # Emit an ENTER and an EXIT around every statement but a block, for runs with a Profiler
+        self.profiled = profiled
+        # Statements entered but not exited yet in the function being compiled, which a return exits
+        self.entered = 0
+        self.chunk = Chunk()
+        # The chunk of every function being compiled, outermost (the program) first
+        self.functions: list[Chunk] = [self.chunk]
+        self.scopes: list[Scope] = []
+        self.top = 0
+        self.line = 0
+
+    def compile(self, statements: list[stmt.Stmt]) -> Chunk:
+        for statement in statements:
+            self.statement(statement)
+        self.emit(OpCode.RETURN)
+        self.chunk.finish()
+        return self.chunk
+
+    def emit(self, *code: int) -> int:
+        for byte in code:
+            offset = self.chunk.write(byte, self.line)
+        return offset
+
+    def emit_jump(self, op: OpCode) -> int:
+        """Emits a jump with a placeholder target, returning the offset of the target to patch"""
+        return self.emit(op, -1)
+
+    def patch_jump(self, offset: int) -> None:
+        self.chunk.code[offset] = len(self.chunk.code)
+
+    def statement(self, node: stmt.Stmt) -> None:
+        if not self.profiled or isinstance(node, Block):
+            node.accept(self)
+            return
+        # On the line the Profiler would attribute the statement to, without moving the line of what follows
+        line, self.line = self.line, first_line(node) or 0
+        self.emit(OpCode.ENTER)
+        self.line = line
+        self.entered += 1
+        node.accept(self)
+        self.entered -= 1
+        self.emit(OpCode.EXIT)
+
+    def emit_check(self, node: stmt.Stmt) -> None:
+        """Charges a step on the same line as the tree-walker would"""
+        if self.limited:
+            self.line = first_line(node) or self.line
+            self.emit(OpCode.CHECK)
+
+    def emit_local(self, local: OpCode, cell: OpCode, upvalue: OpCode, depth: int, slot: int) -> None:
+        """Emits the instruction that reads or writes the local at (depth, slot), with its index.
+        It's a plain local or a cell when the running function declared it, otherwise an upvalue
+        """
+        scope = self.scopes[-1 - depth]
+        if scope.chunk is self.chunk:
+            self.emit(cell if slot in scope.captured else local, scope.base + slot)
+        else:
+            self.emit(upvalue, self.upvalue(len(self.functions) - 1, scope, slot))
+
+    def upvalue(self, function: int, scope: Scope, slot: int) -> int:
+        """Index of the upvalue of self.functions[function] for a local of scope, declared by an enclosing function"""
+        chunk: FunctionChunk = self.functions[function]
+        if scope.chunk is self.functions[function - 1]:
+            source = (True, scope.base + slot)
+        else:
+            source = (False, self.upvalue(function - 1, scope, slot))
+
+        index = chunk.upvalue_index.get(source)
+        if index is None:
+            index = chunk.upvalue_index[source] = len(chunk.upvalues)
+            chunk.upvalues.append(source)
+        return index
+
+    def define_local(self, slot: int) -> None:
+        scope = self.scopes[-1]
+        self.emit(OpCode.DEFINE_CELL if slot in scope.captured else OpCode.DEFINE_LOCAL, scope.base + slot)
+
+    # --- Statements
+
+    def visit_expression(self, stmt: stmt.Expression) -> None:
+        stmt.expression.accept(self)
+        self.emit(OpCode.PRINT_EXPR if self.repl_mode else OpCode.POP)
+
+    def visit_print(self, stmt: stmt.Print) -> None:
+        stmt.expression.accept(self)
+        self.emit(OpCode.PRINT)
+
+    def visit_var(self, stmt: stmt.Var) -> None:
+        self.line = stmt.name.line
+        if stmt.initializer is None:
+            self.emit(OpCode.NIL)
+        else:
+            stmt.initializer.accept(self)
+
+        self.line = stmt.name.line
+        if stmt.slot is None:
+            self.emit(OpCode.DEFINE_GLOBAL, self.chunk.add_constant(stmt.name))
+        else:
+            self.define_local(stmt.slot)
+
+    def visit_block(self, stmt: stmt.Block) -> None:
+        self.emit_check(stmt)
+        if not stmt.size:
+            # Its locals, if any, are laid out in the enclosing scope
+            for statement in stmt.statements:
+                self.statement(statement)
+            return
+        self.scopes.append(Scope(self.chunk, self.top, stmt.captured))
+        self.top += stmt.size
+        self.chunk.num_locals = max(self.chunk.num_locals, self.top)
+        try:
+            for statement in stmt.statements:
+                self.statement(statement)
+        finally:
+            self.top = self.scopes.pop().base
+
+    def visit_function(self, stmt: stmt.Function) -> None:
+        self.line = stmt.name.line
+        if stmt.slot is None:
+            self.function(stmt)
+            self.emit(OpCode.DEFINE_GLOBAL, self.chunk.add_constant(stmt.name))
+        elif stmt.slot in self.scopes[-1].captured:
+            # The function may capture itself, so its cell has to exist before the function does
+            index = self.scopes[-1].base + stmt.slot
+            self.emit(OpCode.NIL)
+            self.emit(OpCode.DEFINE_CELL, index)
+            self.function(stmt)
+            self.emit(OpCode.SET_CELL, index)
+            self.emit(OpCode.POP)
+        else:
+            self.function(stmt)
+            self.emit(OpCode.DEFINE_LOCAL, self.scopes[-1].base + stmt.slot)
+
+    def function(self, declaration: stmt.Function) -> None:
+        """Compiles the body of declaration into its own chunk, and emits the instruction that creates the function"""
+        chunk = FunctionChunk(declaration)
+        enclosing, top, entered = self.chunk, self.top, self.entered
+        self.chunk, self.top, self.entered = chunk, declaration.size, 0
+        chunk.num_locals = declaration.size
+        self.functions.append(chunk)
+        self.scopes.append(Scope(chunk, 0, declaration.captured))
+        try:
+            # A call charges a step, like entering a block
+            self.emit_check(declaration)
+            for statement in declaration.body:
+                self.statement(statement)
+            self.emit(OpCode.NIL)
+            self.emit(OpCode.RETURN)
+        finally:
+            self.scopes.pop()
+            self.functions.pop()
+            self.chunk, self.top, self.entered = enclosing, top, entered
+        chunk.finish()
+
+        self.line = declaration.name.line
+        self.emit(OpCode.CLOSURE, self.chunk.add_constant(chunk))
+
+    def visit_return(self, stmt: stmt.Return) -> None:
+        self.line = stmt.keyword.line
+        if stmt.value is None:
+            self.emit(OpCode.NIL)
+        else:
+            stmt.value.accept(self)
+        self.line = stmt.keyword.line
+        # Skipping the EXITs of the statements it's nested in, so it exits them itself
+        for _ in range(self.entered):
+            self.emit(OpCode.EXIT)
+        self.emit(OpCode.RETURN)
+
+    def visit_if(self, stmt: stmt.If) -> None:
+        stmt.condition.accept(self)
+        then_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+        self.statement(stmt.then_branch)
+
+        if stmt.else_branch is None:
+            self.patch_jump(then_jump)
+            return
+
+        else_jump = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(then_jump)
+        self.statement(stmt.else_branch)
+        self.patch_jump(else_jump)
+
+    def visit_while(self, stmt: stmt.While) -> None:
+        loop_start = len(self.chunk.code)
+        stmt.condition.accept(self)
+        exit_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+        # When the body is a block, entering it charges the iteration
+        if not isinstance(stmt.body, Block):
+            self.emit_check(stmt)
+        self.statement(stmt.body)
+        self.emit(OpCode.JUMP, loop_start)
+        self.patch_jump(exit_jump)
+
+    # --- Expressions
+
+    def visit_literal(self, expr: expr.Literal) -> None:
+        if expr.value is None:
+            self.emit(OpCode.NIL)
+        elif expr.value is True:
+            self.emit(OpCode.TRUE)
+        elif expr.value is False:
+            self.emit(OpCode.FALSE)
+        else:
+            self.emit(OpCode.CONSTANT, self.chunk.add_constant(expr.value))
+
+    def visit_grouping(self, expr: expr.Grouping) -> None:
+        expr.expression.accept(self)
+
+    def visit_unary(self, expr: expr.Unary) -> None:
+        expr.right.accept(self)
+        self.line = expr.operator.line
+        match expr.operator.tokentype:
+            case TokenType.MINUS:
+                self.emit(OpCode.NEGATE)
+            case TokenType.BANG:
+                self.emit(OpCode.NOT)
+
+    def visit_binary(self, expr: expr.Binary) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+        self.line = expr.operator.line
+        self.emit(BINARY_OPS[expr.operator.tokentype])
+
+    def visit_variable(self, expr: expr.Variable) -> None:
+        self.line = expr.name.line
+        name = self.chunk.add_constant(expr.name)
+        if expr.depth is None:
+            self.emit(OpCode.GET_GLOBAL, name)
+        else:
+            self.emit_local(OpCode.GET_LOCAL, OpCode.GET_CELL, OpCode.GET_UPVALUE, expr.depth, expr.slot)
+            self.emit(name)
+
+    def visit_assign(self, expr: expr.Assign) -> None:
+        expr.value.accept(self)
+        self.line = expr.name.line
+        if expr.depth is None:
+            self.emit(OpCode.SET_GLOBAL, self.chunk.add_constant(expr.name))
+        else:
+            self.emit_local(OpCode.SET_LOCAL, OpCode.SET_CELL, OpCode.SET_UPVALUE, expr.depth, expr.slot)
+
+    def visit_call(self, expr: expr.Call) -> None:
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+        self.line = expr.paren.line
+        self.emit(OpCode.CALL, len(expr.arguments))
@@ -3,6 +3,7 @@
 Module for defining environment of Lox interpreter, the place where variables and values live
 """
 
+from itertools import count
 from pylox.engine.loxtoken import Token
 # errors
 from pylox.engine.errors import Error
@@ -51,4 +52,79 @@ class Environment:
         if self.enclosing:
             return self.enclosing.get(name)
 
-        raise BindingError(name, f"Undefined variable '{name.lexeme}'.")
\ No newline at end of file
+        raise BindingError(name, f"Undefined variable '{name.lexeme}'.")
+
+# Versions are unique across every GlobalEnvironment, so a cache filled by one interpreter
+# never validates against another's globals (Programs share their nodes between runs)
+VERSIONS = count()
+
+class Cell:
+    """The binding of a global variable. Inline caches keep the cell, so they read and write it without the dict.
+    The VM and translated code also box locals captured by nested functions in cells
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: object):
+        self.value = value
+
+class GlobalEnvironment(Environment):
+    """Environment for the global scope, where every name is bound to a Cell.
+    version changes on every define, the only way a name gets a new cell: an inline cache is a (version, cell) pair,
+    and is valid as long as its version is the current one. Assignments write through the cell and keep caches valid
+    """
+
+    def __init__(self):
+        self.enclosing = None
+        self.cells: dict[str, Cell] = dict()
+        self.version = next(VERSIONS)
+
+    @property
+    def values(self) -> dict[str, object]:
+        return {name: cell.value for name, cell in self.cells.items()}
+
+    def define(self, name: str, value: object):
+        # A fresh cell, so caches of the old binding (e.g. redefined in the REPL) are dropped with the version
+        self.cells[name] = Cell(value)
+        self.version = next(VERSIONS)
+
+    def lookup(self, name: Token) -> Cell:
+        cell = self.cells.get(name.lexeme)
+        if cell is None:
+            raise BindingError(name, f"Undefined variable '{name.lexeme}'.")
+        return cell
+
+    def assign(self, name: Token, value: object):
+        self.lookup(name).value = value
+
+    def get(self, name: Token):
+        value = self.lookup(name).value
+        if value is None:
+            raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+        return value
+
+class LocalEnvironment:
+    """Array-backed environment for a block scope.
+    Variables are indexed by the (depth, slot) pairs computed by the Resolver, so no names are looked up at runtime
+    """
+
+    __slots__ = ("enclosing", "values")
+
+    def __init__(self, enclosing, size: int):
+        self.enclosing = enclosing
+        self.values: list[object] = [None] * size
+
+    def ancestor(self, depth: int):
+        environment = self
+        for _ in range(depth):
+            environment = environment.enclosing
+        return environment
+
+    def get_at(self, depth: int, slot: int, name: Token):
+        value = self.ancestor(depth).values[slot]
+        if value is None:
+            raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+        return value
+
+    def assign_at(self, depth: int, slot: int, value: object):
+        self.ancestor(depth).values[slot] = value
@@ -4,7 +4,7 @@ Module for defining Expression nodes in the Lox AST
 """
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pylox.engine.loxtoken import Token
 
 class Visitor(ABC):
@@ -33,12 +33,27 @@ class Visitor(ABC):
     def visit_assign(self, expr):
         pass
 
+    @abstractmethod
+    def visit_call(self, expr):
+        pass
+
+    def visit_quickened(self, expr):
+        # Binary and Unary nodes the Interpreter specialised in place (see quicken.py) are plain ones to every other visitor
+        return expr.GENERIC.accept(expr, self)
+
 class Expr(ABC):
+    # Nodes are slotted dataclasses, so the base must not add a __dict__ either
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Pickled (e.g. to send programs to other processes) as a constructor call, which is smaller and quicker to load than slot state
+        return (type(self), tuple(getattr(self, name) for name in self.__slots__))
+
     @abstractmethod
     def accept(self, visitor: Visitor):
         pass
 
-@dataclass
+@dataclass(slots=True)
 class Binary(Expr):
     left: Expr
     operator: Token
@@ -47,21 +62,23 @@ class Binary(Expr):
     def accept(self, visitor: Visitor):
         return visitor.visit_binary(self)
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Expr):
     expression: Expr
 
     def accept(self, visitor: Visitor):
         return visitor.visit_grouping(self)
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expr):
     value: object
+    # Set by the Optimiser on literals that replaced a constant subtree
+    folded: bool = False
 
     def accept(self, visitor: Visitor):
         return visitor.visit_literal(self)
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expr):
     operator: Token
     right: Expr
@@ -69,21 +86,47 @@ class Unary(Expr):
     def accept(self, visitor: Visitor):
         return visitor.visit_unary(self)
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Expr):
     name: Token
+    # Set by the Resolver for locals: scopes to hop outwards and the slot in that scope.
+    # Left as None for globals
+    depth: int | None = None
+    slot: int | None = None
+    # Inline cache of a global: the (version, cell) of the GlobalEnvironment it was last read from
+    cache: tuple | None = field(default=None, repr=False, compare=False)
+
+    def __reduce__(self):
+        # The cache belongs to the interpreter that filled it, so it isn't pickled
+        return (type(self), (self.name, self.depth, self.slot))
 
     def accept(self, visitor: Visitor):
         return visitor.visit_variable(self)
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Expr):
     name: Token
     value: Expr
+    depth: int | None = None
+    slot: int | None = None
+    # Inline cache of a global, as for Variable
+    cache: tuple | None = field(default=None, repr=False, compare=False)
+
+    def __reduce__(self):
+        return (type(self), (self.name, self.value, self.depth, self.slot))
 
     def accept(self, visitor: Visitor):
         return visitor.visit_assign(self)
-    
+
+@dataclass(slots=True)
+class Call(Expr):
+    callee: Expr
+    paren: Token
+    arguments: list[Expr]
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_call(self)
+
 # @dataclass
 # class Logical(Expr):
 #     left: 
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""instrumentation.py
+
+Module for the per-phase timings and counters collected with --timings (or Lox(timings=True)).
+Nothing in here runs unless instrumentation was asked for
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+import time
+from typing import Iterator, TYPE_CHECKING
+if TYPE_CHECKING:
+    from rich.table import Table
+# app
+from pylox.engine.expr import Expr
+from pylox.engine.stmt import Stmt
+
+PHASES = ("cache", "scan", "parse", "optimise", "resolve", "execute")
+COUNTERS = ("tokens", "nodes", "environments", "statements", "cache_hits", "cache_misses")
+
+@dataclass
+class Timings:
+    """Wall time per phase (in seconds) and counters, summed over every run of a Lox instance.
+    A counter is None when it isn't tracked, e.g. the VM doesn't execute statement by statement,
+    and there are no cache hits or misses without the program cache.
+    With --stream, tokens are scanned while parsing, so scanning time is part of the parse time
+    """
+    cache: float = 0.0
+    scan: float = 0.0
+    parse: float = 0.0
+    optimise: float = 0.0
+    resolve: float = 0.0
+    execute: float = 0.0
+    tokens: int = 0
+    nodes: int = 0
+    environments: int | None = 0
+    statements: int | None = 0
+    cache_hits: int | None = None
+    cache_misses: int | None = None
+
+    @property
+    def total(self) -> float:
+        return sum(getattr(self, phase) for phase in PHASES)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Adds the time spent in the with-block to the named phase, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, name, getattr(self, name) + time.perf_counter() - start)
+
+    def table(self) -> "Table":
+        from rich.table import Table
+        table = Table(title="pylox timings")
+        table.add_column("phase")
+        table.add_column("time (ms)", justify="right")
+        for phase in PHASES:
+            table.add_row(phase, f"{getattr(self, phase) * 1000:.2f}")
+        table.add_row("total", f"{self.total * 1000:.2f}", end_section=True)
+        for counter in COUNTERS:
+            value = getattr(self, counter)
+            table.add_row(counter, "-" if value is None else str(value))
+        return table
+
+def count_nodes(node: object) -> int:
+    """Number of Expr and Stmt nodes in an AST (or list of them)"""
+    if isinstance(node, list):
+        return sum(count_nodes(child) for child in node)
+    if not isinstance(node, (Expr, Stmt)):
+        return 0
+    return 1 + sum(count_nodes(getattr(node, f.name)) for f in fields(node))
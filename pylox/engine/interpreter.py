@@ -6,34 +6,71 @@ Module for Interpreter component of Lox interpreter
 # logs
 from pylox.utils import new_logger
 logger = new_logger(__name__)
-from rich import print as rprint
 # app
 from pylox.engine.loxtoken import Token, TokenType
 import pylox.engine.expr as expr
 import pylox.engine.stmt as stmt
-from pylox.engine.environment import Environment, BindingError, UninitializedError
+from pylox.engine.environment import GlobalEnvironment, LocalEnvironment, BindingError, UninitializedError
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.loxfunction import LoxFunction, FRAMES_MAX, RETURN, call_stack
+from pylox.engine.natives import NATIVES
+from pylox.engine.vectors import Vector, NativeError, has_vector, check_operands
+from pylox.engine.ropes import STRINGS, concatenate
+from pylox.engine.instrumentation import Timings
+from pylox.engine.profiler import Profiler
+from pylox.engine.output import PlainOutput, RichOutput
+from pylox.engine.quicken import QuickBinary, QuickUnary, quicken_binary, quicken_unary
 # errors
 from pylox.engine.errors import Error
 
 class LoxRuntimeError(Error):
-    """Raise when runtime error occurs"""
-    def __init__(self, token: Token, message: str):
+    """Raise when runtime error occurs.
+    Engines without tokens at runtime (e.g. the bytecode VM) pass the line from their line table instead
+    """
+    def __init__(self, token: Token | None, message: str, line: int | None = None):
         super().__init__(message)
         self.message = message
         self.token = token
+        self.line = token.line if token is not None else line
+
+class BudgetExceededError(LoxRuntimeError):
+    """Raise when a script runs out of steps or time (see pylox.engine.limits.Budget).
+    The line is that of the loop or block being entered when the budget ran out
+    """
 
 class Interpreter(expr.Visitor, stmt.Visitor):
-    """Interprets expressions"""
+    """Interprets statements that have been annotated by the Resolver"""
     # TODO: Evaluate expressions in REPL mode
 
     def __init__(self, repl_mode: bool):
-        self.environment = Environment()
+        self.globals = GlobalEnvironment()
+        self.environment = self.globals
         self.repl_mode = repl_mode
+        # Number of function calls in progress
+        self.depth = 0
+        # Value of the return statement that ran last, for the call it returns from
+        self.returned = None
+        # Set by instrument()
+        self.timings: Timings | None = None
+        # Set by profile()
+        self.profiler: Profiler | None = None
+        # Set by limit(), a pylox.engine.limits.Budget
+        self.budget = None
+        # Specialise Binary and Unary nodes for the operand types they see (see quicken.py)
+        self.quickening = True
+        # Intern the results of string concatenation, as the scanners intern literals, so equal strings
+        # are usually the same object. Costs a lookup per concatenation, so it's off by default
+        self.interning = False
+        self.output: PlainOutput | RichOutput = PlainOutput()
+
+        for name, native in NATIVES.items():
+            self.globals.define(name, native)
 
     def interpret(self, statements: list[stmt.Stmt]):
         try:
-            for statement in statements:
-                self.execute(statement)
+            with call_stack():
+                for statement in statements:
+                    self.execute(statement)
         except BindingError as e:
             raise LoxRuntimeError(e.token, e.message)
         except UninitializedError as e:
@@ -42,8 +79,79 @@ class Interpreter(expr.Visitor, stmt.Visitor):
             raise
 
     def execute(self, statement: stmt.Stmt):
-        statement.accept(self)
-        return
+        """Runs a statement. Returns RETURN if a return statement ran in it, None otherwise"""
+        return statement.accept(self)
+
+    def use_colour(self, colour: bool) -> None:
+        """Switches between plain buffered output and colourised Rich output for print"""
+        self.output.flush()
+        self.output = RichOutput(self.stringify) if colour else PlainOutput()
+
+    def profile(self, profiler: Profiler) -> None:
+        """Attributes the time spent in every statement to its line. Like instrument(), this only touches this instance"""
+        self.profiler = profiler
+        self.execute = profiler.execute(self.execute)
+
+    def limit(self, budget) -> None:
+        """Charges every loop iteration, block entry and function call to budget, which raises BudgetExceededError once it runs out.
+        Like instrument(), this only touches this instance, so unlimited interpreters pay nothing
+        """
+        self.budget = budget
+        charge = budget.charge
+        visit_while = self.visit_while
+        visit_block = self.visit_block
+        call_function = self.call_function
+
+        def limited_while(statement: stmt.While):
+            if isinstance(statement.body, stmt.Block):
+                # Entering the body charges the iteration
+                return visit_while(statement)
+            while self.is_truthy(self.evaluate(statement.condition)):
+                charge(statement)
+                if self.execute(statement.body) is RETURN:
+                    return RETURN
+
+        def limited_block(statement: stmt.Block):
+            charge(statement)
+            return visit_block(statement)
+
+        def limited_call(function: LoxFunction, arguments: list[object]) -> object:
+            charge(function.declaration)
+            return call_function(function, arguments)
+
+        self.visit_while = limited_while
+        self.visit_block = limited_block
+        self.call_function = limited_call
+
+    def instrument(self, timings: Timings) -> None:
+        """Counts statements executed and environments created into timings.
+        The counting wrappers are installed on this instance only, so other interpreters pay nothing
+        """
+        self.timings = timings
+        execute = self.execute
+        block_environment = self.block_environment
+        call_function = self.call_function
+
+        def counting_execute(statement: stmt.Stmt):
+            timings.statements += 1
+            return execute(statement)
+
+        def counting_block_environment(block: stmt.Block) -> LocalEnvironment:
+            kept = block.environment
+            environment = block_environment(block)
+            if environment is not kept:
+                timings.environments += 1
+            return environment
+
+        def counting_call(function: LoxFunction, arguments: list[object]) -> object:
+            # A call only creates a frame when there's no free one to reuse
+            if not function.frames:
+                timings.environments += 1
+            return call_function(function, arguments)
+
+        self.execute = counting_execute
+        self.block_environment = counting_block_environment
+        self.call_function = counting_call
 
     def stringify(self, obj):
         # Markup [x]...[/x] is based on Rich text formatting: https://rich.readthedocs.io/en/stable/style.html
@@ -60,6 +168,12 @@ class Interpreter(expr.Visitor, stmt.Visitor):
             text = str(obj)
             return f"[deep_sky_blue1]{text.lower()}[/deep_sky_blue1]"
 
+        if isinstance(obj, LoxCallable):
+            return f"[magenta]{obj}[/magenta]"
+
+        if isinstance(obj, Vector):
+            return f"[dark_orange3]{obj}[/dark_orange3]"
+
         return f"[gold3]'{obj}'[/gold3]"
 
     def evaluate(self, expr: expr.Expr):
@@ -70,40 +184,91 @@ class Interpreter(expr.Visitor, stmt.Visitor):
     def visit_expression(self, stmt: stmt.Expression) -> None:
         value = self.evaluate(stmt.expression)
         if self.repl_mode:
-            rprint(self.stringify(value))
+            self.output.write(value)
     
-    def visit_if(self, stmt: stmt.If) -> None:
+    def visit_if(self, stmt: stmt.If):
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.then_branch)
+            return self.execute(stmt.then_branch)
         elif stmt.else_branch:
-            self.execute(stmt.else_branch)
+            return self.execute(stmt.else_branch)
 
     def visit_print(self, stmt: stmt.Print) -> None:
         value = self.evaluate(stmt.expression)
-        rprint(self.stringify(value))
+        self.output.write(value)
 
     def visit_var(self, stmt: stmt.Var) -> None:
         value = None
         if stmt.initializer:
             value = self.evaluate(stmt.initializer)
-        
-        self.environment.define(stmt.name.lexeme, value)
 
-    def visit_block(self, stmt: stmt.Block) -> None:
-        self.execute_block(stmt.statements, Environment(self.environment))
+        if stmt.slot is None:
+            self.globals.define(stmt.name.lexeme, value)
+        else:
+            self.environment.values[stmt.slot] = value
+
+    def visit_while(self, stmt: stmt.While):
+        while self.is_truthy(self.evaluate(stmt.condition)):
+            if self.execute(stmt.body) is RETURN:
+                return RETURN
+
+    def visit_block(self, stmt: stmt.Block):
+        if not stmt.size:
+            # Runs in the enclosing environment
+            for statement in stmt.statements:
+                if self.execute(statement) is RETURN:
+                    return RETURN
+            return None
+        return self.execute_block(stmt.statements, self.block_environment(stmt))
+
+    def visit_function(self, stmt: stmt.Function) -> None:
+        function = LoxFunction(stmt, self.environment)
+        if stmt.slot is None:
+            self.globals.define(stmt.name.lexeme, function)
+        else:
+            self.environment.values[stmt.slot] = function
+
+    def visit_return(self, stmt: stmt.Return):
+        self.returned = None if stmt.value is None else self.evaluate(stmt.value)
+        return RETURN
 
     # ---
 
-    def execute_block(self, statements: list[stmt.Stmt], environment: Environment) -> None:
+    def execute_block(self, statements: list[stmt.Stmt], environment: LocalEnvironment):
         previous = self.environment
         try:
             self.environment = environment
 
             for statement in statements:
-                self.execute(statement)
+                if self.execute(statement) is RETURN:
+                    return RETURN
         finally:
             self.environment = previous
 
+    def block_environment(self, block: stmt.Block) -> LocalEnvironment:
+        """A new environment for block, or for a reused block, the one it was given last time it ran here"""
+        if block.reused:
+            environment = block.environment
+            if environment is None or environment.enclosing is not self.environment:
+                environment = block.environment = LocalEnvironment(self.environment, block.size)
+            return environment
+        return LocalEnvironment(self.environment, block.size)
+
+    def call_function(self, function: LoxFunction, arguments: list[object]) -> object:
+        """Runs the body of function in a frame holding the arguments, which have already been checked"""
+        frame = function.frame(arguments)
+        previous = self.environment
+        self.environment = frame
+        self.depth += 1
+        try:
+            for statement in function.declaration.body:
+                if self.execute(statement) is RETURN:
+                    return self.returned
+            return None
+        finally:
+            self.environment = previous
+            self.depth -= 1
+            function.release(frame)
+
     # --- Expressions
 
     def visit_literal(self, expr: expr.Literal) -> object:
@@ -119,16 +284,25 @@ class Interpreter(expr.Visitor, stmt.Visitor):
         return True
 
     def check_number_operand(self, operator: Token, operand) -> None:
-        if isinstance(operand, float): return
+        if isinstance(operand, (float, Vector)): return
         raise LoxRuntimeError(operator, "Operand must be a number.")
 
     def visit_unary(self, expr: expr.Unary):
         right = self.evaluate(expr.right)
+        value = self.unary(expr, right)
+        # A call in the operand may have specialised or de-optimised the node meanwhile, which stands
+        if self.quickening and not isinstance(expr, QuickUnary):
+            quicken_unary(expr, right)
+        return value
 
+    def visit_quickened(self, expr: QuickBinary | QuickUnary):
+        return expr.quick(self)
+
+    def unary(self, expr: expr.Unary, right):
         match expr.operator.tokentype:
             case TokenType.MINUS:
                 self.check_number_operand(expr.operator, right)
-                return -float(right)
+                return -right
             case TokenType.BANG:
                 return not self.is_truthy(right)
 
@@ -136,63 +310,127 @@ class Interpreter(expr.Visitor, stmt.Visitor):
         return
 
     def visit_variable(self, expr: expr.Variable):
-        return self.environment.get(expr.name)
+        if expr.depth is None:
+            # Inline cache: valid while no define has happened since it was filled
+            cache = expr.cache
+            if cache is None or cache[0] != self.globals.version:
+                cache = expr.cache = (self.globals.version, self.globals.lookup(expr.name))
+            value = cache[1].value
+            if value is None:
+                raise UninitializedError(expr.name, f"Uninitialized variable '{expr.name.lexeme}'")
+            return value
+        return self.environment.get_at(expr.depth, expr.slot, expr.name)
 
     def visit_assign(self, expr: expr.Assign):
         value = self.evaluate(expr.value)
-        self.environment.assign(expr.name, value)
+        if expr.depth is None:
+            cache = expr.cache
+            if cache is None or cache[0] != self.globals.version:
+                cache = expr.cache = (self.globals.version, self.globals.lookup(expr.name))
+            cache[1].value = value
+        else:
+            self.environment.assign_at(expr.depth, expr.slot, value)
         return value
 
+    def visit_call(self, expr: expr.Call):
+        callee = self.evaluate(expr.callee)
+
+        arguments = [self.evaluate(argument) for argument in expr.arguments]
+
+        if callee.__class__ is LoxFunction:
+            # The common case, without the generic checks: the arity was worked out when the function was declared
+            if len(arguments) != callee.parameters:
+                raise LoxRuntimeError(expr.paren, f"Expected {callee.parameters} arguments but got {len(arguments)}.")
+            if self.depth == FRAMES_MAX:
+                raise LoxRuntimeError(expr.paren, "Stack overflow.")
+            try:
+                return self.call_function(callee, arguments)
+            except RecursionError:
+                # Python's stack ran out first: the innermost call reports it
+                raise LoxRuntimeError(expr.paren, "Stack overflow.")
+
+        if not isinstance(callee, LoxCallable):
+            raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
+
+        if len(arguments) != callee.arity():
+            raise LoxRuntimeError(expr.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+
+        try:
+            return callee.call(self, arguments)
+        except NativeError as e:
+            raise LoxRuntimeError(expr.paren, e.message)
+
     # ---
 
     def is_equal(self, a, b):
-        # if a is None and b is None: return True
-        # if a is None: return False
+        # Python's == checks identity first for strings, so interned ones never compare their characters.
+        # Numbers don't get that shortcut, which keeps NaN unequal to itself. The engines inline this
         return a == b
 
     def check_number_operands(self, operator: Token, left, right):
         if not (isinstance(left, float) and isinstance(right, float)):
+            if has_vector(left, right):
+                # Vectors broadcast: the operator applies element-wise
+                message = check_operands(left, right, operator.lexeme)
+                if message is None:
+                    return
+                raise LoxRuntimeError(operator, message)
             raise LoxRuntimeError(operator, "Operands must be the numbers.")
         if right == 0:
             raise LoxRuntimeError(operator, "Division by Zero is undefined")
         return
 
+    def check_vector_sum(self, operator: Token, left, right):
+        message = check_operands(left, right, operator.lexeme)
+        if message is not None:
+            raise LoxRuntimeError(operator, message)
+
     def visit_binary(self, expr: expr.Binary):
         left = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
+        value = self.binary(expr, left, right)
+        # Only once the operation succeeded, so the node is specialised for operands that work. A recursive call
+        # in an operand may have specialised or de-optimised the node meanwhile, which stands
+        if self.quickening and not isinstance(expr, QuickBinary):
+            quicken_binary(expr, left, right)
+        return value
 
+    def binary(self, expr: expr.Binary, left, right):
         match expr.operator.tokentype:
             case TokenType.GREATER:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) > float(right)
+                return left > right
             case TokenType.GREATER_EQUAL:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) >= float(right)
+                return left >= right
             case TokenType.LESS:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) < float(right)
+                return left < right
             case TokenType.LESS_EQUAL:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) <= float(right)
+                return left <= right
             case TokenType.BANG_EQUAL:
                 return not self.is_equal(left, right)
             case TokenType.EQUAL_EQUAL:
                 return self.is_equal(left, right)
             case TokenType.MINUS:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) - float(right)
+                return left - right
             case TokenType.PLUS:
                 if isinstance(left, float) and isinstance(right, float):
                     return left + right
-                if isinstance(left, str) and isinstance(right, str):
+                if isinstance(left, STRINGS) and isinstance(right, STRINGS):
+                    return concatenate(left, right, self.interning)
+                if has_vector(left, right):
+                    self.check_vector_sum(expr.operator, left, right)
                     return left + right
                 raise LoxRuntimeError(expr.operator, "Operands must be two numbers or two strings")
             case TokenType.SLASH:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) / float(right)
+                return left / right
             case TokenType.STAR:
                 self.check_number_operands(expr.operator, left, right)
-                return float(left) * float(right)
+                return left * right
 
         # Unreachable
         return
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""limits.py
+
+Module for the execution budget of untrusted scripts: a maximum number of steps and a wall-clock deadline,
+enabled with --max-steps and --timeout (or Lox(max_steps=..., timeout=...))
+"""
+
+import time
+# app
+import pylox.engine.stmt as stmt
+from pylox.engine.profiler import first_line
+from pylox.engine.interpreter import BudgetExceededError
+
+class Budget:
+    """Steps and seconds a run may use. A step is a block entry, a function call or a loop iteration (only charged once when
+    the loop's body is a block), the only places a script can spend unbounded time, so straight-line code is never charged.
+    Charging a step is an increment and a comparison; the limits themselves are only checked
+    at the next checkpoint, which is at most CLOCK_INTERVAL steps away when there's a deadline
+    """
+
+    CLOCK_INTERVAL = 1024
+
+    def __init__(self, steps: int | None = None, seconds: float | None = None):
+        if steps is not None and steps < 0:
+            raise ValueError(f"Step budget must not be negative, got {steps}")
+        if seconds is not None and seconds <= 0:
+            raise ValueError(f"Timeout must be positive, got {seconds}")
+        self.steps = steps
+        self.seconds = seconds
+        self.used = 0
+        self.deadline: float | None = None
+        self.checkpoint = 0
+        self.lines: dict[int, tuple[object, int]] = dict()
+        self.start()
+
+    def start(self) -> None:
+        """Resets the steps used and starts the clock, at the beginning of every run"""
+        self.used = 0
+        self.lines.clear()
+        self.deadline = None if self.seconds is None else time.monotonic() + self.seconds
+        self.checkpoint = self.next_checkpoint()
+
+    def next_checkpoint(self) -> int:
+        # The step budget runs out on the step after the last one allowed
+        checkpoint = None if self.steps is None else self.steps + 1
+        if self.deadline is not None:
+            clock = self.used + self.CLOCK_INTERVAL
+            checkpoint = clock if checkpoint is None else min(checkpoint, clock)
+        return checkpoint
+
+    def charge(self, where: stmt.Stmt | int) -> None:
+        """Charges one step to a loop, block or function, given as its node or its line"""
+        self.used += 1
+        if self.used >= self.checkpoint:
+            self.check(where)
+
+    def check(self, where: stmt.Stmt | int) -> None:
+        # Finding the line of a node takes a walk of the tree, so it's left until there's an error to report
+        line = where if isinstance(where, int) else self.line(where)
+        if self.steps is not None and self.used > self.steps:
+            raise BudgetExceededError(None, f"Step budget of {self.steps} exhausted", line)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise BudgetExceededError(None, f"Timeout of {self.seconds:g}s exceeded", line)
+        self.checkpoint = self.next_checkpoint()
+
+    def line(self, node: object) -> int:
+        # Nodes are unhashable dataclasses, so they're keyed by id, and kept alive along with their line until the next
+        # run: the program of an earlier run may be gone, and its ids reused by the nodes of the next one
+        cached = self.lines.get(id(node))
+        if cached is None:
+            cached = self.lines[id(node)] = (node, first_line(node) or 0)
+        return cached[1]
@@ -5,32 +5,95 @@ Main module for Lox interpreter
 """
 
 # stdlib
+from contextlib import AbstractContextManager, nullcontext
 from pathlib import Path
 import io
 import sys
-# rich
-from rich import print as rprint
 # app
 from pylox.engine.loxtoken import Token, TokenType
+from pylox.engine.stmt import Stmt
 from pylox.cli.astprinter import AstPrinter
-from pylox.engine.scanner import Scanner, ScannerError
+from pylox.engine.scanner import Scanner, FastScanner, BufferScanner, ScannerError
 from pylox.engine.loxparser import Parser, ParserError
+from pylox.engine.optimiser import Optimiser
+from pylox.engine.resolver import Resolver, ResolverError
 from pylox.engine.interpreter import Interpreter, LoxRuntimeError
+from pylox.engine.vm import VM
+from pylox.engine.closures import ClosureInterpreter
+from pylox.engine.instrumentation import Timings, count_nodes
+from pylox.engine.cache import ProgramCache
+from pylox.engine.profiler import Profiler
+from pylox.engine.limits import Budget
 # logs
 import logging
 from pylox.utils import new_logger
 logger = new_logger(__name__)
 
+# Execution backends selectable with --engine
+ENGINES = {
+    "tree": Interpreter,
+    "vm": VM,
+    "closure": ClosureInterpreter,
+}
+
+SCANNERS = {
+    "classic": Scanner,
+    "fast": FastScanner,
+    "buffer": BufferScanner,
+}
+
 class Lox:
 
-    def __init__(self):
+    def __init__(self, engine: str = "tree", optimise: bool = True, scanner: str = "fast", stream: bool = False, timings: bool = False, colour: bool = False, cache: bool = False, profile: bool = False, profile_output: Path | None = None, max_steps: int | None = None, timeout: float | None = None, quicken: bool = True, intern_strings: bool = False):
         self.had_error = False
         self.had_runtime_error = False
-        self.interpreter = Interpreter(repl_mode=False)
+        self.optimise = optimise
+        self.stream = stream
+        self.scanner = SCANNERS[scanner]
+        self.interpreter = ENGINES[engine](repl_mode=False)
+        # Plain buffered output unless asked for colours; the REPL decides for itself
+        self.interpreter.use_colour(colour)
+        # Type-feedback specialisation of the tree-walker's arithmetic (the other engines ignore it)
+        self.interpreter.quickening = quicken
+        # Interning of concatenated strings, which literals always get
+        self.interpreter.interning = intern_strings
         self.astprinter = AstPrinter(rev_polish_notation=False)
+        # Per-phase timings and counters, only collected when asked for
+        self.timings = Timings() if timings else None
+        if self.timings is not None:
+            self.interpreter.instrument(self.timings)
+        # Line-level profile of everything run, only collected when asked for
+        self.profiler = Profiler() if profile or profile_output else None
+        self.profile_output = profile_output
+        if self.profiler is not None:
+            self.interpreter.profile(self.profiler)
+        # Steps and seconds every run may use, only enforced when asked for
+        self.budget = None if max_steps is None and timeout is None else Budget(max_steps, timeout)
+        if self.budget is not None:
+            self.interpreter.limit(self.budget)
+        # Resolved programs of script files, cached on disk. Never for limited runs: those are for scripts that aren't trusted,
+        # and neither is a cache directory next to them
+        self.cache = ProgramCache() if cache and self.budget is None else None
+
+    def phase(self, name: str) -> AbstractContextManager:
+        return nullcontext() if self.timings is None else self.timings.phase(name)
+
+    def report_timings(self) -> None:
+        if self.timings is not None:
+            from rich.console import Console
+            Console(stderr=True).print(self.timings.table())
+
+    def report_profile(self, source: str | None = None, name: str = "<lox>") -> None:
+        if self.profiler is None:
+            return
+        from rich.console import Console
+        Console(stderr=True).print(self.profiler.table(source))
+        if self.profile_output is not None:
+            self.profiler.write_collapsed(self.profile_output, name)
 
     def report(self, line: int, where: str, message: str) -> None:
         # logger.error(f"[line {line}] Error {where}: {message}")
+        from rich import print as rprint
         rprint(f"[line {line}] Error {where}: {message}")
         self.had_error = True
         return
@@ -43,48 +106,99 @@ class Lox:
         return
 
     def runtime_error(self, error: LoxRuntimeError):
-        logger.error(f"[line {error.token.line}] {error.message}")
+        logger.error(f"[line {error.line}] {error.message}")
         self.had_runtime_error = True
         return
 
-    def run(self, source: str, repl_mode=False) -> None:
+    def parse(self, source: str, repl_mode=False) -> list[Stmt] | None:
+        """Scans, parses and resolves the source. Returns None if any errors were reported"""
         # Scan
         logger.debug("Creating Scanner")
-        scanner = Scanner(source)
-        try:
-            logger.debug("Generating tokens")
-            tokens = scanner.scan_tokens()
-            scanner.log_tokens()
-        except ScannerError as e:
-            self.report(e.line, "", e.message)
-            return
-        finally:
-            if self.had_error:
+        scanner = self.scanner(source)
+        if self.stream:
+            # Tokens are scanned as the Parser asks for them, so scanner errors surface while parsing
+            logger.debug("Streaming tokens")
+            tokens = scanner.stream_tokens()
+        else:
+            try:
+                logger.debug("Generating tokens")
+                with self.phase("scan"):
+                    tokens = scanner.scan_tokens()
+                if logger.isEnabledFor(logging.INFO):
+                    scanner.log_tokens()
+            except ScannerError as e:
+                self.report(e.line, "", e.message)
                 return
+            finally:
+                if self.had_error:
+                    return
         
         # Parse
         try:
             logger.debug("Creating parser")
-            parser = Parser(tokens, repl_mode)
-            logger.debug("Generating expression tree")
-            statements = parser.parse()
-            for statement in statements:
-                logger.info(statement)
+            with self.phase("parse"):
+                parser = Parser(tokens, repl_mode)
+                logger.debug("Generating expression tree")
+                statements = parser.parse()
+            if logger.isEnabledFor(logging.INFO):
+                for statement in statements:
+                    logger.info(statement)
+        except ScannerError as e:
+            self.report(e.line, "", e.message)
         except ParserError as e:
             self.error(e.token, e.message)
         else:
-            logger.debug("Rendering AST")
-            for statement in statements:
-                logger.info(self.astprinter.print(statement))
+            if self.timings is not None:
+                # Tokens consumed, plus EOF
+                self.timings.tokens += parser.current + 1
+                self.timings.nodes += count_nodes(statements)
+            if logger.isEnabledFor(logging.INFO):
+                logger.debug("Rendering AST")
+                for statement in statements:
+                    logger.info(self.astprinter.print(statement))
         finally:
             if self.had_error:
                 return
 
-        # Interpret
+        # Optimise
+        if self.optimise:
+            logger.debug("Optimising AST")
+            optimiser = Optimiser(repl_mode)
+            with self.phase("optimise"):
+                statements = optimiser.optimise(statements)
+            logger.debug(f"Folded {optimiser.folded} expressions, pruned {optimiser.pruned} statements")
+            if logger.isEnabledFor(logging.INFO):
+                for statement in statements:
+                    logger.info(self.astprinter.print(statement))
+
+        # Resolve
+        try:
+            logger.debug("Resolving variables")
+            with self.phase("resolve"):
+                Resolver().resolve(statements)
+        except ResolverError as e:
+            self.error(e.token, e.message)
+            return
+        return statements
+
+    def run(self, source: str, repl_mode=False) -> None:
+        statements = self.parse(source, repl_mode)
+        if statements is None:
+            return
+        self.execute(statements, repl_mode)
+
+    def execute(self, statements: list[Stmt], repl_mode=False) -> None:
         self.interpreter.repl_mode = repl_mode
+        if self.budget is not None:
+            self.budget.start()
         try:
             logger.debug("Running interpreter")
-            self.interpreter.interpret(statements)
+            with self.phase("execute"):
+                try:
+                    self.interpreter.interpret(statements)
+                finally:
+                    # Whatever was printed before an error goes out before the error is reported
+                    self.interpreter.output.flush()
         except LoxRuntimeError as e:
             self.runtime_error(e)
         return
@@ -92,17 +206,54 @@ class Lox:
     def run_file(self, file: Path):
         with io.open(file, mode="r", encoding="utf-8") as f:
             source = f.read()
-        self.run(source)
+        if self.cache is None:
+            self.run(source)
+        else:
+            self.run_cached(file, source)
+        self.report_timings()
+        self.report_profile(source, file.name)
         if self.had_error: sys.exit(65)
         if self.had_runtime_error: sys.exit(70)
         return
 
+    def run_cached(self, file: Path, source: str) -> None:
+        """Runs the cached program for the source if there is one, otherwise parses it and caches the result"""
+        with self.phase("cache"):
+            statements = self.cache.load(file, source, self.optimise)
+        if statements is None:
+            statements = self.parse(source)
+            if statements is not None:
+                with self.phase("cache"):
+                    self.cache.store(file, source, self.optimise, statements)
+
+        if self.timings is not None:
+            self.timings.cache_hits = self.cache.hits
+            self.timings.cache_misses = self.cache.misses
+        if statements is not None:
+            self.execute(statements)
+
+    def compile_file(self, file: Path, output: Path) -> None:
+        """Translates a Lox script into a Python module with a run() entry point"""
+        with io.open(file, mode="r", encoding="utf-8") as f:
+            source = f.read()
+        statements = self.parse(source)
+        if self.had_error: sys.exit(65)
+
+        from pylox.engine.transpiler import Transpiler
+        module = Transpiler().transpile(statements, source_name=file.name)
+        with io.open(output, mode="w", encoding="utf-8") as f:
+            f.write(module)
+        return
+
     def print_prompt(self) -> None:
+        from rich import print as rprint
         rprint("[bold white]>[/bold white] ", end="")
         return
 
     def run_prompt(self):
         logger.debug("Starting prompt")
+        # Colours for people at a terminal, plain text when input is piped in
+        self.interpreter.use_colour(sys.stdout.isatty())
         while True:
             self.print_prompt()
             try:
@@ -115,5 +266,6 @@ class Lox:
                 break
             except EOFError:
                 break
+        self.report_timings()
         sys.exit(64)
         return
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""loxcallable.py
+
+Module for defining the interface of callable Lox values (functions and natives)
+"""
+
+from abc import ABC, abstractmethod
+
+class LoxCallable(ABC):
+
+    @abstractmethod
+    def arity(self) -> int:
+        pass
+
+    @abstractmethod
+    def call(self, interpreter, arguments: list[object]) -> object:
+        pass
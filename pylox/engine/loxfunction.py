@@ -0,0 +1,81 @@
+"""loxfunction.py
+
+Module for Lox functions, the callables created by function declarations
+"""
+
+from contextlib import contextmanager
+import sys
+from typing import Iterator
+# app
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.environment import LocalEnvironment
+import pylox.engine.stmt as stmt
+
+# Deepest call stack allowed. Deeper recursion is reported as a Lox error, before the transpiled code
+# (whose calls also recurse in C) could exhaust the C stack
+FRAMES_MAX = 1000
+
+# Python frames a Lox call takes on the tree-walker, the deepest engine, with some room for nested blocks and loops
+PYTHON_FRAMES_PER_CALL = 40
+
+@contextmanager
+def call_stack() -> Iterator[None]:
+    """Raises Python's recursion limit (for as long as it's entered) to fit FRAMES_MAX calls on the engines that recurse.
+    Calls nested more deeply in statements than that allows still end in a RecursionError, which the call sites
+    report as a stack overflow
+    """
+    limit = sys.getrecursionlimit()
+    if limit >= FRAMES_MAX * PYTHON_FRAMES_PER_CALL:
+        yield
+        return
+    sys.setrecursionlimit(FRAMES_MAX * PYTHON_FRAMES_PER_CALL)
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+# Returned (not raised) by a statement when a return statement ran inside it. Statements that run others pass it on
+# until it gets to the call, which takes the value from the interpreter, so returning costs no exception
+RETURN = object()
+
+class LoxFunction(LoxCallable):
+    """A function declaration closed over the environment it was declared in.
+    Its arity is worked out once, when the declaration runs. Its frame (the environment of its parameters and
+    the body's own declarations) is reused from call to call, unless a nested function may capture it
+    """
+
+    __slots__ = ("declaration", "closure", "parameters", "padding", "frames")
+
+    def __init__(self, declaration: stmt.Function, closure):
+        self.declaration = declaration
+        self.closure = closure
+        self.parameters = len(declaration.params)
+        # Slots of the body's own declarations, which follow the parameters
+        self.padding = [None] * (declaration.size - self.parameters)
+        # Free frames, or None when every call needs a fresh one
+        self.frames: list[LocalEnvironment] | None = None if declaration.captured else []
+
+    def arity(self) -> int:
+        return self.parameters
+
+    def frame(self, arguments: list[object]) -> LocalEnvironment:
+        """A frame whose slots start with the arguments. The list itself becomes the slots, so it must be a new one"""
+        arguments.extend(self.padding)
+        frames = self.frames
+        if frames:
+            frame = frames.pop()
+        else:
+            frame = LocalEnvironment(self.closure, 0)
+        frame.values = arguments
+        return frame
+
+    def release(self, frame: LocalEnvironment) -> None:
+        """Hands back a frame once its call is over"""
+        if self.frames is not None:
+            self.frames.append(frame)
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return interpreter.call_function(self, arguments)
+
+    def __str__(self):
+        return f"<fn {self.declaration.name.lexeme}>"
@@ -7,10 +7,12 @@ Module for parsing lox tokens into an AST
 from pylox.utils import new_logger
 logger = new_logger(__name__)
 
+from typing import Iterable, Iterator
 from pylox.engine.errors import Error
 
 from pylox.engine.loxtoken import Token, TokenType
-from pylox.engine.expr import Expr, Binary, Unary, Literal, Grouping, Variable, Assign
+from pylox.engine.tokenbuffer import TokenBuffer
+from pylox.engine.expr import Expr, Binary, Unary, Literal, Grouping, Variable, Assign, Call
 from pylox.engine.stmt import Stmt
 import pylox.engine.stmt as stmt
 
@@ -22,26 +24,61 @@ class ParserError(Error):
         self.token = token
 
 class Parser:
-
-    def __init__(self, tokens: list[Token], repl_mode: bool):
-        self.tokens = tokens
+    """Parses tokens from any iterable ending with an EOF token, e.g. a list from
+    Scanner.scan_tokens or the generator from Scanner.stream_tokens.
+
+    Tokens are pulled one at a time and only the current and previous tokens are kept,
+    so a streamed source never has to be held in memory as a whole.
+    A TokenBuffer gets a BufferParser instead, which reads it by index
+    """
+
+    def __new__(cls, tokens: Iterable[Token], repl_mode: bool):
+        if cls is Parser and isinstance(tokens, TokenBuffer):
+            cls = BufferParser
+        return super().__new__(cls)
+
+    def __init__(self, tokens: Iterable[Token], repl_mode: bool):
+        self.tokens = iter(tokens)
+        # The window: peek() and previous()
+        self.lookahead: Token = next(self.tokens)
+        self.last: Token | None = None
+        # Number of tokens consumed so far
         self.current = 0
         self.repl_mode = repl_mode
 
     def parse(self) -> list[Stmt]:
-        statements = list()
+        return list(self.statements())
+
+    def statements(self) -> Iterator[Stmt]:
+        """Yields each top-level statement as soon as its tokens have been parsed"""
         while (not self.is_at_end()):
-            statements.append(self.declaration())
-        return statements
+            yield self.declaration()
 
     def declaration(self) -> Stmt:
         try:
+            if self.match(TokenType.FUN): return self.function("function")
             if self.match(TokenType.VAR): return self.var_declaration()
             return self.statement()
         except ParserError as e:
             self.synchronize()
             raise
             
+    def function(self, kind: str) -> stmt.Function:
+        name: Token = self.consume(TokenType.IDENTIFIER, f"Expect {kind} name.")
+        self.expect(TokenType.LEFT_PAREN, f"Expect '(' after {kind} name.")
+        params: list[Token] = list()
+        if not self.check(TokenType.RIGHT_PAREN):
+            params.append(self.consume(TokenType.IDENTIFIER, "Expect parameter name."))
+            while self.match(TokenType.COMMA):
+                if len(params) >= 255:
+                    raise self.error(self.peek(), "Can't have more than 255 parameters.")
+                params.append(self.consume(TokenType.IDENTIFIER, "Expect parameter name."))
+        self.expect(TokenType.RIGHT_PAREN, "Expect ')' after parameters.")
+
+        self.expect(TokenType.LEFT_BRACE, f"Expect '{{' before {kind} body.")
+        body = self.block()
+        return stmt.Function(name, params, body)
+
     def var_declaration(self):
         name: Token = self.consume(TokenType.IDENTIFIER, "Expect variable name")
 
@@ -49,19 +86,21 @@ class Parser:
         if self.match(TokenType.EQUAL):
             initializer = self.expression()
 
-        self.consume(TokenType.SEMICOLON, "Expect ';' after variable declaration")
+        self.expect(TokenType.SEMICOLON, "Expect ';' after variable declaration")
         return stmt.Var(name, initializer)
 
     def statement(self) -> Stmt:
         if self.match(TokenType.IF): return self.if_stmt()
         if self.match(TokenType.PRINT): return self.print_stmt()
+        if self.match(TokenType.RETURN): return self.return_stmt()
+        if self.match(TokenType.WHILE): return self.while_stmt()
         if self.match(TokenType.LEFT_BRACE): return stmt.Block(self.block())
         return self.expr_stmt()
     
     def if_stmt(self) -> Stmt:
-        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
+        self.expect(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
         condition = self.expression()
-        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after if condition.")
+        self.expect(TokenType.RIGHT_PAREN, "Expect ')' after if condition.")
 
         then_branch = self.statement()
         else_branch = None
@@ -72,31 +111,48 @@ class Parser:
 
     def print_stmt(self) -> Stmt:
         value: Expr = self.expression()
-        self.consume(TokenType.SEMICOLON, "Expect ';' after value.")
+        self.expect(TokenType.SEMICOLON, "Expect ';' after value.")
         return stmt.Print(value)
 
+    def return_stmt(self) -> Stmt:
+        keyword: Token = self.previous()
+        value: Expr = None
+        if not self.check(TokenType.SEMICOLON):
+            value = self.expression()
+
+        self.expect(TokenType.SEMICOLON, "Expect ';' after return value.")
+        return stmt.Return(keyword, value)
+
+    def while_stmt(self) -> Stmt:
+        self.expect(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
+        condition = self.expression()
+        self.expect(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
+        body = self.statement()
+
+        return stmt.While(condition, body)
+
     def block(self):
         statements: list[Stmt] = list()
         while not self.check(TokenType.RIGHT_BRACE) and not self.is_at_end():
             statements.append(self.declaration())
 
-        self.consume(TokenType.RIGHT_BRACE, "Expect '}' after block.")
+        self.expect(TokenType.RIGHT_BRACE, "Expect '}' after block.")
         return statements
 
     def expr_stmt(self):
         value: Expr = self.expression()
         if not self.repl_mode:
-            self.consume(TokenType.SEMICOLON, "Expect ';' after value.")
+            self.expect(TokenType.SEMICOLON, "Expect ';' after value.")
         return stmt.Expression(value)
 
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.lookahead
 
     def is_at_end(self) -> bool:
-        return self.peek().tokentype == TokenType.EOF
+        return self.lookahead.tokentype == TokenType.EOF
     
     def previous(self) -> Token:
-        return self.tokens[self.current-1]
+        return self.last
 
     def error(self, token: Token, message: str):
         return ParserError(token, message)
@@ -118,8 +174,10 @@ class Parser:
                     
     def advance(self) -> Token:
         if not self.is_at_end():
+            self.last = self.lookahead
+            self.lookahead = next(self.tokens)
             self.current += 1
-        return self.previous()
+        return self.last
 
     def check(self, type: TokenType) -> bool:
         if self.is_at_end(): return False
@@ -138,6 +196,16 @@ class Parser:
         else:
             raise self.error(self.peek(), message)
 
+    def expect(self, toktype: TokenType, message: str) -> None:
+        """consume(), for a token the AST doesn't keep (e.g. a semicolon)"""
+        if self.check(toktype):
+            self.advance()
+        else:
+            raise self.error(self.peek(), message)
+
+    def previous_literal(self) -> object:
+        return self.previous().literal
+
     def primary(self):
         if self.match(TokenType.FALSE): return Literal(False)
         if self.match(TokenType.TRUE): return Literal(True)
@@ -145,11 +213,11 @@ class Parser:
         if self.match(TokenType.IDENTIFIER): return Variable(self.previous())
 
         if self.match(TokenType.NUMBER, TokenType.STRING):
-            return Literal(self.previous().literal)
+            return Literal(self.previous_literal())
 
         if self.match(TokenType.LEFT_PAREN):
             expr = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+            self.expect(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
             return Grouping(expr)
 
         raise self.error(self.peek(), "Expect expression.")
@@ -159,7 +227,29 @@ class Parser:
             operator: Token = self.previous()
             right = self.unary()
             return Unary(operator, right)
-        return self.primary()
+        return self.call()
+
+    def finish_call(self, callee: Expr) -> Expr:
+        arguments: list[Expr] = list()
+        if not self.check(TokenType.RIGHT_PAREN):
+            arguments.append(self.expression())
+            while self.match(TokenType.COMMA):
+                if len(arguments) >= 255:
+                    raise self.error(self.peek(), "Can't have more than 255 arguments.")
+                arguments.append(self.expression())
+
+        paren: Token = self.consume(TokenType.RIGHT_PAREN, "Expect ')' after arguments.")
+        return Call(callee, paren, arguments)
+
+    def call(self) -> Expr:
+        expr = self.primary()
+
+        while True:
+            if self.match(TokenType.LEFT_PAREN):
+                expr = self.finish_call(expr)
+            else:
+                break
+        return expr
 
     def factor(self):
         expr: Expr = self.unary()
@@ -212,4 +302,59 @@ class Parser:
                 return Assign(name, value)
             
             self.error(equals, "Invalid assignment target")
-        return expr
\ No newline at end of file
+        return expr
+
+EOF = TokenType.EOF.value
+
+class BufferParser(Parser):
+    """Parses a TokenBuffer by index. Checks compare token types with the buffer's column of ints, and Tokens
+    are only built for what the parser hands out: the names, operators and keywords the AST keeps, and the tokens
+    of errors. Literals are read from the buffer without a Token
+    """
+
+    def __init__(self, tokens: TokenBuffer, repl_mode: bool):
+        self.buffer = tokens
+        self.types = tokens.types
+        # Index of the lookahead, which is also the number of tokens consumed so far
+        self.current = 0
+        self.repl_mode = repl_mode
+
+    # TokenType._value_ rather than .value, which is a property and costs a call every check
+
+    def peek(self) -> Token:
+        return self.buffer[self.current]
+
+    def is_at_end(self) -> bool:
+        return self.types[self.current] == EOF
+
+    def previous(self) -> Token:
+        return self.buffer[self.current - 1] if self.current else None
+
+    def previous_literal(self) -> object:
+        return self.buffer.literal(self.current - 1)
+
+    def advance(self) -> Token:
+        if self.types[self.current] != EOF:
+            self.current += 1
+        return self.previous()
+
+    def check(self, type: TokenType) -> bool:
+        return self.types[self.current] == type._value_ != EOF
+
+    def match(self, *types: list[TokenType]) -> bool:
+        current = self.types[self.current]
+        for type in types:
+            if current == type._value_ != EOF:
+                self.current += 1
+                return True
+        return False
+
+    def consume(self, toktype: TokenType, message: str) -> Token:
+        self.expect(toktype, message)
+        return self.buffer[self.current - 1]
+
+    def expect(self, toktype: TokenType, message: str) -> None:
+        if self.types[self.current] == toktype._value_ != EOF:
+            self.current += 1
+        else:
+            raise self.error(self.peek(), message)
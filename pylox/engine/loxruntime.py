@@ -0,0 +1,162 @@
+"""loxruntime.py
+
+Module for the runtime support used by Python modules generated by the Transpiler.
+Generated code inlines the common (fast) paths and only calls in here for globals, calls, captured variables, printing and errors
+"""
+
+import operator
+import sys
+from types import TracebackType
+from typing import Callable
+# app
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.loxfunction import FRAMES_MAX, call_stack
+from pylox.engine.environment import Cell
+from pylox.engine.natives import NATIVES
+from pylox.engine.interpreter import Interpreter, LoxRuntimeError
+from pylox.engine.vectors import Vector, NativeError, has_vector, check_operands
+
+# Generated code has no Interpreter of its own, but natives are called with one,
+# and printing goes through the same output as the other engines
+host = Interpreter(repl_mode=False)
+
+# Slow paths of the numeric operators, for vector operands
+OPERATORS: dict[str, Callable[[object, object], object]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+class Function(LoxCallable):
+    """A Lox function, translated into a Python function taking the Lox arguments"""
+
+    __slots__ = ("function", "name", "parameters")
+
+    def __init__(self, function: Callable[..., object], name: str, parameters: int):
+        self.function = function
+        self.name = name
+        self.parameters = parameters
+
+    def arity(self) -> int:
+        return self.parameters
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return self.function(*arguments)
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+def print_value(value: object) -> None:
+    host.output.write(value)
+
+def get_global(globals: dict[str, object], name: str, line: int) -> object:
+    """Slow path of a global read: the value is None, so the variable is undefined or uninitialized"""
+    if name in globals:
+        raise LoxRuntimeError(None, f"Uninitialized variable '{name}'", line)
+    raise LoxRuntimeError(None, f"Undefined variable '{name}'.", line)
+
+def assign_global(globals: dict[str, object], name: str, value: object, line: int) -> object:
+    if name not in globals:
+        raise LoxRuntimeError(None, f"Undefined variable '{name}'.", line)
+    globals[name] = value
+    return value
+
+def set_cell(cell: Cell, value: object) -> object:
+    """Assignment to a local captured by a nested function"""
+    cell.value = value
+    return value
+
+def uninitialized(name: str, line: int):
+    raise LoxRuntimeError(None, f"Uninitialized variable '{name}'", line)
+
+def number_operand(value: object, line: int):
+    if isinstance(value, Vector):
+        return -value
+    raise LoxRuntimeError(None, "Operand must be a number.", line)
+
+def number_operands(left: object, right: object, line: int, op: str):
+    if has_vector(left, right):
+        message = check_operands(left, right, op)
+        if message is None:
+            return OPERATORS[op](left, right)
+        raise LoxRuntimeError(None, message, line)
+    if not (isinstance(left, float) and isinstance(right, float)):
+        raise LoxRuntimeError(None, "Operands must be the numbers.", line)
+    raise LoxRuntimeError(None, "Division by Zero is undefined", line)
+
+def add_operands(left: object, right: object, line: int):
+    if has_vector(left, right):
+        message = check_operands(left, right, "+")
+        if message is None:
+            return left + right
+        raise LoxRuntimeError(None, message, line)
+    raise LoxRuntimeError(None, "Operands must be two numbers or two strings", line)
+
+def call(callee: object, arguments: list[object], line: int) -> object:
+    if callee.__class__ is Function:
+        if len(arguments) != callee.parameters:
+            raise LoxRuntimeError(None, f"Expected {callee.parameters} arguments but got {len(arguments)}.", line)
+        if host.depth == FRAMES_MAX:
+            raise LoxRuntimeError(None, "Stack overflow.", line)
+        host.depth += 1
+        try:
+            return callee.function(*arguments)
+        except RecursionError:
+            # Python's stack ran out first, as in Interpreter.visit_call
+            raise LoxRuntimeError(None, "Stack overflow.", line)
+        finally:
+            host.depth -= 1
+
+    if not isinstance(callee, LoxCallable):
+        raise LoxRuntimeError(None, "Can only call functions and classes.", line)
+    if len(arguments) != callee.arity():
+        raise LoxRuntimeError(None, f"Expected {callee.arity()} arguments but got {len(arguments)}.", line)
+    try:
+        return callee.call(host, arguments)
+    except NativeError as e:
+        raise LoxRuntimeError(None, e.message, line)
+
+def lox_line(traceback: TracebackType | None, filename: str, line_map: dict[int, int]) -> int | None:
+    """Maps the innermost traceback frame in the generated module back to a Lox line"""
+    lineno = None
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == filename:
+            lineno = traceback.tb_lineno
+        traceback = traceback.tb_next
+    if lineno is None:
+        return None
+    # Statements can span several Python lines, so fall back to the closest mapped line above
+    candidates = [line for line in line_map if line <= lineno]
+    return line_map[max(candidates)] if candidates else None
+
+def run_module(main: Callable, line_map: dict[int, int], globals: dict[str, object] | None = None) -> dict[str, object]:
+    """Runs a generated module's code, returning the Lox globals it defined.
+    Any error is raised as a LoxRuntimeError carrying the original Lox line
+    """
+    lox_globals: dict[str, object] = dict(NATIVES)
+    if globals:
+        lox_globals.update(globals)
+
+    try:
+        with call_stack():
+            main(lox_globals)
+    except LoxRuntimeError:
+        raise
+    except Exception as e:
+        line = lox_line(e.__traceback__, main.__code__.co_filename, line_map)
+        raise LoxRuntimeError(None, str(e), line) from e
+    finally:
+        host.output.flush()
+    return lox_globals
+
+def main(run: Callable) -> None:
+    """Entry point when a generated module is run as a script"""
+    try:
+        run()
+    except LoxRuntimeError as e:
+        print(f"[line {e.line}] {e.message}", file=sys.stderr)
+        sys.exit(70)
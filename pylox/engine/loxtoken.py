@@ -58,12 +58,15 @@ class TokenType(Enum):
     # End of file
     EOF = auto()
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Token:
     tokentype: TokenType
     lexeme: str
     literal: object
     line: int
 
+    def __reduce__(self):
+        return (Token, (self.tokentype, self.lexeme, self.literal, self.line))
+
     def __str__(self):
         return f"{self.tokentype} {self.lexeme} {self.lexeme}"
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""natives.py
+
+Module for native functions that are built into every Lox environment
+"""
+
+import time
+from typing import Callable
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.vectors import FUNCTIONS as VECTOR_FUNCTIONS
+
+class Clock(LoxCallable):
+    """Returns the wall clock time in seconds, used for benchmarking"""
+
+    def arity(self) -> int:
+        return 0
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return time.time()
+
+    def __str__(self):
+        return "<native fn>"
+
+class Native(LoxCallable):
+    """Calls a Python function with the Lox arguments; its arity is that of the function.
+    Errors are raised as NativeError, which the engines report at the line of the call
+    """
+
+    def __init__(self, function: Callable[..., object]):
+        self.function = function
+        self.parameters = function.__code__.co_argcount
+
+    def arity(self) -> int:
+        return self.parameters
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return self.function(*arguments)
+
+    def __str__(self):
+        return "<native fn>"
+
+NATIVES: dict[str, LoxCallable] = {
+    "clock": Clock(),
+    **{name: Native(function) for name, function in VECTOR_FUNCTIONS.items()},
+}
@@ -0,0 +1,211 @@
+"""optimiser.py
+
+Module for the Optimiser pass, which runs between the Parser and the Resolver.
+It folds constant subtrees, removes Grouping nodes, prunes branches with constant
+conditions and applies algebraic simplifications that can't change what a program does
+"""
+
+# stdlib
+from sys import intern
+# logs
+import logging
+from pylox.utils import new_logger
+logger = new_logger(__name__)
+# app
+from pylox.engine.loxtoken import TokenType
+from pylox.cli.astprinter import AstPrinter
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+from pylox.engine.interpreter import Interpreter, LoxRuntimeError
+from pylox.engine.ropes import Rope
+
+NUMERIC_OPERATORS = (TokenType.MINUS, TokenType.STAR, TokenType.SLASH)
+BOOLEAN_OPERATORS = (
+    TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL,
+    TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL,
+)
+
+class Optimiser(expr.Visitor, stmt.Visitor):
+    """Rewrites the AST in place. Visitors return the (possibly replaced) node,
+    or None for statements that were removed entirely.
+
+    Constant subtrees are evaluated with the Interpreter itself, so folding can't disagree with it.
+    A subtree whose evaluation raises (e.g. a division by zero) is left alone, so the error is
+    still raised at runtime, at the same line
+    """
+
+    def __init__(self, repl_mode: bool = False):
+        self.repl_mode = repl_mode
+        self.evaluator = Interpreter(repl_mode=False)
+        # Folded nodes are replaced, so there's nothing to gain from specialising them
+        self.evaluator.quickening = False
+        # Folded strings become literals, which are interned like the scanned ones
+        self.evaluator.interning = True
+        self.printer = AstPrinter()
+        self.folded = 0
+        self.pruned = 0
+
+    def optimise(self, statements: list[stmt.Stmt]) -> list[stmt.Stmt]:
+        optimised = list()
+        for statement in statements:
+            statement = statement.accept(self)
+            if statement is not None:
+                optimised.append(statement)
+        return optimised
+
+    def optimise_body(self, body: stmt.Stmt) -> stmt.Stmt:
+        """Optimises the body of an if/while, which has to stay a statement even if it was removed"""
+        body = body.accept(self)
+        return stmt.Block([]) if body is None else body
+
+    def fold(self, node: expr.Unary | expr.Binary, line: int) -> expr.Expr:
+        try:
+            value = self.evaluator.evaluate(node)
+        except LoxRuntimeError:
+            return node
+
+        if value.__class__ is Rope:
+            # Literals hold plain strings, interned like the others
+            value = intern(value.flatten())
+        self.folded += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[line {line}] Folded {self.printer.print(node)} into {value!r}")
+        return expr.Literal(value, folded=True)
+
+    def is_number(self, node: expr.Expr) -> bool:
+        """Whether node always evaluates to a number (if it evaluates at all)"""
+        if isinstance(node, expr.Literal):
+            return isinstance(node.value, float)
+        if isinstance(node, expr.Unary):
+            return node.operator.tokentype == TokenType.MINUS
+        if isinstance(node, expr.Binary):
+            if node.operator.tokentype in NUMERIC_OPERATORS:
+                return True
+            if node.operator.tokentype == TokenType.PLUS:
+                return self.is_number(node.left) and self.is_number(node.right)
+        return False
+
+    def is_boolean(self, node: expr.Expr) -> bool:
+        """Whether node always evaluates to true or false (if it evaluates at all)"""
+        if isinstance(node, expr.Literal):
+            return isinstance(node.value, bool)
+        if isinstance(node, expr.Unary):
+            return node.operator.tokentype == TokenType.BANG
+        if isinstance(node, expr.Binary):
+            return node.operator.tokentype in BOOLEAN_OPERATORS
+        return False
+
+    def prune(self, what: str, condition: expr.Expr) -> None:
+        self.pruned += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Pruned {what} {self.printer.print(condition)}")
+
+    # --- Statements
+
+    def visit_expression(self, stmt: stmt.Expression) -> stmt.Stmt | None:
+        stmt.expression = stmt.expression.accept(self)
+        # A bare constant does nothing, unless the REPL is going to print it
+        if isinstance(stmt.expression, expr.Literal) and not self.repl_mode:
+            self.prune("constant expression statement", stmt.expression)
+            return None
+        return stmt
+
+    def visit_print(self, stmt: stmt.Print) -> stmt.Stmt:
+        stmt.expression = stmt.expression.accept(self)
+        return stmt
+
+    def visit_var(self, stmt: stmt.Var) -> stmt.Stmt:
+        if stmt.initializer is not None:
+            stmt.initializer = stmt.initializer.accept(self)
+        return stmt
+
+    def visit_block(self, stmt: stmt.Block) -> stmt.Stmt:
+        stmt.statements = self.optimise(stmt.statements)
+        return stmt
+
+    def visit_function(self, stmt: stmt.Function) -> stmt.Stmt:
+        stmt.body = self.optimise(stmt.body)
+        return stmt
+
+    def visit_return(self, stmt: stmt.Return) -> stmt.Stmt:
+        if stmt.value is not None:
+            stmt.value = stmt.value.accept(self)
+        return stmt
+
+    def visit_if(self, stmt: stmt.If) -> stmt.Stmt | None:
+        stmt.condition = stmt.condition.accept(self)
+        if not isinstance(stmt.condition, expr.Literal):
+            stmt.then_branch = self.optimise_body(stmt.then_branch)
+            if stmt.else_branch is not None:
+                stmt.else_branch = self.optimise_body(stmt.else_branch)
+            return stmt
+
+        if self.evaluator.is_truthy(stmt.condition.value):
+            self.prune("else branch of if", stmt.condition)
+            return stmt.then_branch.accept(self)
+
+        self.prune("then branch of if", stmt.condition)
+        if stmt.else_branch is None:
+            return None
+        return stmt.else_branch.accept(self)
+
+    def visit_while(self, stmt: stmt.While) -> stmt.Stmt | None:
+        stmt.condition = stmt.condition.accept(self)
+        if isinstance(stmt.condition, expr.Literal) and not self.evaluator.is_truthy(stmt.condition.value):
+            self.prune("while loop", stmt.condition)
+            return None
+        stmt.body = self.optimise_body(stmt.body)
+        return stmt
+
+    # --- Expressions
+
+    def visit_literal(self, expr: expr.Literal) -> expr.Expr:
+        return expr
+
+    def visit_grouping(self, expr: expr.Grouping) -> expr.Expr:
+        # Groupings only matter to the Parser; the tree structure already encodes them
+        return expr.expression.accept(self)
+
+    def visit_variable(self, expr: expr.Variable) -> expr.Expr:
+        return expr
+
+    def visit_assign(self, expr: expr.Assign) -> expr.Expr:
+        expr.value = expr.value.accept(self)
+        return expr
+
+    def visit_call(self, expr: expr.Call) -> expr.Expr:
+        expr.callee = expr.callee.accept(self)
+        expr.arguments = [argument.accept(self) for argument in expr.arguments]
+        return expr
+
+    def visit_unary(self, node: expr.Unary) -> expr.Expr:
+        node.right = node.right.accept(self)
+        right = node.right
+
+        if isinstance(right, expr.Literal):
+            return self.fold(node, node.operator.line)
+
+        # --x is x and !!x is x, but only when x already is a number/boolean;
+        # otherwise the inner operator may raise an error or convert the value
+        if isinstance(right, expr.Unary) and right.operator.tokentype == node.operator.tokentype:
+            if node.operator.tokentype == TokenType.MINUS and self.is_number(right.right):
+                return right.right
+            if node.operator.tokentype == TokenType.BANG and self.is_boolean(right.right):
+                return right.right
+        return node
+
+    def visit_binary(self, node: expr.Binary) -> expr.Expr:
+        node.left = node.left.accept(self)
+        node.right = node.right.accept(self)
+
+        if isinstance(node.left, expr.Literal) and isinstance(node.right, expr.Literal):
+            return self.fold(node, node.operator.line)
+
+        # x * 1 and x / 1 are x when x is a number. (x + 0 isn't: -0 + 0 is 0,
+        # and the operand checks reject a right-hand 0 for the other operators)
+        if node.operator.tokentype in (TokenType.STAR, TokenType.SLASH) \
+                and isinstance(node.right, expr.Literal) and node.right.value == 1.0 \
+                and isinstance(node.right.value, float) and self.is_number(node.left):
+            self.folded += 1
+            return node.left
+        return node
@@ -0,0 +1,70 @@
+"""output.py
+
+Module for the ways Lox values get printed: plain text written in batches to sys.stdout
+(scripts and pipes), or colourised with Rich markup (the REPL)
+"""
+
+import sys
+from typing import Callable, TextIO
+# app
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.vectors import Vector
+
+def to_text(obj: object) -> str:
+    """Same text as Interpreter.stringify, without the markup"""
+    if obj is None: return "nil"
+
+    if isinstance(obj, float):
+        text = str(obj)
+        if text.endswith(".0"):
+            text = text[0:len(text) - 2]
+        return text
+
+    if isinstance(obj, bool):
+        return "true" if obj else "false"
+
+    if isinstance(obj, (LoxCallable, Vector)):
+        return str(obj)
+
+    return f"'{obj}'"
+
+class PlainOutput:
+    """Formats values natively and writes them to a stream (by default sys.stdout), one write per batch of lines.
+    sys.stdout is looked up on every flush, so redirecting it (e.g. in tests) works as expected
+    """
+
+    BATCH = 1024
+
+    def __init__(self, stream: TextIO | None = None):
+        self.pending: list[str] = []
+        self.stream = stream
+
+    def write(self, value: object) -> None:
+        self.pending.append(to_text(value))
+        if len(self.pending) >= self.BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        stream = sys.stdout if self.stream is None else self.stream
+        if self.pending:
+            self.pending.append("")
+            stream.write("\n".join(self.pending))
+            self.pending.clear()
+        stream.flush()
+
+class RichOutput:
+    """Prints each value straight away, colourised with the markup from stringify"""
+
+    def __init__(self, stringify: Callable[[object], str]):
+        self.stringify = stringify
+        self.rprint: Callable[..., None] | None = None
+
+    def write(self, value: object) -> None:
+        if self.rprint is None:
+            # Rich is only imported once something gets printed
+            from rich import print as rprint
+            self.rprint = rprint
+        self.rprint(self.stringify(value))
+
+    def flush(self) -> None:
+        return
@@ -0,0 +1,141 @@
+"""profiler.py
+
+Module for the line-level profiler enabled with --profile: it attributes hit counts and execution time
+to the Lox source lines of the statements being executed, and can write the samples as collapsed stacks
+for flamegraph tools. The tree-walker and closures wrap the code that executes statements,
+the VM enters and leaves statements with opcodes compiled into profiled runs
+"""
+
+from collections import defaultdict
+from dataclasses import fields
+import io
+from pathlib import Path
+import time
+from typing import Callable, TYPE_CHECKING
+if TYPE_CHECKING:
+    from rich.table import Table
+# app
+from pylox.engine.loxtoken import Token
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+
+def first_line(node: object) -> int | None:
+    """Line of the first token in a statement or expression (statements don't keep their keyword tokens)"""
+    if isinstance(node, Token):
+        return node.line
+    if isinstance(node, list):
+        children = node
+    elif isinstance(node, (expr.Expr, stmt.Stmt)):
+        children = [getattr(node, f.name) for f in fields(node)]
+    else:
+        return None
+
+    for child in children:
+        line = first_line(child)
+        if line is not None:
+            return line
+    return None
+
+class Profiler:
+    """Times every statement, keeping a stack of the lines being executed.
+    Self time excludes nested statements (e.g. the body of a while), total time includes them.
+    Blocks aren't profiled themselves, their statements are
+    """
+
+    def __init__(self):
+        self.hits: dict[int, int] = defaultdict(int)
+        self.self_time: dict[int, float] = defaultdict(float)
+        self.total_time: dict[int, float] = defaultdict(float)
+        # Self time per stack of lines, outermost first
+        self.stacks: dict[tuple[int, ...], float] = defaultdict(float)
+        self.stack: list[int] = []
+        # Time spent in nested statements, and when it started, per entry of the stack
+        self.nested: list[float] = []
+        self.starts: list[float] = []
+        self.lines: dict[int, tuple[stmt.Stmt, int]] = dict()
+
+    def line(self, statement: stmt.Stmt) -> int:
+        # Nodes are unhashable dataclasses, so they're keyed by id, and kept alive along with their line:
+        # the program of an earlier run may be gone, and its ids reused by the nodes of the next one
+        cached = self.lines.get(id(statement))
+        if cached is None:
+            cached = self.lines[id(statement)] = (statement, first_line(statement) or 0)
+        return cached[1]
+
+    def enter(self, line: int) -> None:
+        """Starts timing a statement on line, nested in the ones being timed"""
+        self.stack.append(line)
+        self.nested.append(0.0)
+        self.starts.append(time.perf_counter())
+
+    def leave(self) -> None:
+        """Stops timing the statement entered last"""
+        stack, nested = self.stack, self.nested
+        elapsed = time.perf_counter() - self.starts.pop()
+        own = elapsed - nested.pop()
+        current = stack[-1]
+        self.hits[current] += 1
+        self.self_time[current] += own
+        # Recursion shouldn't count the same line twice
+        if current not in stack[:-1]:
+            self.total_time[current] += elapsed
+        self.stacks[tuple(stack)] += own
+        stack.pop()
+        if nested:
+            nested[-1] += elapsed
+
+    def timed(self, run: Callable[[object], object], line: int | Callable[[object], int]) -> Callable[[object], object]:
+        """Wraps a function that executes statements, e.g. Interpreter.execute or a compiled closure, passing on what it returns.
+        line is either the line of a single statement, or a function that finds the line of the argument
+        """
+        enter, leave = self.enter, self.leave
+
+        def profiled(argument):
+            enter(line(argument) if callable(line) else line)
+            try:
+                return run(argument)
+            finally:
+                leave()
+        return profiled
+
+    def execute(self, execute: Callable[[stmt.Stmt], object]) -> Callable[[stmt.Stmt], object]:
+        """Profiled version of Interpreter.execute"""
+        profiled = self.timed(execute, self.line)
+
+        def execute_statement(statement: stmt.Stmt):
+            if isinstance(statement, stmt.Block):
+                return execute(statement)
+            return profiled(statement)
+        return execute_statement
+
+    def table(self, source: str | None = None, limit: int = 20) -> "Table":
+        """Hot spots, sorted by self time"""
+        source_lines = [] if source is None else source.splitlines()
+        overall = sum(self.self_time.values()) or 1.0
+
+        from rich.table import Table
+        table = Table(title="pylox profile")
+        table.add_column("line", justify="right")
+        table.add_column("hits", justify="right")
+        table.add_column("self (ms)", justify="right")
+        table.add_column("self %", justify="right")
+        table.add_column("total (ms)", justify="right")
+        table.add_column("source")
+        for line in sorted(self.self_time, key=self.self_time.get, reverse=True)[:limit]:
+            text = source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ""
+            table.add_row(
+                str(line),
+                str(self.hits[line]),
+                f"{self.self_time[line] * 1000:.2f}",
+                f"{self.self_time[line] / overall:.1%}",
+                f"{self.total_time[line] * 1000:.2f}",
+                text,
+            )
+        return table
+
+    def write_collapsed(self, path: Path, name: str = "<lox>") -> None:
+        """Writes one 'frame;frame;frame microseconds' line per stack, the input format of flamegraph.pl and speedscope"""
+        with io.open(path, mode="w", encoding="utf-8") as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                frames = ";".join(f"{name}:{line}" for line in stack)
+                f.write(f"{frames} {round(seconds * 1e6)}\n")
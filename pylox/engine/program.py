@@ -0,0 +1,95 @@
+"""program.py
+
+Module for the embedding API: compile a Lox source once into a Program, then run it as many times as needed,
+each time in a fresh interpreter whose globals are seeded from a dict. Errors are raised, never printed or exited on
+"""
+
+from types import FunctionType
+from typing import TextIO
+# app
+from pylox.engine.stmt import Stmt
+from pylox.engine.lox import Lox, ENGINES
+from pylox.engine.interpreter import LoxRuntimeError
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.natives import NATIVES, Native
+from pylox.engine.output import PlainOutput
+from pylox.engine.limits import Budget
+from pylox.engine.vectors import Vector
+from pylox.engine.ropes import flatten
+# errors
+from pylox.engine.errors import Error
+
+class CompileError(Error):
+    """Raise when a source has scanning, parsing or resolving errors. Every error reported is kept in errors"""
+    def __init__(self, errors: list[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+def to_lox(name: str, value: object) -> object:
+    """Converts a Python value into the Lox value it stands for"""
+    if value is None or isinstance(value, (bool, float, str, LoxCallable, Vector)):
+        return value
+    if isinstance(value, int):
+        # Lox only has one kind of number
+        return float(value)
+    if isinstance(value, FunctionType):
+        return HostFunction(value)
+    raise TypeError(f"Global '{name}' has no Lox equivalent: {type(value).__name__}")
+
+class HostFunction(Native):
+    """A Python function passed in as a global. Its arguments are Python values, and its results are converted like globals are"""
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return to_lox("<return value>", self.function(*[flatten(argument) for argument in arguments]))
+
+class Program:
+    """A resolved (and optimised) program. Running it only fills the inline caches of global variables,
+    specialises arithmetic nodes in place and keeps the environments of top-level blocks, all of which are checked
+    on every use, so one Program can be run any number of times. Those are changes to the shared tree though,
+    so it must not be run from several threads at once: compile a Program per thread instead
+    """
+
+    def __init__(self, statements: list[Stmt], engine: str = "tree"):
+        self.statements = tuple(statements)
+        self.engine = engine
+
+    def run(self, globals: dict[str, object] | None = None, stdout: TextIO | None = None, max_steps: int | None = None, timeout: float | None = None) -> dict[str, object]:
+        """Runs the program in a fresh interpreter, with globals defined on top of the natives.
+        Printed values go to stdout (by default sys.stdout). Returns the globals the program ended with,
+        natives excluded (strings built by concatenation come back as plain strs). Runtime errors are raised as LoxRuntimeError
+        """
+        interpreter = ENGINES[self.engine](repl_mode=False)
+        interpreter.output = PlainOutput(stdout)
+        for name, value in (globals or {}).items():
+            interpreter.globals.define(name, to_lox(name, value))
+        if max_steps is not None or timeout is not None:
+            interpreter.limit(Budget(max_steps, timeout))
+
+        try:
+            interpreter.interpret(list(self.statements))
+        finally:
+            interpreter.output.flush()
+
+        return {
+            name: flatten(value) for name, value in interpreter.globals.values.items()
+            if NATIVES.get(name) is not value
+        }
+
+def compile(source: str, engine: str = "tree", optimise: bool = True, scanner: str = "fast") -> Program:
+    """Scans, parses, optimises and resolves source into a Program for the given engine.
+    Raises CompileError with every error reported, instead of printing them
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+    lox = Lox(engine, optimise=optimise, scanner=scanner)
+    errors: list[str] = []
+
+    def report(line: int, where: str, message: str) -> None:
+        errors.append(f"[line {line}] Error {where}: {message}")
+        lox.had_error = True
+
+    lox.report = report
+    statements = lox.parse(source)
+    if statements is None:
+        raise CompileError(errors)
+    return Program(statements, engine)
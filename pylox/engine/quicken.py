@@ -0,0 +1,213 @@
+"""quicken.py
+
+Module for type-feedback quickening in the tree-walking Interpreter. After a Binary or Unary node first evaluates
+successfully, it's rewritten in place (by switching its __class__) into a variant specialised for the operand types
+it saw, e.g. adding two numbers. The variant checks those types with a single guard and otherwise skips the generic
+dispatch. When the guard fails, the node de-optimises into a generic variant that never specialises again,
+so a site that sees several types doesn't thrash
+"""
+
+from pylox.engine.loxtoken import TokenType
+import pylox.engine.expr as expr
+from pylox.engine.ropes import STRINGS, concatenate
+
+class QuickBinary(expr.Binary):
+    """A Binary node specialised by the Interpreter. It has no slots of its own, so its class can be switched back and forth.
+    Every visitor but the Interpreter sees a plain Binary node
+    """
+    __slots__ = ()
+    GENERIC = expr.Binary
+
+    def __reduce__(self):
+        return (expr.Binary, (self.left, self.operator, self.right))
+
+    def accept(self, visitor: expr.Visitor):
+        return visitor.visit_quickened(self)
+
+    def deoptimise(self, interpreter, left, right):
+        """The guard failed: fall back to the generic operation, for good"""
+        self.__class__ = GenericBinary
+        return interpreter.binary(self, left, right)
+
+class GenericBinary(QuickBinary):
+    """A node that saw more than one kind of operand. It runs the generic operation without trying to specialise again"""
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        return interpreter.binary(self, interpreter.evaluate(self.left), interpreter.evaluate(self.right))
+
+class FloatBinary(QuickBinary):
+    """Arithmetic and comparison on two numbers. Except for addition, zero on the right fails the guard,
+    so the generic path reports it (see Interpreter.check_number_operands)
+    """
+    __slots__ = ()
+
+class AddFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float:
+            return left + right
+        return self.deoptimise(interpreter, left, right)
+
+class SubtractFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left - right
+        return self.deoptimise(interpreter, left, right)
+
+class MultiplyFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left * right
+        return self.deoptimise(interpreter, left, right)
+
+class DivideFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left / right
+        return self.deoptimise(interpreter, left, right)
+
+class GreaterFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left > right
+        return self.deoptimise(interpreter, left, right)
+
+class GreaterEqualFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left >= right
+        return self.deoptimise(interpreter, left, right)
+
+class LessFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left < right
+        return self.deoptimise(interpreter, left, right)
+
+class LessEqualFloats(FloatBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left.__class__ is float and right.__class__ is float and right != 0:
+            return left <= right
+        return self.deoptimise(interpreter, left, right)
+
+class ConcatenateStrings(QuickBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if isinstance(left, STRINGS) and isinstance(right, STRINGS):
+            return concatenate(left, right, interpreter.interning)
+        return self.deoptimise(interpreter, left, right)
+
+class Equal(QuickBinary):
+    """Equality is defined for any two values, so it needs no guard at all. Inlines Interpreter.is_equal"""
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        return interpreter.evaluate(self.left) == interpreter.evaluate(self.right)
+
+class NotEqual(QuickBinary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        return interpreter.evaluate(self.left) != interpreter.evaluate(self.right)
+
+class QuickUnary(expr.Unary):
+    """A Unary node specialised by the Interpreter, as for QuickBinary"""
+    __slots__ = ()
+    GENERIC = expr.Unary
+
+    def __reduce__(self):
+        return (expr.Unary, (self.operator, self.right))
+
+    def accept(self, visitor: expr.Visitor):
+        return visitor.visit_quickened(self)
+
+class GenericUnary(QuickUnary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        return interpreter.unary(self, interpreter.evaluate(self.right))
+
+class NegateFloat(QuickUnary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        right = interpreter.evaluate(self.right)
+        if right.__class__ is float:
+            return -right
+        self.__class__ = GenericUnary
+        return interpreter.unary(self, right)
+
+class Not(QuickUnary):
+    __slots__ = ()
+
+    def quick(self, interpreter):
+        return not interpreter.is_truthy(interpreter.evaluate(self.right))
+
+FLOAT_OPERATIONS = {
+    TokenType.PLUS: AddFloats,
+    TokenType.MINUS: SubtractFloats,
+    TokenType.STAR: MultiplyFloats,
+    TokenType.SLASH: DivideFloats,
+    TokenType.GREATER: GreaterFloats,
+    TokenType.GREATER_EQUAL: GreaterEqualFloats,
+    TokenType.LESS: LessFloats,
+    TokenType.LESS_EQUAL: LessEqualFloats,
+}
+
+def quicken_binary(node: expr.Binary, left, right) -> None:
+    """Specialises node for the operands it just evaluated to, if there's a variant for them"""
+    tokentype = node.operator.tokentype
+    if tokentype == TokenType.EQUAL_EQUAL:
+        node.__class__ = Equal
+    elif tokentype == TokenType.BANG_EQUAL:
+        node.__class__ = NotEqual
+    elif left.__class__ is float and right.__class__ is float:
+        node.__class__ = FLOAT_OPERATIONS[tokentype]
+    elif tokentype == TokenType.PLUS and isinstance(left, STRINGS) and isinstance(right, STRINGS):
+        node.__class__ = ConcatenateStrings
+    else:
+        # e.g. vectors: not worth a variant
+        node.__class__ = GenericBinary
+
+def quicken_unary(node: expr.Unary, right) -> None:
+    if node.operator.tokentype == TokenType.BANG:
+        node.__class__ = Not
+    elif right.__class__ is float:
+        node.__class__ = NegateFloat
+    else:
+        node.__class__ = GenericUnary
@@ -0,0 +1,227 @@
+"""resolver.py
+
+Module for the Resolver pass, which runs between the Parser and the Interpreter.
+It works out where every local variable lives, so the Interpreter can index
+straight into a scope instead of searching for the variable by name.
+"""
+
+from dataclasses import dataclass, field
+from pylox.engine.loxtoken import Token
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+# errors
+from pylox.engine.errors import Error
+
+class ResolverError(Error):
+    """Raise when error occurs during variable resolution"""
+    def __init__(self, token: Token, message: str):
+        super().__init__(message)
+        self.message = message
+        self.token = token
+
+@dataclass
+class Local:
+    slot: int
+    # Index in Resolver.layouts of the environment it lives in
+    environment: int
+    defined: bool = False
+
+@dataclass
+class Layout:
+    """The slots of an environment the engines will create: a function's frame, or the scope of a block that needs one.
+    Blocks flattened into it take slots from the top and hand them back when they end, so siblings share them
+    """
+    top: int = 0
+    size: int = 0
+    # Slots referred to from a function nested in the one that declares them
+    captured: set[int] = field(default_factory=set)
+
+def declares(statements: list[stmt.Stmt]) -> bool:
+    """Whether statements declare anything in their own scope"""
+    return any(isinstance(statement, (stmt.Var, stmt.Function)) for statement in statements)
+
+def declares_function(statements: list[stmt.Stmt]) -> bool:
+    """Whether a function is declared anywhere in statements. Only a nested function can capture a block's locals"""
+    for statement in statements:
+        if isinstance(statement, stmt.Function):
+            return True
+        if isinstance(statement, stmt.Block) and declares_function(statement.statements):
+            return True
+        if isinstance(statement, stmt.If):
+            branches = [statement.then_branch] if statement.else_branch is None else [statement.then_branch, statement.else_branch]
+            if declares_function(branches):
+                return True
+        if isinstance(statement, stmt.While) and declares_function([statement.body]):
+            return True
+    return False
+
+class Resolver(expr.Visitor, stmt.Visitor):
+    """Annotates Variable, Assign, Var, Function and Block nodes with (depth, slot) information.
+    Variables that aren't found in any local scope are left unresolved, and are looked up as globals.
+    Depths count environments rather than scopes: a block that declares nothing gets no environment, and neither does
+    one whose locals no nested function can capture, as its slots are laid out in the enclosing environment.
+    Environments also record which of their locals are captured by nested functions
+    """
+
+    def __init__(self):
+        self.scopes: list[dict[str, Local]] = []
+        # Environments of the scopes, innermost last
+        self.layouts: list[Layout] = []
+        # Index in scopes of the scope of every function being resolved, innermost last
+        self.functions: list[int] = []
+
+    def resolve(self, statements: list[stmt.Stmt]) -> list[stmt.Stmt]:
+        for statement in statements:
+            statement.accept(self)
+        return statements
+
+    def begin_scope(self) -> None:
+        self.scopes.append(dict())
+
+    def end_scope(self) -> None:
+        self.scopes.pop()
+
+    def begin_environment(self) -> None:
+        self.layouts.append(Layout())
+        self.begin_scope()
+
+    def end_environment(self) -> tuple[int, frozenset[int]]:
+        """Closes the innermost environment, returning the number of slots it needs and the slots that were captured"""
+        self.end_scope()
+        layout = self.layouts.pop()
+        return layout.size, frozenset(layout.captured)
+
+    def declare(self, name: Token) -> int | None:
+        if not self.scopes:
+            return None
+
+        scope = self.scopes[-1]
+        if name.lexeme in scope:
+            raise ResolverError(name, "Already a variable with this name in this scope.")
+        layout = self.layouts[-1]
+        scope[name.lexeme] = Local(layout.top, len(self.layouts) - 1)
+        layout.top += 1
+        layout.size = max(layout.size, layout.top)
+        return scope[name.lexeme].slot
+
+    def define(self, name: Token) -> None:
+        if not self.scopes:
+            return
+        self.scopes[-1][name.lexeme].defined = True
+
+    def resolve_local(self, node: expr.Variable | expr.Assign, name: Token) -> None:
+        for index in range(len(self.scopes) - 1, -1, -1):
+            local = self.scopes[index].get(name.lexeme)
+            if local is not None:
+                node.depth = len(self.layouts) - 1 - local.environment
+                node.slot = local.slot
+                if self.functions and index < self.functions[-1]:
+                    # Declared outside the function being resolved
+                    self.layouts[local.environment].captured.add(local.slot)
+                return
+        # Not found. Assume it is global
+
+    def resolve_function(self, function: stmt.Function) -> None:
+        self.begin_environment()
+        self.functions.append(len(self.scopes) - 1)
+        for param in function.params:
+            self.declare(param)
+            self.define(param)
+        self.resolve(function.body)
+        self.functions.pop()
+        function.size, function.captured = self.end_environment()
+
+    # --- Statements
+
+    def visit_block(self, stmt: stmt.Block) -> None:
+        if not declares(stmt.statements):
+            # Nothing to scope: runs in the enclosing environment
+            self.resolve(stmt.statements)
+            stmt.size = 0
+            return
+
+        if declares_function(stmt.statements):
+            # Its locals may outlive it, so every run needs a new environment
+            self.begin_environment()
+            self.resolve(stmt.statements)
+            stmt.size, stmt.captured = self.end_environment()
+        elif self.layouts:
+            # Flattened into the enclosing environment
+            layout = self.layouts[-1]
+            top = layout.top
+            self.begin_scope()
+            self.resolve(stmt.statements)
+            self.end_scope()
+            layout.top = top
+            stmt.size = 0
+        else:
+            # A top-level block, which can't be running twice at once, so its environment can be kept between runs
+            self.begin_environment()
+            self.resolve(stmt.statements)
+            stmt.size, _ = self.end_environment()
+            stmt.reused = True
+
+    def visit_var(self, stmt: stmt.Var) -> None:
+        stmt.slot = self.declare(stmt.name)
+        if stmt.initializer is not None:
+            stmt.initializer.accept(self)
+        self.define(stmt.name)
+
+    def visit_function(self, stmt: stmt.Function) -> None:
+        # Defined straight away, so the function can refer to itself
+        stmt.slot = self.declare(stmt.name)
+        self.define(stmt.name)
+        self.resolve_function(stmt)
+
+    def visit_expression(self, stmt: stmt.Expression) -> None:
+        stmt.expression.accept(self)
+
+    def visit_if(self, stmt: stmt.If) -> None:
+        stmt.condition.accept(self)
+        stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            stmt.else_branch.accept(self)
+
+    def visit_print(self, stmt: stmt.Print) -> None:
+        stmt.expression.accept(self)
+
+    def visit_return(self, stmt: stmt.Return) -> None:
+        if not self.functions:
+            raise ResolverError(stmt.keyword, "Can't return from top-level code.")
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+    def visit_while(self, stmt: stmt.While) -> None:
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+
+    # --- Expressions
+
+    def visit_variable(self, expr: expr.Variable) -> None:
+        if self.scopes:
+            local = self.scopes[-1].get(expr.name.lexeme)
+            if local is not None and not local.defined:
+                raise ResolverError(expr.name, "Can't read local variable in its own initializer.")
+        self.resolve_local(expr, expr.name)
+
+    def visit_assign(self, expr: expr.Assign) -> None:
+        expr.value.accept(self)
+        self.resolve_local(expr, expr.name)
+
+    def visit_binary(self, expr: expr.Binary) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_call(self, expr: expr.Call) -> None:
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_grouping(self, expr: expr.Grouping) -> None:
+        expr.expression.accept(self)
+
+    def visit_literal(self, expr: expr.Literal) -> None:
+        return
+
+    def visit_unary(self, expr: expr.Unary) -> None:
+        expr.right.accept(self)
@@ -0,0 +1,77 @@
+"""ropes.py
+
+Module for ropes: Lox strings built by concatenation, kept as their pieces until the characters are needed.
+Engines concatenate strings with concatenate(), so `s = s + x` in a loop takes linear time instead of quadratic
+"""
+
+from sys import intern
+
+# Shorter results are plain strs, since copying them costs less than keeping their pieces
+ROPE_MIN = 1024
+
+class Rope:
+    """A string made of pieces, joined (once) when it's printed, compared or hashed.
+    Appending to a rope adds to its list of pieces in place, as long as nothing has been appended to that list since:
+    every rope over a list only reads its own prefix of it, so the ropes appended to earlier still hold their value
+    """
+
+    __slots__ = ("pieces", "count", "length", "text")
+
+    def __init__(self, pieces: list[str], length: int):
+        self.pieces = pieces
+        self.count = len(pieces)
+        self.length = length
+        self.text: str | None = None
+
+    def append(self, right: "str | Rope") -> "Rope":
+        if right.__class__ is Rope:
+            right = right.flatten()
+        pieces = self.pieces
+        if len(pieces) != self.count:
+            # Another rope was made from this one already: branch off with a copy
+            pieces = pieces[:self.count]
+        pieces.append(right)
+        return Rope(pieces, self.length + len(right))
+
+    def flatten(self) -> str:
+        text = self.text
+        if text is None:
+            text = self.text = "".join(self.pieces[:self.count])
+            # Later appends start from the joined text, and the pieces can go
+            self.pieces, self.count = [text], 1
+        return text
+
+    def __str__(self) -> str:
+        return self.flatten()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is Rope:
+            return self.length == other.length and self.flatten() == other.flatten()
+        return self.flatten() == other
+
+    def __hash__(self) -> int:
+        return hash(self.flatten())
+
+    def __repr__(self) -> str:
+        return repr(self.flatten())
+
+# Lox strings, for isinstance
+STRINGS = (str, Rope)
+
+def concatenate(left: str | Rope, right: str | Rope, interning: bool = False) -> str | Rope:
+    """left + right, for two Lox strings. Short results are plain strs, interned when interning; long ones are ropes"""
+    if left.__class__ is Rope:
+        return left.append(right)
+    if right.__class__ is Rope:
+        right = right.flatten()
+    length = len(left) + len(right)
+    if length < ROPE_MIN:
+        return intern(left + right) if interning else left + right
+    return Rope([left, right], length)
+
+def flatten(value: object) -> object:
+    """value, with a rope turned into the str it stands for"""
+    return value.flatten() if value.__class__ is Rope else value
@@ -4,11 +4,16 @@ Module for Scanner component of Lox Interpreter
 """
 
 # stdlib
+import logging
+import re
+import sys
+from typing import Iterator
 from pylox.utils import new_logger
 logger = new_logger(__name__)
 # app modules
 from pylox.engine.loxtoken import Token, TokenType
 from pylox.engine.errors import Error
+from pylox.engine.tokenbuffer import TokenBuffer
 
 class ScannerError(Error):
     """Raise when error occurs during Scanning of source file"""
@@ -38,7 +43,8 @@ class Scanner:
 
     def __init__(self, source: str):
         self.source = source
-        logger.info(f"{source=}\n{len(source)=}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"{source=}\n{len(source)=}")
         self.tokens: list[Token] = []
         self.start = 0
         self.current = 0
@@ -82,8 +88,8 @@ class Scanner:
         # The closing ".
         self.advance()
 
-        # Trim the surrounding quotes
-        value = self.source[self.start+1:self.current-1]
+        # Trim the surrounding quotes. Interned, so equal literals are the same object and compare by identity
+        value = sys.intern(self.source[self.start+1:self.current-1])
         self.add_token(TokenType.STRING, value)
         # UPDATE: Support for escape sequences
 
@@ -112,10 +118,11 @@ class Scanner:
     def identifier(self):
         while self.is_alphanumeric(self.peek()): self.advance()
         
-        text = self.source[self.start:self.current]
+        # Interned, so every occurrence of a name shares one string
+        text = sys.intern(self.source[self.start:self.current])
         type = self.keywords.get(text)
         if type is None: type = TokenType.IDENTIFIER
-        self.add_token(type)
+        self.tokens.append(Token(type, text, None, self.line))
 
     def scan_token(self):
         c = self.advance()
@@ -175,10 +182,223 @@ class Scanner:
         self.tokens.append(Token(TokenType.EOF, "", None, self.line))
         return self.tokens
 
+    def stream_tokens(self) -> Iterator[Token]:
+        """Yields tokens as they are scanned, ending with EOF, without keeping them around.
+        A ScannerError is raised when the generator reaches the offending lexeme
+        """
+        while not self.is_at_end():
+            self.start = self.current
+            self.scan_token()
+            # scan_token adds at most one token
+            if self.tokens:
+                yield self.tokens.pop()
+
+        yield Token(TokenType.EOF, "", None, self.line)
+
     def log_tokens(self, start: int=None, end: int=None) -> None:
         start = 0 if start is None else start
         end = len(self.tokens) if end is None else min(end, len(self.tokens))
         logger.info(f"Tokens {start} to {end}:")
         for token in self.tokens[start:end]:
             logger.info(f"\t{repr(token)}")
-        return
\ No newline at end of file
+        return
+
+class FastScanner(Scanner):
+    """Scanner that matches whole lexemes at once with a single compiled regex,
+    instead of stepping through the source one character at a time.
+
+    It produces exactly the same tokens (and errors) as Scanner. Anything the
+    regex doesn't cover, e.g. identifiers starting with a non-ASCII letter,
+    is handed to Scanner.scan_token, one lexeme at a time
+    """
+
+    # Leading whitespace is skipped as part of each match, so it costs no extra iterations.
+    # stream_tokens dispatches on the group numbers, so keep them in sync
+    LEXEMES = re.compile(r"""
+        [ \r\t]*
+        (?:
+            (?P<identifier>[A-Za-z_]\w*)                # 1
+            | (?P<newline>\n)                           # 2
+            | (?P<line_comment>//[^\n]*)                # 3
+            | (?P<block_comment>/\*.*?\*/)              # 4
+            | (?P<operator>[!=<>]=|[(){},.\-+;*!=<>]|/(?!\*))  # 5, not an unterminated /*
+            | (?P<number>[0-9]+(?:\.[0-9]+)?)           # 6
+            | (?P<string>"[^"]*")                       # 7
+            | (?P<end>\Z)                               # 8
+        )
+    """, re.VERBOSE | re.DOTALL)
+
+    OPERATORS = {
+        "(": TokenType.LEFT_PAREN,
+        ")": TokenType.RIGHT_PAREN,
+        "{": TokenType.LEFT_BRACE,
+        "}": TokenType.RIGHT_BRACE,
+        ",": TokenType.COMMA,
+        ".": TokenType.DOT,
+        "-": TokenType.MINUS,
+        "+": TokenType.PLUS,
+        ";": TokenType.SEMICOLON,
+        "*": TokenType.STAR,
+        "/": TokenType.SLASH,
+        "!": TokenType.BANG,
+        "!=": TokenType.BANG_EQUAL,
+        "=": TokenType.EQUAL,
+        "==": TokenType.EQUAL_EQUAL,
+        "<": TokenType.LESS,
+        "<=": TokenType.LESS_EQUAL,
+        ">": TokenType.GREATER,
+        ">=": TokenType.GREATER_EQUAL,
+    }
+
+    def scan_tokens(self):
+        self.tokens = list(self.stream_tokens())
+        return self.tokens
+
+    def stream_tokens(self) -> Iterator[Token]:
+        source = self.source
+        length = len(source)
+        lexemes = self.LEXEMES.finditer
+        operators = self.OPERATORS
+        keywords = self.keywords
+        intern = sys.intern
+        line = self.line
+        pos = 0
+
+        while pos < length:
+            for m in lexemes(source, pos):
+                if m.start() != pos:
+                    # Something the regex doesn't cover (an error, or a non-ASCII lexeme)
+                    break
+
+                kind = m.lastindex
+
+                if kind == 1:  # identifier
+                    text = intern(m.group(1))
+                    # Identifiers followed by non-ASCII letters or digits are left to Scanner,
+                    # since str.isalpha and str.isnumeric decide where they end
+                    if not source[m.end():m.end() + 1].isascii():
+                        pos = m.start(1)
+                        break
+                    yield Token(keywords.get(text, TokenType.IDENTIFIER), text, None, line)
+                elif kind == 5:  # operator
+                    text = m.group(5)
+                    yield Token(operators[text], text, None, line)
+                elif kind == 2:  # newline
+                    line += 1
+                elif kind == 6:  # number
+                    if not source[m.end():m.end() + 2].isascii():
+                        pos = m.start(6)
+                        break
+                    text = m.group(6)
+                    yield Token(TokenType.NUMBER, text, float(text), line)
+                elif kind == 7:  # string
+                    text = m.group(7)
+                    # The token gets the line the string ends on, like Scanner
+                    line += text.count("\n")
+                    yield Token(TokenType.STRING, text, intern(text[1:-1]), line)
+                # Comments are skipped; block comments don't count lines, just like Scanner
+                pos = m.end()
+            else:
+                # Matched all the way to the end (the \Z alternative)
+                break
+
+            if pos >= length:
+                break
+            # Skip any whitespace, then hand the next lexeme to Scanner.scan_token
+            while source[pos] in " \r\t":
+                pos += 1
+            self.start = self.current = pos
+            self.line = line
+            self.scan_token()
+            if self.tokens:
+                yield self.tokens.pop()
+            pos = self.current
+            line = self.line
+
+        self.start = self.current = length
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
+
+class BufferScanner(FastScanner):
+    """FastScanner that fills a TokenBuffer instead of creating a Token per lexeme.
+    scan_tokens returns the buffer, which the Parser reads like a list of tokens
+    """
+
+    OPERATOR_TYPES = {text: tokentype.value for text, tokentype in FastScanner.OPERATORS.items()}
+    KEYWORD_TYPES = {text: tokentype.value for text, tokentype in Scanner.keywords.items()}
+
+    def scan_tokens(self) -> TokenBuffer:
+        source = self.source
+        length = len(source)
+        buffer = self.buffer = TokenBuffer(source)
+        add_type, add_start, add_end, add_line = buffer.types.append, buffer.starts.append, buffer.ends.append, buffer.lines.append
+        lexemes = self.LEXEMES.finditer
+        operators = self.OPERATOR_TYPES
+        keywords = self.KEYWORD_TYPES
+        identifier, number, string = TokenType.IDENTIFIER.value, TokenType.NUMBER.value, TokenType.STRING.value
+        line = self.line
+        pos = 0
+
+        # Same loop as FastScanner.stream_tokens, see there
+        while pos < length:
+            for m in lexemes(source, pos):
+                if m.start() != pos:
+                    break
+
+                kind = m.lastindex
+                if kind == 2:  # newline
+                    line += 1
+                elif kind == 3 or kind == 4:  # comments
+                    pass
+                else:
+                    start, end = m.span(kind)
+                    if kind == 1:  # identifier
+                        if not source[end:end + 1].isascii():
+                            pos = start
+                            break
+                        add_type(keywords.get(m.group(1), identifier))
+                    elif kind == 5:  # operator
+                        add_type(operators[m.group(5)])
+                    elif kind == 6:  # number
+                        if not source[end:end + 2].isascii():
+                            pos = start
+                            break
+                        add_type(number)
+                    elif kind == 7:  # string
+                        line += source.count("\n", start, end)
+                        add_type(string)
+                    else:  # end
+                        pos = length
+                        break
+                    add_start(start)
+                    add_end(end)
+                    add_line(line)
+                pos = m.end()
+            else:
+                break
+
+            if pos >= length:
+                break
+            while source[pos] in " \r\t":
+                pos += 1
+            self.start = self.current = pos
+            self.line = line
+            self.scan_token()
+            if self.tokens:
+                token = self.tokens.pop()
+                buffer.append(token.tokentype, self.start, self.current, token.line)
+            pos = self.current
+            line = self.line
+
+        self.start = self.current = length
+        self.line = line
+        buffer.append(TokenType.EOF, length, length, line)
+        return buffer
+
+    def log_tokens(self, start: int=None, end: int=None) -> None:
+        start = 0 if start is None else start
+        end = len(self.buffer) if end is None else min(end, len(self.buffer))
+        logger.info(f"Tokens {start} to {end}:")
+        for index in range(start, end):
+            logger.info(f"\t{repr(self.buffer[index])}")
+        return
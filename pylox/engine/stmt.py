@@ -4,7 +4,7 @@ Module for defining Lox statments
 """
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pylox.engine.loxtoken import Token
 from pylox.engine.expr import Expr
 
@@ -48,44 +48,98 @@ class Visitor:
 
 
 class Stmt(ABC):
+    # Nodes are slotted dataclasses, so the base must not add a __dict__ either
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Pickled (e.g. to send programs to other processes) as a constructor call, which is smaller and quicker to load than slot state
+        return (type(self), tuple(getattr(self, name) for name in self.__slots__))
+
     @abstractmethod
     def accept(self, visitor: Visitor):
         pass
 
-@dataclass
+@dataclass(slots=True)
 class Print(Stmt):
     expression: Expr
 
     def accept(self, visitor: Visitor):
         return visitor.visit_print(self)
 
-@dataclass
+@dataclass(slots=True)
 class Expression(Stmt):
     expression: Expr
 
     def accept(self, visitor: Visitor):
         return visitor.visit_expression(self)
 
-@dataclass
+@dataclass(slots=True)
 class Var(Stmt):
     name: Token
     initializer: Expr
+    # Set by the Resolver for locals; None for globals
+    slot: int | None = None
 
     def accept(self, visitor: Visitor):
         return visitor.visit_var(self)
 
-@dataclass
+@dataclass(slots=True)
 class Block(Stmt):
     statements: list[Stmt]
+    # Number of slots of the environment the block runs in, set by the Resolver. 0 when it needs none of its own
+    # (it declares nothing, or its locals are laid out in the enclosing environment) and runs in the enclosing one
+    size: int = 0
+    # Slots of the locals a nested function refers to, set by the Resolver
+    captured: frozenset[int] = field(default_factory=frozenset)
+    # Set by the Resolver when the block's environment can be kept from one run to the next
+    reused: bool = False
+    # The environment kept by an engine for a reused block, whose enclosing environment tells which interpreter it belongs to
+    environment: object = field(default=None, repr=False, compare=False)
+
+    def __reduce__(self):
+        # The environment belongs to the interpreter that created it, so it isn't pickled
+        return (type(self), (self.statements, self.size, self.captured, self.reused))
 
     def accept(self, visitor: Visitor):
         return visitor.visit_block(self)
     
-@dataclass
+@dataclass(slots=True)
 class If(Stmt):
     condition: Expr
     then_branch: Stmt
     else_branch: Stmt
 
     def accept(self, visitor: Visitor):
-        return visitor.visit_if(self)
\ No newline at end of file
+        return visitor.visit_if(self)
+
+@dataclass(slots=True)
+class While(Stmt):
+    condition: Expr
+    body: Stmt
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_while(self)
+
+@dataclass(slots=True)
+class Function(Stmt):
+    name: Token
+    params: list[Token]
+    body: list[Stmt]
+    # Set by the Resolver, as for Var
+    slot: int | None = None
+    # Number of local slots of the parameters and the body's own declarations, which share a scope, set by the Resolver
+    size: int = 0
+    # Slots of that scope a nested function refers to, set by the Resolver. When there are none,
+    # nothing outlives a call, so engines can reuse its frame
+    captured: frozenset[int] = field(default_factory=frozenset)
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_function(self)
+
+@dataclass(slots=True)
+class Return(Stmt):
+    keyword: Token
+    value: Expr | None
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_return(self)
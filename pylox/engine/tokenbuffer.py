@@ -0,0 +1,74 @@
+"""tokenbuffer.py
+
+Module for the struct-of-arrays token store: token types, source offsets and lines
+live in parallel integer arrays, and Tokens are only built when they're asked for
+"""
+
+from array import array
+import sys
+from typing import Iterator
+# app
+from pylox.engine.loxtoken import Token, TokenType
+
+# TokenType values are the small ints assigned by auto()
+TOKEN_TYPES = {tokentype.value: tokentype for tokentype in TokenType}
+# Identifiers and keywords get interned lexemes, just like the scanners give them (string literals are interned too)
+INTERNED = frozenset(
+    tokentype.value for tokentype in TokenType
+    if tokentype == TokenType.IDENTIFIER or TokenType.AND.value <= tokentype.value < TokenType.EOF.value
+)
+
+class TokenBuffer:
+    """Scanned tokens of a source, stored as four array('i') columns.
+
+    Lexemes are slices of the source and literals are derived from the lexeme,
+    so neither is stored. The buffer is a sequence of Tokens, built on access;
+    the Parser (a BufferParser) reads the types column instead and only builds the Tokens
+    it keeps. It pickles as four compact arrays plus the source
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array("i")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.lines = array("i")
+
+    def append(self, tokentype: TokenType, start: int, end: int, line: int) -> None:
+        self.types.append(tokentype.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def tokentype(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def lexeme(self, index: int) -> str:
+        lexeme = self.source[self.starts[index]:self.ends[index]]
+        if self.types[index] in INTERNED:
+            return sys.intern(lexeme)
+        return lexeme
+
+    def literal(self, index: int) -> object:
+        match self.types[index]:
+            case TokenType.NUMBER.value:
+                return float(self.source[self.starts[index]:self.ends[index]])
+            case TokenType.STRING.value:
+                return sys.intern(self.source[self.starts[index] + 1:self.ends[index] - 1])
+        return None
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self)
+        return Token(self.tokentype(index), self.lexeme(index), self.literal(index), self.lines[index])
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def nbytes(self) -> int:
+        """Size of the columns, not counting the source"""
+        return sum(column.itemsize * len(column) for column in (self.types, self.starts, self.ends, self.lines))
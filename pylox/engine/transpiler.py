@@ -0,0 +1,337 @@
+"""transpiler.py
+
+Module for ahead-of-time translation of a resolved Lox AST into an importable Python module.
+The generated code inlines Lox's type checks around native Python operators,
+so CPython's own compiler and bytecode do the heavy lifting
+"""
+
+from pylox.engine.loxtoken import Token, TokenType
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+
+HEADER = '''\
+"""Generated by pylox from {source!r}. Do not edit."""
+
+from pylox.engine import loxruntime as _rt
+
+'''
+
+FOOTER = '''
+
+def run(globals=None):
+    """Runs the Lox program, returning its globals. Raises LoxRuntimeError with the original Lox line"""
+    return _rt.run_module(_main, LINE_MAP, globals)
+
+if __name__ == "__main__":
+    _rt.main(run)
+'''
+
+COMPARISONS = {
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.SLASH: "/",
+}
+
+# Expressions nested deeper than this are translated one node per statement: every node adds a few levels of parentheses,
+# and CPython's parser gives up at 200
+MAX_NESTING = 30
+
+def nesting(node: expr.Expr) -> int:
+    """How deeply the translation of node nests (Groupings add nothing)"""
+    match node:
+        case expr.Literal():
+            return 0
+        case expr.Variable():
+            return 1
+        case expr.Grouping():
+            return nesting(node.expression)
+        case expr.Unary():
+            return 1 + nesting(node.right)
+        case expr.Binary():
+            return 1 + max(nesting(node.left), nesting(node.right))
+        case expr.Assign():
+            return 1 + nesting(node.value)
+        case expr.Call():
+            return 1 + max([nesting(node.callee)] + [nesting(argument) for argument in node.arguments])
+
+class Transpiler(expr.Visitor, stmt.Visitor):
+    """Translates statements annotated by the Resolver into Python source.
+    Statement visitors emit lines, expression visitors return Python expressions.
+    Lox locals become uniquely named Python locals, Lox globals live in the dict G.
+    Lox functions become nested Python functions. A local captured by a nested function is boxed in a cell,
+    which the function binds (as a keyword-only default) when it's created: a Python closure would see
+    the variable's latest cell instead, e.g. that of the last iteration of a loop
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+        # Python line number (within the module) -> Lox line
+        self.line_map: dict[int, int] = dict()
+        self.indent = 1
+        self.scopes: list[dict[int, str]] = []
+        # Slots of every scope that hold cells
+        self.cells: list[frozenset[int]] = []
+        # For every function being translated: the index of its scope, and the cells it has to bind
+        self.functions: list[tuple[int, set[str]]] = []
+        self.locals = 0
+        self.temps = 0
+        self.line = 1
+        # Whether the expression being translated is too deep for one Python expression
+        self.spilling = False
+
+    def transpile(self, statements: list[stmt.Stmt], source_name: str = "<lox>") -> str:
+        header = HEADER.format(source=source_name)
+        # Lines are numbered from the start of the module, so account for the header and 'def _main'
+        self.offset = header.count("\n") + 2
+        for statement in statements:
+            statement.accept(self)
+        if not self.lines:
+            self.emit("pass")
+
+        line_map = "LINE_MAP = {" + ", ".join(f"{k}: {v}" for k, v in self.line_map.items()) + "}\n"
+        return header + "def _main(G):\n" + "\n".join(self.lines) + "\n\n" + line_map + FOOTER
+
+    def emit(self, code: str) -> None:
+        self.line_map[self.offset + len(self.lines)] = self.line
+        self.lines.append("    " * self.indent + code)
+
+    def emit_body(self, body: stmt.Stmt) -> None:
+        self.indent += 1
+        start = len(self.lines)
+        body.accept(self)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def see(self, token: Token) -> int:
+        self.line = token.line
+        return token.line
+
+    def unique(self, lexeme: str) -> str:
+        self.locals += 1
+        return f"{lexeme}_{self.locals}" if lexeme.isidentifier() else f"_local_{self.locals}"
+
+    def local(self, depth: int, slot: int) -> tuple[str, bool]:
+        """Python name of the local at (depth, slot), and whether it holds a cell"""
+        index = len(self.scopes) - 1 - depth
+        name = self.scopes[index][slot]
+        for scope, free in reversed(self.functions):
+            if scope <= index:
+                break
+            # Declared outside this function, so it has to bind the cell
+            free.add(name)
+        return name, slot in self.cells[index]
+
+    def declare(self, slot: int, lexeme: str, value: str) -> None:
+        """Emits the declaration of a local"""
+        name = self.unique(lexeme)
+        self.scopes[-1][slot] = name
+        if slot in self.cells[-1]:
+            value = f"_rt.Cell({value})"
+        self.emit(f"{name} = {value}")
+
+    def expression(self, node: expr.Expr) -> str:
+        """Python expression for a statement's expression. A deep one is spilled: every node but a literal is evaluated
+        into a temporary by a statement of its own, in evaluation order, and the expression is just the last of them
+        """
+        self.spilling = nesting(node) > MAX_NESTING
+        try:
+            return node.accept(self)
+        finally:
+            self.spilling = False
+
+    def operand(self, node: expr.Expr) -> str:
+        while isinstance(node, expr.Grouping):
+            node = node.expression
+        code = node.accept(self)
+        if not self.spilling or isinstance(node, expr.Literal):
+            return code
+        t = self.temp()
+        self.emit(f"{t} = {code}")
+        return t
+
+    def truthy(self, code: str) -> str:
+        # Interpreter.is_truthy: only false and nil are falsey
+        t = self.temp()
+        return f"(({t} := {code}) is not None and {t} is not False)"
+
+    # --- Statements
+
+    def visit_expression(self, stmt: stmt.Expression) -> None:
+        self.emit(self.expression(stmt.expression))
+
+    def visit_print(self, stmt: stmt.Print) -> None:
+        self.emit(f"_rt.print_value({self.expression(stmt.expression)})")
+
+    def visit_var(self, stmt: stmt.Var) -> None:
+        value = "None" if stmt.initializer is None else self.expression(stmt.initializer)
+        self.see(stmt.name)
+        if stmt.slot is None:
+            self.emit(f"G[{stmt.name.lexeme!r}] = {value}")
+            return
+        self.declare(stmt.slot, stmt.name.lexeme, value)
+
+    def visit_block(self, stmt: stmt.Block) -> None:
+        if not stmt.size:
+            # Its locals, if any, are laid out in the enclosing scope
+            for statement in stmt.statements:
+                statement.accept(self)
+            return
+        self.scopes.append(dict())
+        self.cells.append(stmt.captured)
+        try:
+            for statement in stmt.statements:
+                statement.accept(self)
+        finally:
+            self.scopes.pop()
+            self.cells.pop()
+
+    def visit_function(self, stmt: stmt.Function) -> None:
+        line = self.see(stmt.name)
+        lexeme = stmt.name.lexeme
+        recursive = stmt.slot is not None and stmt.slot in self.cells[-1]
+        if recursive:
+            # The function binds its own cell, so the cell has to exist before the function does
+            self.declare(stmt.slot, lexeme, "None")
+
+        name = self.unique(lexeme)
+        params = [self.unique(param.lexeme) for param in stmt.params]
+        # The def line, filled in once the body has told which cells the function binds
+        header = len(self.lines)
+        self.emit("")
+        free: set[str] = set()
+        self.scopes.append(dict(enumerate(params)))
+        self.cells.append(stmt.captured)
+        self.functions.append((len(self.scopes) - 1, free))
+        self.indent += 1
+        try:
+            for slot, param in enumerate(params):
+                if slot in stmt.captured:
+                    self.emit(f"{param} = _rt.Cell({param})")
+            for statement in stmt.body:
+                statement.accept(self)
+            if len(self.lines) == header + 1:
+                self.emit("pass")
+        finally:
+            self.indent -= 1
+            self.functions.pop()
+            self.cells.pop()
+            self.scopes.pop()
+
+        arguments = list(params)
+        if free:
+            arguments.append("*")
+            arguments.extend(f"{cell}={cell}" for cell in sorted(free))
+        self.lines[header] = "    " * self.indent + f"def {name}({', '.join(arguments)}):"
+
+        self.line = line
+        function = f"_rt.Function({name}, {lexeme!r}, {len(params)})"
+        if stmt.slot is None:
+            self.emit(f"G[{lexeme!r}] = {function}")
+        elif recursive:
+            self.emit(f"{self.scopes[-1][stmt.slot]}.value = {function}")
+        else:
+            self.declare(stmt.slot, lexeme, function)
+
+    def visit_return(self, stmt: stmt.Return) -> None:
+        value = "None" if stmt.value is None else self.expression(stmt.value)
+        self.see(stmt.keyword)
+        self.emit(f"return {value}")
+
+    def visit_if(self, stmt: stmt.If) -> None:
+        self.emit(f"if {self.truthy(self.expression(stmt.condition))}:")
+        self.emit_body(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.emit("else:")
+            self.emit_body(stmt.else_branch)
+
+    def visit_while(self, stmt: stmt.While) -> None:
+        if nesting(stmt.condition) <= MAX_NESTING:
+            self.emit(f"while {self.truthy(self.expression(stmt.condition))}:")
+            self.emit_body(stmt.body)
+            return
+        # A spilled condition's statements have to run before every test, so they go inside the loop
+        self.emit("while True:")
+        self.indent += 1
+        self.emit(f"if not {self.truthy(self.expression(stmt.condition))}:")
+        self.emit("    break")
+        stmt.body.accept(self)
+        self.indent -= 1
+
+    # --- Expressions
+
+    def visit_literal(self, expr: expr.Literal) -> str:
+        if isinstance(expr.value, float) and expr.value in (float("inf"), float("-inf")):
+            # Number literals too large for a double have no Python literal
+            return f"float({str(expr.value)!r})"
+        return repr(expr.value)
+
+    def visit_grouping(self, expr: expr.Grouping) -> str:
+        return expr.expression.accept(self)
+
+    def visit_unary(self, expr: expr.Unary) -> str:
+        right = self.operand(expr.right)
+        line = self.see(expr.operator)
+        t = self.temp()
+        match expr.operator.tokentype:
+            case TokenType.MINUS:
+                return f"(-{t} if isinstance({t} := {right}, float) else _rt.number_operand({t}, {line}))"
+            case TokenType.BANG:
+                return f"(({t} := {right}) is None or {t} is False)"
+
+    def visit_binary(self, expr: expr.Binary) -> str:
+        left = self.operand(expr.left)
+        right = self.operand(expr.right)
+        line = self.see(expr.operator)
+        tokentype = expr.operator.tokentype
+
+        if tokentype == TokenType.EQUAL_EQUAL:
+            return f"({left} == {right})"
+        if tokentype == TokenType.BANG_EQUAL:
+            return f"({left} != {right})"
+
+        # Both operands are evaluated before any check ('&' doesn't short-circuit), just like the tree-walker
+        l, r = self.temp(), self.temp()
+        both_numbers = f"isinstance({l} := {left}, float) & isinstance({r} := {right}, float)"
+        if tokentype == TokenType.PLUS:
+            return f"({l} + {r} if ({both_numbers}) or (isinstance({l}, str) and isinstance({r}, str)) else _rt.add_operands({l}, {r}, {line}))"
+
+        op = COMPARISONS[tokentype]
+        return f"({l} {op} {r} if ({both_numbers}) and {r} != 0 else _rt.number_operands({l}, {r}, {line}, {op!r}))"
+
+    def visit_variable(self, expr: expr.Variable) -> str:
+        line = self.see(expr.name)
+        lexeme = expr.name.lexeme
+        if expr.depth is None:
+            t = self.temp()
+            return f"({t} if ({t} := G.get({lexeme!r})) is not None else _rt.get_global(G, {lexeme!r}, {line}))"
+
+        name, cell = self.local(expr.depth, expr.slot)
+        if cell:
+            t = self.temp()
+            return f"({t} if ({t} := {name}.value) is not None else _rt.uninitialized({lexeme!r}, {line}))"
+        return f"({name} if {name} is not None else _rt.uninitialized({lexeme!r}, {line}))"
+
+    def visit_assign(self, expr: expr.Assign) -> str:
+        value = self.operand(expr.value)
+        line = self.see(expr.name)
+        if expr.depth is None:
+            return f"_rt.assign_global(G, {expr.name.lexeme!r}, {value}, {line})"
+        name, cell = self.local(expr.depth, expr.slot)
+        if cell:
+            return f"_rt.set_cell({name}, {value})"
+        return f"({name} := {value})"
+
+    def visit_call(self, expr: expr.Call) -> str:
+        callee = self.operand(expr.callee)
+        arguments = ", ".join(self.operand(argument) for argument in expr.arguments)
+        line = self.see(expr.paren)
+        return f"_rt.call({callee}, [{arguments}], {line})"
@@ -0,0 +1,235 @@
+"""vectors.py
+
+Module for the Vector value type: a one-dimensional array of numbers backed by NumPy,
+so numeric loops can be written as a few bulk operations instead of one Binary per element.
+NumPy is optional, and only imported by the first vector native called: without it, they raise a runtime error saying so
+"""
+
+from typing import Callable
+# app
+from pylox.engine.errors import Error
+
+# Set by require_numpy(). Vectors only exist once it has been imported, so their methods can use it freely
+np = None
+
+# Longer vectors are printed with their middle elided
+PRINT_LIMIT = 20
+
+class NativeError(Error):
+    """Raise from a native function when its arguments are wrong; the caller adds the line of the call"""
+
+class Vector:
+    """Wraps a float64 ndarray. Arithmetic and comparisons with numbers or vectors of the same length
+    broadcast element-wise (comparisons give masks of 1s and 0s), while == is Lox equality: same elements
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __str__(self) -> str:
+        values = self.array.tolist()
+        if len(values) > PRINT_LIMIT:
+            half = PRINT_LIMIT // 2
+            return "[" + ", ".join(map(number, values[:half])) + ", ..., " + ", ".join(map(number, values[-half:])) + "]"
+        return "[" + ", ".join(map(number, values)) + "]"
+
+    def __repr__(self) -> str:
+        return f"Vector({self})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Vector) and np.array_equal(self.array, other.array)
+
+    __hash__ = None
+
+    def __neg__(self) -> "Vector":
+        return Vector(-self.array)
+
+    def __add__(self, other): return Vector(self.array + operand(other))
+    def __radd__(self, other): return Vector(operand(other) + self.array)
+    def __sub__(self, other): return Vector(self.array - operand(other))
+    def __rsub__(self, other): return Vector(operand(other) - self.array)
+    def __mul__(self, other): return Vector(self.array * operand(other))
+    def __rmul__(self, other): return Vector(operand(other) * self.array)
+    def __truediv__(self, other): return Vector(self.array / operand(other))
+    def __rtruediv__(self, other): return Vector(operand(other) / self.array)
+
+    # For a number on the left, Python tries the mirrored comparison, e.g. 1 < v becomes v > 1
+    def __lt__(self, other): return mask(self.array < operand(other))
+    def __le__(self, other): return mask(self.array <= operand(other))
+    def __gt__(self, other): return mask(self.array > operand(other))
+    def __ge__(self, other): return mask(self.array >= operand(other))
+
+def number(value: float) -> str:
+    """Same text as a Lox number"""
+    text = str(value)
+    return text[:-2] if text.endswith(".0") else text
+
+def mask(array) -> Vector:
+    return Vector(array.astype(np.float64))
+
+def operand(value: object):
+    if isinstance(value, Vector):
+        return value.array
+    return value
+
+def is_operand(value: object) -> bool:
+    return isinstance(value, (float, Vector))
+
+def has_vector(left: object, right: object) -> bool:
+    return isinstance(left, Vector) or isinstance(right, Vector)
+
+def check_operands(left: object, right: object, operator: str) -> str | None:
+    """The error for a binary operator (given by its lexeme) with at least one vector operand,
+    or None if it can be evaluated. Only / refuses zeros on the right, element by element
+    """
+    if not (is_operand(left) and is_operand(right)):
+        return ("Operands must be two numbers or two strings" if operator == "+" else "Operands must be the numbers.")
+    if isinstance(left, Vector) and isinstance(right, Vector) and len(left) != len(right):
+        return lengths_differ(left, right)
+    if operator == "/" and not (right.array.all() if isinstance(right, Vector) else right):
+        return "Division by Zero is undefined"
+    return None
+
+def lengths_differ(a: Vector, b: Vector) -> str:
+    return f"Vector lengths differ: {len(a)} and {len(b)}."
+
+# --- Natives
+
+def require_numpy() -> None:
+    global np
+    if np is not None:
+        return
+    try:
+        import numpy
+    except ImportError:
+        raise NativeError("Vectors need NumPy, install it with 'pip install numpy'.")
+    np = numpy
+
+def whole(value: object, what: str) -> int:
+    if not isinstance(value, float) or not value.is_integer():
+        raise NativeError(f"{what} must be a whole number.")
+    return int(value)
+
+def vector_argument(value: object) -> Vector:
+    require_numpy()
+    if not isinstance(value, Vector):
+        raise NativeError("Argument must be a vector.")
+    return value
+
+def vector_or_number(value: object):
+    if not is_operand(value):
+        raise NativeError("Arguments must be vectors or numbers.")
+    return operand(value)
+
+def index(v: Vector, i: object) -> int:
+    position = whole(i, "Index")
+    if not -len(v) <= position < len(v):
+        raise NativeError(f"Index {position} is out of range for a vector of length {len(v)}.")
+    return position
+
+def vector(length: object, value: object) -> Vector:
+    """vector(n, x): n copies of x"""
+    require_numpy()
+    size = whole(length, "Length")
+    if size < 0:
+        raise NativeError("Length must not be negative.")
+    if not isinstance(value, float):
+        raise NativeError("Elements must be numbers.")
+    return Vector(np.full(size, value, dtype=np.float64))
+
+def arange(start: object, stop: object, step: object) -> Vector:
+    """arange(start, stop, step): start, start + step, ... up to but excluding stop"""
+    require_numpy()
+    if not all(isinstance(value, float) for value in (start, stop, step)):
+        raise NativeError("Arguments must be numbers.")
+    if step == 0:
+        raise NativeError("Step must not be zero.")
+    return Vector(np.arange(start, stop, step, dtype=np.float64))
+
+def linspace(start: object, stop: object, length: object) -> Vector:
+    """linspace(start, stop, n): n evenly spaced numbers from start to stop, inclusive"""
+    require_numpy()
+    if not (isinstance(start, float) and isinstance(stop, float)):
+        raise NativeError("Arguments must be numbers.")
+    size = whole(length, "Length")
+    if size < 0:
+        raise NativeError("Length must not be negative.")
+    return Vector(np.linspace(start, stop, size, dtype=np.float64))
+
+def length(v: object) -> float:
+    return float(len(vector_argument(v)))
+
+def at(v: object, i: object) -> float:
+    """at(v, i): the element at index i, counting from the end if negative"""
+    v = vector_argument(v)
+    return float(v.array[index(v, i)])
+
+def put(v: object, i: object, value: object) -> None:
+    """put(v, i, x): stores x at index i, in place"""
+    v = vector_argument(v)
+    if not isinstance(value, float):
+        raise NativeError("Elements must be numbers.")
+    v.array[index(v, i)] = value
+
+def slice_(v: object, start: object, stop: object) -> Vector:
+    """slice(v, start, stop): a copy of the elements from start up to but excluding stop"""
+    v = vector_argument(v)
+    return Vector(v.array[whole(start, "Start"):whole(stop, "Stop")].copy())
+
+def select(v: object, selection: object) -> Vector:
+    """select(v, mask): the elements where the mask isn't 0"""
+    v = vector_argument(v)
+    selection = vector_argument(selection)
+    if len(v) != len(selection):
+        raise NativeError(lengths_differ(v, selection))
+    return Vector(v.array[selection.array != 0])
+
+def equal(a: object, b: object) -> Vector:
+    """equal(a, b): mask of the elements that are equal (== compares whole vectors)"""
+    require_numpy()
+    if isinstance(a, Vector) and isinstance(b, Vector) and len(a) != len(b):
+        raise NativeError(lengths_differ(a, b))
+    return mask(np.equal(vector_or_number(a), vector_or_number(b)))
+
+def total(v: object) -> float:
+    return float(vector_argument(v).array.sum())
+
+def minimum(v: object) -> float:
+    v = vector_argument(v)
+    if not len(v):
+        raise NativeError("Empty vector has no minimum.")
+    return float(v.array.min())
+
+def maximum(v: object) -> float:
+    v = vector_argument(v)
+    if not len(v):
+        raise NativeError("Empty vector has no maximum.")
+    return float(v.array.max())
+
+def dot(a: object, b: object) -> float:
+    a = vector_argument(a)
+    b = vector_argument(b)
+    if len(a) != len(b):
+        raise NativeError(lengths_differ(a, b))
+    return float(np.dot(a.array, b.array))
+
+FUNCTIONS: dict[str, Callable[..., object]] = {
+    "vector": vector,
+    "arange": arange,
+    "linspace": linspace,
+    "len": length,
+    "at": at,
+    "put": put,
+    "slice": slice_,
+    "select": select,
+    "equal": equal,
+    "sum": total,
+    "min": minimum,
+    "max": maximum,
+    "dot": dot,
+}
@@ -0,0 +1,376 @@
+"""vm.py
+
+Module for the stack-based virtual machine that runs bytecode produced by the Compiler
+"""
+
+# logs
+import logging
+from pylox.utils import new_logger
+logger = new_logger(__name__)
+# app
+import pylox.engine.stmt as stmt
+from pylox.engine.compiler import Compiler, Chunk, FunctionChunk, OpCode
+from pylox.engine.environment import Cell, BindingError, UninitializedError
+from pylox.engine.loxcallable import LoxCallable
+from pylox.engine.loxfunction import FRAMES_MAX
+from pylox.engine.instrumentation import Timings
+from pylox.engine.profiler import Profiler
+from pylox.engine.interpreter import Interpreter, LoxRuntimeError
+from pylox.engine.vectors import Vector, NativeError, has_vector, check_operands
+from pylox.engine.ropes import STRINGS, concatenate
+
+# Opcodes as plain ints, so the dispatch loop compares ints rather than enum members
+CONSTANT = int(OpCode.CONSTANT)
+NIL = int(OpCode.NIL)
+TRUE = int(OpCode.TRUE)
+FALSE = int(OpCode.FALSE)
+POP = int(OpCode.POP)
+GET_LOCAL = int(OpCode.GET_LOCAL)
+SET_LOCAL = int(OpCode.SET_LOCAL)
+DEFINE_LOCAL = int(OpCode.DEFINE_LOCAL)
+GET_CELL = int(OpCode.GET_CELL)
+SET_CELL = int(OpCode.SET_CELL)
+DEFINE_CELL = int(OpCode.DEFINE_CELL)
+GET_UPVALUE = int(OpCode.GET_UPVALUE)
+SET_UPVALUE = int(OpCode.SET_UPVALUE)
+GET_GLOBAL = int(OpCode.GET_GLOBAL)
+SET_GLOBAL = int(OpCode.SET_GLOBAL)
+DEFINE_GLOBAL = int(OpCode.DEFINE_GLOBAL)
+EQUAL = int(OpCode.EQUAL)
+NOT_EQUAL = int(OpCode.NOT_EQUAL)
+GREATER = int(OpCode.GREATER)
+GREATER_EQUAL = int(OpCode.GREATER_EQUAL)
+LESS = int(OpCode.LESS)
+LESS_EQUAL = int(OpCode.LESS_EQUAL)
+ADD = int(OpCode.ADD)
+SUBTRACT = int(OpCode.SUBTRACT)
+MULTIPLY = int(OpCode.MULTIPLY)
+DIVIDE = int(OpCode.DIVIDE)
+NOT = int(OpCode.NOT)
+NEGATE = int(OpCode.NEGATE)
+PRINT = int(OpCode.PRINT)
+PRINT_EXPR = int(OpCode.PRINT_EXPR)
+JUMP = int(OpCode.JUMP)
+JUMP_IF_FALSE = int(OpCode.JUMP_IF_FALSE)
+CALL = int(OpCode.CALL)
+CLOSURE = int(OpCode.CLOSURE)
+RETURN = int(OpCode.RETURN)
+CHECK = int(OpCode.CHECK)
+ENTER = int(OpCode.ENTER)
+EXIT = int(OpCode.EXIT)
+
+# Operators that take two numbers (or vectors), dispatched together with one membership test
+NUMERIC = frozenset({LESS, LESS_EQUAL, GREATER, GREATER_EQUAL, SUBTRACT, MULTIPLY, DIVIDE})
+
+# Operators as written in Lox, for the errors of vector operands
+LEXEMES = {
+    ADD: "+",
+    SUBTRACT: "-",
+    MULTIPLY: "*",
+    DIVIDE: "/",
+    LESS: "<",
+    LESS_EQUAL: "<=",
+    GREATER: ">",
+    GREATER_EQUAL: ">=",
+}
+
+class VMFunction(LoxCallable):
+    """A compiled function, with the cells of the variables it captured when it was created"""
+
+    __slots__ = ("chunk", "cells")
+
+    def __init__(self, chunk: FunctionChunk, cells: tuple[Cell, ...]):
+        self.chunk = chunk
+        self.cells = cells
+
+    def arity(self) -> int:
+        return self.chunk.arity
+
+    def call(self, interpreter, arguments: list[object]) -> object:
+        return interpreter.call_function(self, arguments)
+
+    def __str__(self):
+        return f"<fn {self.chunk.name}>"
+
+class CallFrame:
+    """What a call has to restore when it returns: the caller's chunk, position, locals and upvalues.
+    The VM keeps one frame per depth of the call stack and reuses it for every call made at that depth
+    """
+
+    __slots__ = ("chunk", "ip", "local_values", "cells")
+
+class VM(Interpreter):
+    """Compiles statements to bytecode and runs them on a stack machine.
+    Shares the tree-walking Interpreter's globals and value semantics (truthiness, equality, stringify),
+    so both engines produce the same output
+    """
+
+    def profile(self, profiler: Profiler) -> None:
+        # Statements are timed by ENTER and EXIT opcodes, which are only compiled into profiled runs
+        self.profiler = profiler
+
+    def limit(self, budget) -> None:
+        # The budget is charged by CHECK opcodes, which are only compiled into limited runs
+        self.budget = budget
+
+    def instrument(self, timings: Timings) -> None:
+        # Locals live on the VM's stack, so no environments are ever created,
+        # and bytecode has no statement boundaries to count
+        self.timings = timings
+        timings.statements = None
+
+    def interpret(self, statements: list[stmt.Stmt]):
+        chunk = Compiler(self.repl_mode, limited=self.budget is not None, profiled=self.profiler is not None).compile(statements)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Bytecode:\n{chunk.disassemble()}")
+        entered = 0 if self.profiler is None else len(self.profiler.stack)
+        try:
+            self.run(chunk)
+        except BindingError as e:
+            raise LoxRuntimeError(e.token, e.message)
+        except UninitializedError as e:
+            raise LoxRuntimeError(e.token, e.message)
+        finally:
+            # An error skips the EXITs of the statements it was raised in
+            if self.profiler is not None:
+                while len(self.profiler.stack) > entered:
+                    self.profiler.leave()
+
+    def binary_error(self, chunk: Chunk, ip: int, left, right):
+        """Builds the same error the tree-walker's check_number_operands would raise,
+        or returns None for vector operands, whose operators broadcast
+        """
+        line = chunk.lines[ip - 1]
+        op = chunk.code[ip - 1]
+        if has_vector(left, right):
+            message = check_operands(left, right, LEXEMES[op])
+            return None if message is None else LoxRuntimeError(None, message, line)
+        if op == ADD:
+            return LoxRuntimeError(None, "Operands must be two numbers or two strings", line)
+        if not (isinstance(left, float) and isinstance(right, float)):
+            return LoxRuntimeError(None, "Operands must be the numbers.", line)
+        return LoxRuntimeError(None, "Division by Zero is undefined", line)
+
+    def call_function(self, function: VMFunction, arguments: list[object]) -> object:
+        """Runs a function called from outside the VM's loop, whose arguments have already been checked"""
+        chunk = function.chunk
+        arguments.extend(chunk.padding)
+        for slot in chunk.boxed:
+            arguments[slot] = Cell(arguments[slot])
+        return self.run(chunk, arguments, function.cells)
+
+    def run(self, chunk: Chunk, local_values: list[object] | None = None, cells: tuple[Cell, ...] = ()) -> object:
+        """Runs chunk until it returns. Calls to functions compiled by the VM don't recurse into run:
+        the caller's state is saved in a CallFrame, and restored when the callee returns
+        """
+        code = chunk.code
+        constants = chunk.constants
+        if local_values is None:
+            local_values = [None] * chunk.num_locals
+        stack: list[object] = []
+        push = stack.append
+        pop = stack.pop
+        globals = self.globals
+        caches = chunk.caches
+        frames: list[CallFrame] = []
+        # Number of calls in progress, i.e. of frames in use
+        depth = 0
+        is_truthy = self.is_truthy
+        interning = self.interning
+        write = self.output.write
+        charge = None if self.budget is None else self.budget.charge
+        enter = None if self.profiler is None else self.profiler.enter
+        leave = None if self.profiler is None else self.profiler.leave
+        ip = 0
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                value = local_values[code[ip]]
+                if value is None:
+                    name = constants[code[ip + 1]]
+                    raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+                push(value)
+                ip += 2
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+            elif op == GET_GLOBAL:
+                cache = caches[ip]
+                if cache is None or cache[0] != globals.version:
+                    cache = caches[ip] = (globals.version, globals.lookup(constants[code[ip]]))
+                value = cache[1].value
+                if value is None:
+                    name = constants[code[ip]]
+                    raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+                push(value)
+                ip += 1
+            elif op == POP:
+                pop()
+            elif op == JUMP_IF_FALSE:
+                if is_truthy(pop()):
+                    ip += 1
+                else:
+                    ip = code[ip]
+            elif op == JUMP:
+                ip = code[ip]
+            elif op == CHECK:
+                charge(chunk.lines[ip - 1])
+            elif op == SET_LOCAL:
+                local_values[code[ip]] = stack[-1]
+                ip += 1
+            elif op == SET_GLOBAL:
+                cache = caches[ip]
+                if cache is None or cache[0] != globals.version:
+                    cache = caches[ip] = (globals.version, globals.lookup(constants[code[ip]]))
+                cache[1].value = stack[-1]
+                ip += 1
+            elif op == ADD:
+                right = pop()
+                left = pop()
+                if isinstance(left, float) and isinstance(right, float):
+                    push(left + right)
+                elif isinstance(left, STRINGS) and isinstance(right, STRINGS):
+                    push(concatenate(left, right, interning))
+                else:
+                    error = self.binary_error(chunk, ip, left, right)
+                    if error is not None:
+                        raise error
+                    push(left + right)
+            elif op in NUMERIC:
+                right = pop()
+                left = pop()
+                if not (isinstance(left, float) and isinstance(right, float)) or right == 0:
+                    error = self.binary_error(chunk, ip, left, right)
+                    if error is not None:
+                        raise error
+                if op == LESS: push(left < right)
+                elif op == LESS_EQUAL: push(left <= right)
+                elif op == GREATER: push(left > right)
+                elif op == GREATER_EQUAL: push(left >= right)
+                elif op == SUBTRACT: push(left - right)
+                elif op == MULTIPLY: push(left * right)
+                else: push(left / right)
+            # Interpreter.is_equal, inlined
+            elif op == EQUAL:
+                right = pop()
+                push(pop() == right)
+            elif op == NOT_EQUAL:
+                right = pop()
+                push(pop() != right)
+            elif op == CALL:
+                argc = code[ip]
+                ip += 1
+                arguments = stack[len(stack) - argc:]
+                del stack[len(stack) - argc:]
+                callee = pop()
+                if callee.__class__ is VMFunction:
+                    function = callee.chunk
+                    if argc != function.arity:
+                        raise LoxRuntimeError(None, f"Expected {function.arity} arguments but got {argc}.", chunk.lines[ip - 2])
+                    if depth == FRAMES_MAX:
+                        raise LoxRuntimeError(None, "Stack overflow.", chunk.lines[ip - 2])
+                    if depth == len(frames):
+                        frames.append(CallFrame())
+                    frame = frames[depth]
+                    frame.chunk = chunk
+                    frame.ip = ip
+                    frame.local_values = local_values
+                    frame.cells = cells
+                    depth += 1
+                    # The arguments become the first locals of the call
+                    arguments.extend(function.padding)
+                    for slot in function.boxed:
+                        arguments[slot] = Cell(arguments[slot])
+                    chunk = function
+                    code = chunk.code
+                    constants = chunk.constants
+                    caches = chunk.caches
+                    local_values = arguments
+                    cells = callee.cells
+                    ip = 0
+                    continue
+                line = chunk.lines[ip - 2]
+                if not isinstance(callee, LoxCallable):
+                    raise LoxRuntimeError(None, "Can only call functions and classes.", line)
+                if argc != callee.arity():
+                    raise LoxRuntimeError(None, f"Expected {callee.arity()} arguments but got {argc}.", line)
+                try:
+                    push(callee.call(self, arguments))
+                except NativeError as e:
+                    raise LoxRuntimeError(None, e.message, line)
+            elif op == RETURN:
+                if depth == 0:
+                    # The end of the program, or of a function called by call_function
+                    return pop() if stack else None
+                value = pop()
+                depth -= 1
+                frame = frames[depth]
+                chunk = frame.chunk
+                code = chunk.code
+                constants = chunk.constants
+                caches = chunk.caches
+                ip = frame.ip
+                local_values = frame.local_values
+                cells = frame.cells
+                push(value)
+            elif op == NIL:
+                push(None)
+            elif op == TRUE:
+                push(True)
+            elif op == FALSE:
+                push(False)
+            elif op == DEFINE_LOCAL:
+                local_values[code[ip]] = pop()
+                ip += 1
+            elif op == GET_UPVALUE:
+                value = cells[code[ip]].value
+                if value is None:
+                    name = constants[code[ip + 1]]
+                    raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+                push(value)
+                ip += 2
+            elif op == GET_CELL:
+                value = local_values[code[ip]].value
+                if value is None:
+                    name = constants[code[ip + 1]]
+                    raise UninitializedError(name, f"Uninitialized variable '{name.lexeme}'")
+                push(value)
+                ip += 2
+            elif op == SET_UPVALUE:
+                cells[code[ip]].value = stack[-1]
+                ip += 1
+            elif op == SET_CELL:
+                local_values[code[ip]].value = stack[-1]
+                ip += 1
+            elif op == DEFINE_CELL:
+                local_values[code[ip]] = Cell(pop())
+                ip += 1
+            elif op == DEFINE_GLOBAL:
+                globals.define(constants[code[ip]].lexeme, pop())
+                ip += 1
+            elif op == NOT:
+                push(not is_truthy(pop()))
+            elif op == NEGATE:
+                value = pop()
+                if not isinstance(value, (float, Vector)):
+                    raise LoxRuntimeError(None, "Operand must be a number.", chunk.lines[ip - 1])
+                push(-value)
+            elif op == PRINT:
+                write(pop())
+            elif op == PRINT_EXPR:
+                write(pop())
+            elif op == ENTER:
+                enter(chunk.lines[ip - 1])
+            elif op == EXIT:
+                leave()
+            elif op == CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                push(VMFunction(function, tuple(
+                    local_values[index] if is_local else cells[index] for is_local, index in function.upvalues
+                )))
+            else:
+                raise LoxRuntimeError(None, f"Unknown opcode {op}", chunk.lines[ip - 1])
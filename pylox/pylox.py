@@ -4,28 +4,78 @@ This module provides the main entry point to the logic of the interpreter
 """
 
 import sys
-from rich.console import Console
 from pylox.cli.loxcli import Args
 import pylox.cli.loxcli as loxcli
-from pylox.cli import programinfo
 from pylox.engine.lox import Lox
 
 def run(args: Args) -> None:
     """Runs the Pylox interpreter, given some arguments"""
-    lox = Lox()
+    lox = Lox(engine=args.engine, optimise=args.optimise, quicken=args.quicken, intern_strings=args.intern_strings, scanner=args.scanner, stream=args.stream, timings=args.timings, colour=args.colour, cache=args.cache, profile=args.profile, profile_output=args.profile_output, max_steps=args.max_steps, timeout=args.timeout)
     loxcli.toggle_debug(args.debug)
 
     if args.rpolish:
         lox.astprinter.rev_polish_notation = True
 
-    if args.src:
-        if args.src.exists():
+    # The benchmark and batch harnesses, and Rich, are only imported by the commands that use them,
+    # so running a script starts quickly
+    if args.bench_scanner or args.bench_memory or args.bench_startup or args.bench:
+        from pylox.cli import bench
+    elif args.batch:
+        from pylox.cli import batch
+
+    if args.bench_scanner:
+        bench.run_scanner_benchmark(args.bench_runs)
+    elif args.bench_memory:
+        bench.run_memory_benchmark()
+    elif args.bench_startup:
+        _, eager = bench.run_startup_benchmark(args.bench_runs)
+        if eager:
+            sys.exit(1)
+    elif args.bench:
+        options = bench.BenchOptions(
+            directory=args.bench,
+            warmup=args.bench_warmup,
+            runs=args.bench_runs,
+            filter=args.bench_filter,
+            output=args.bench_output,
+            baseline=args.bench_baseline,
+            engine=args.engine,
+            quicken=args.quicken,
+            intern_strings=args.intern_strings,
+            max_steps=args.max_steps,
+            timeout=args.timeout,
+        )
+        results = bench.run_benchmarks(options)
+        if bench.regressions(results, options.threshold):
+            sys.exit(1)
+    elif args.batch:
+        options = batch.BatchOptions(
+            engine=args.engine,
+            optimise=args.optimise,
+            quicken=args.quicken,
+            intern_strings=args.intern_strings,
+            scanner=args.scanner,
+            stream=args.stream,
+            cache=args.cache,
+            max_steps=args.max_steps,
+            timeout=args.timeout,
+        )
+        code = batch.run_batch_command(args.batch, options, args.jobs, args.batch_report)
+        if code:
+            sys.exit(code)
+    elif args.src:
+        if args.src.exists() and args.compile:
+            output = args.output or args.src.with_name(f"{args.src.stem}_lox.py")
+            lox.compile_file(args.src, output)
+        elif args.src.exists():
             lox.run_file(args.src)
         else:
             # TODO: Output to stderror
+            from rich.console import Console
             stderr = Console(stderr=True)
             stderr.print(f"[Error] Could not find file: '{args.src}'")
     else:
+        from pylox.cli import programinfo
         pylox_info = programinfo.ProgramInfo(
             name="Lox",
             version="0.1.0",
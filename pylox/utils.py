@@ -4,7 +4,22 @@ Module for utility functions
 """
 
 import logging
-from rich.logging import RichHandler
+
+class LazyRichHandler(logging.Handler):
+    """Renders records with a RichHandler, which is only created (and Rich only imported) once a record is emitted.
+    Most runs never log anything, so they never pay for importing Rich
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.handler: logging.Handler | None = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.handler is None:
+            from rich.logging import RichHandler
+            self.handler = RichHandler()
+            self.handler.setFormatter(self.formatter)
+        self.handler.emit(record)
 
 def new_logger(name, global_loglevel=logging.ERROR):
     """Utility for initializing a logger.
@@ -12,7 +27,7 @@ def new_logger(name, global_loglevel=logging.ERROR):
     """
     FORMAT = "%(message)s"
     logging.basicConfig(
-        level=global_loglevel, format=FORMAT, datefmt="[%X]", handlers=[RichHandler()]
+        level=global_loglevel, format=FORMAT, datefmt="[%X]", handlers=[LazyRichHandler()]
     )
     logger = logging.getLogger(name)
     if name == "__main__":
@@ -21,4 +36,3 @@ def new_logger(name, global_loglevel=logging.ERROR):
     else:
         logger.setLevel(global_loglevel)
     return logger
-
@@ -0,0 +1,66 @@
+import io
+import json
+from pathlib import Path
+import pytest
+from rich.console import Console
+import pylox.cli.batch as batch
+from pylox.cli.batch import BatchOptions, collect, run_script, run_batch, run_batch_command
+
+@pytest.fixture
+def scripts(tmp_path: Path) -> Path:
+    (tmp_path / "jobs").mkdir()
+    (tmp_path / "jobs" / "a.lox").write_text("var x = 1;\nprint x;\n")
+    (tmp_path / "jobs" / "b.lox").write_text("print x;\n")
+    (tmp_path / "jobs" / "notes.txt").write_text("not a script")
+    (tmp_path / "bad.lox").write_text("print (;\n")
+    return tmp_path
+
+def test_collect(scripts):
+    paths = collect([scripts / "bad.lox", scripts / "jobs", scripts / "missing.lox"])
+    assert paths == [scripts / "bad.lox", scripts / "jobs" / "a.lox", scripts / "jobs" / "b.lox", scripts / "missing.lox"]
+
+def test_scripts_are_isolated(scripts, caplog):
+    a, b = run_batch([scripts / "jobs"], BatchOptions(cache=False), jobs=1)
+    assert (a.exit_code, a.stdout, a.status) == (0, "1\n", "ok")
+    # b doesn't see the global a defined
+    assert (b.exit_code, b.status) == (70, "runtime error")
+    assert "Undefined variable 'x'" in caplog.text
+
+def test_exit_codes(scripts):
+    assert run_script(scripts / "bad.lox", BatchOptions(cache=False)).exit_code == 65
+    missing = run_script(scripts / "missing.lox", BatchOptions())
+    assert (missing.exit_code, missing.status) == (66, "missing")
+
+def test_worker_pool_keeps_order(scripts):
+    results = run_batch([scripts / "jobs", scripts / "bad.lox"], BatchOptions(engine="closure", cache=False), jobs=2)
+    assert [Path(result.path).name for result in results] == ["a.lox", "b.lox", "bad.lox"]
+    assert [result.exit_code for result in results] == [0, 70, 65]
+    assert all(result.seconds > 0 for result in results)
+
+def test_batch_command_reports(scripts):
+    report = scripts / "report.json"
+    console = Console(file=io.StringIO(), width=200)
+    code = run_batch_command([scripts / "jobs"], BatchOptions(cache=False), jobs=1, report=report, console=console)
+    assert code == 70
+    assert "2 scripts, 1 failed" in console.file.getvalue()
+    results = json.loads(report.read_text())["results"]
+    assert [result["exit_code"] for result in results] == [0, 70]
+    assert results[0]["stdout"] == "1\n"
+
+def test_budget_applies_to_every_script(tmp_path, caplog):
+    (tmp_path / "forever.lox").write_text("var i = 0;\nwhile (true) { i = i + 1; }\n")
+    result = run_script(tmp_path / "forever.lox", BatchOptions(cache=False, max_steps=100))
+    assert result.exit_code == 70
+    assert "[line 2] Step budget of 100 exhausted" in caplog.text
+
+def test_options_reach_every_script(scripts, monkeypatch):
+    seen = []
+
+    class Recording(batch.Lox):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            seen.append((self.interpreter.quickening, self.interpreter.interning))
+
+    monkeypatch.setattr(batch, "Lox", Recording)
+    run_batch([scripts / "jobs"], BatchOptions(cache=False, quicken=False, intern_strings=True), jobs=1)
+    assert seen == [(False, True)] * 2
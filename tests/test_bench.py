@@ -0,0 +1,71 @@
+from pathlib import Path
+import io
+import json
+import subprocess
+import sys
+from rich.console import Console
+from pylox.cli import bench
+from pylox.engine.scanner import FastScanner
+from pylox.engine.loxparser import Parser
+
+def write_script(directory: Path, name: str, source: str) -> Path:
+    script = directory / f"{name}.lox"
+    script.write_text(source, encoding="utf-8")
+    return script
+
+def test_bench_writes_results_and_baseline(tmp_path):
+    write_script(tmp_path, "loop", "var i = 0; while (i < 10) i = i + 1; print clock() > 1;")
+    write_script(tmp_path, "broken", "print ;")
+    options = bench.BenchOptions(directory=tmp_path, warmup=0, runs=3, baseline=tmp_path / "baseline.json", output=tmp_path / "out.json")
+    console = Console(file=io.StringIO())
+
+    results = {result.name: result for result in bench.run_benchmarks(options, console)}
+
+    assert results["loop"].status == "ok"
+    assert len(results["loop"].timings) == 3
+    assert results["loop"].median is not None
+    assert results["broken"].status == "error"
+    report = json.loads((tmp_path / "out.json").read_text())
+    assert report["results"]["loop"]["median"] == results["loop"].median
+
+    # The first run creates the baseline, the second is compared against it
+    results = {result.name: result for result in bench.run_benchmarks(options, console)}
+    assert results["loop"].ratio is not None
+
+def test_options_reach_every_run(tmp_path, monkeypatch):
+    write_script(tmp_path, "add", "print 1 + 2;")
+    seen = []
+
+    class Recording(bench.Lox):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            seen.append((self.interpreter.quickening, self.interpreter.interning))
+
+    monkeypatch.setattr(bench, "Lox", Recording)
+    options = bench.BenchOptions(directory=tmp_path, warmup=1, runs=2, output=tmp_path / "out.json", quicken=False, intern_strings=True)
+    bench.run_benchmarks(options, Console(file=io.StringIO()))
+    assert seen == [(False, True)] * 3
+    report = json.loads((tmp_path / "out.json").read_text())
+    assert (report["quicken"], report["intern_strings"]) == (False, True)
+
+def test_count_nodes():
+    # Var, Binary, 2 Literals, Print, Variable
+    statements = Parser(FastScanner("var a = 1 + 2; print a;").scan_tokens(), repl_mode=False).parse()
+    assert bench.count_nodes(statements) == 6
+
+def test_memory_footprint_skips_broken_sources():
+    per_token, per_node = bench.memory_footprint(["var a = 1 + 2; print a;", "print ;", '"unterminated'])
+    assert 0 < per_token < 200
+    assert 0 < per_node < 200
+
+def test_script_run_imports_nothing_lazy(tmp_path):
+    command = bench.startup_commands(bench.write_startup_script(tmp_path))["pylox --src"]
+    assert bench.eager_imports(command) == []
+
+def test_errors_still_render_with_rich(tmp_path):
+    # Rich is imported when the first error gets reported
+    script = write_script(tmp_path, "broken", "var a = 1;\nprint a + nil;")
+    process = subprocess.run([sys.executable, "-m", "pylox", "--src", str(script)], capture_output=True, text=True)
+    assert process.returncode == 70
+    assert "ERROR" in process.stdout
+    assert "[line 2] Operands must be" in process.stdout
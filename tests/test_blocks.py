@@ -0,0 +1,79 @@
+import pytest
+from pylox.engine.lox import Lox, ENGINES
+from pylox.engine.transpiler import Transpiler
+from tests.test_transpiler import load_module
+
+LOOP = """
+fun sum(n) {
+    var total = 0;
+    var i = 1;
+    while (i <= n) {
+        var square = i * i;
+        { var half = square / 2; total = total + half; }
+        i = i + 1;
+    }
+    return total;
+}
+var i = 1;
+while (i <= 3) {
+    var j = i;
+    { var k = j * 2; print k; }
+    i = j + 1;
+}
+print sum(4);
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_blocks_without_escaping_locals(engine, capsys):
+    lox = Lox(engine)
+    lox.run(LOOP)
+    assert capsys.readouterr().out.splitlines() == ["2", "4", "6", "15"]
+
+@pytest.mark.parametrize("engine", ["tree", "closure"])
+def test_only_escaping_blocks_allocate(engine, capsys):
+    lox = Lox(engine, timings=True)
+    lox.run(LOOP)
+    capsys.readouterr()
+    # The top-level loop body's environment, then sum's frame
+    assert lox.timings.environments == 2
+
+CAPTURED = """
+var first;
+var last;
+var i = 1;
+while (i <= 3) {
+    var j = i;
+    fun get() { return j; }
+    if (j == 1) first = get;
+    last = get;
+    i = i + 1;
+}
+print first();
+print last();
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_captured_locals_get_an_environment_per_iteration(engine, capsys):
+    lox = Lox(engine)
+    lox.run(CAPTURED)
+    assert capsys.readouterr().out.splitlines() == ["1", "3"]
+
+@pytest.mark.parametrize("source, printed", [(LOOP, ["2", "4", "6", "15"]), (CAPTURED, ["1", "3"])])
+def test_transpiled_blocks(source, printed, tmp_path, capsys):
+    output = tmp_path / "blocks_lox.py"
+    output.write_text(Transpiler().transpile(Lox().parse(source)), encoding="utf-8")
+    load_module(output).run()
+    assert capsys.readouterr().out.splitlines() == printed
+
+def test_kept_environments_belong_to_their_interpreter(capsys):
+    source = "var n = 0; { var a = n + 1; n = a; }"
+    first = Lox("tree")
+    statements = first.parse(source)
+    first.execute(statements)
+    block = statements[1]
+    assert block.environment.enclosing is first.interpreter.globals
+    second = Lox("tree")
+    second.execute(statements)
+    second.execute(statements)
+    assert block.environment.enclosing is second.interpreter.globals
+    assert first.interpreter.globals.values["n"] == second.interpreter.globals.values["n"] == 1
@@ -0,0 +1,122 @@
+import logging
+import pathlib
+import pickle
+import pytest
+import sys
+from pylox.engine.lox import Lox
+from pylox.engine.cache import CACHE_DIR, MAGIC, ProgramCache, decode
+
+def run(script, capsys, **options) -> Lox:
+    lox = Lox(cache=True, timings=True, **options)
+    lox.run_file(script)
+    assert capsys.readouterr().out == "3\n"
+    return lox
+
+@pytest.fixture
+def script(tmp_path):
+    script = tmp_path / "add.lox"
+    script.write_text("var a = 1;\nprint a + 2;\n", encoding="utf-8")
+    return script
+
+def test_second_run_hits_the_cache(script, capsys):
+    first = run(script, capsys)
+    assert (first.cache.hits, first.cache.misses) == (0, 1)
+    second = run(script, capsys)
+    assert (second.cache.hits, second.cache.misses) == (1, 0)
+    assert (second.timings.cache_hits, second.timings.cache_misses) == (1, 0)
+    # Nothing was scanned or parsed
+    assert second.timings.tokens == 0
+    # Written atomically: no temporary files are left behind
+    assert [path.name for path in (script.parent / CACHE_DIR).iterdir()] == ["add.opt.loxc"]
+
+def test_changed_source_misses(script, capsys):
+    run(script, capsys)
+    script.write_text("var a = 2;\nprint a + 1;\n", encoding="utf-8")
+    assert run(script, capsys).cache.misses == 1
+    assert run(script, capsys).cache.hits == 1
+
+def test_options_are_cached_separately(script, capsys):
+    run(script, capsys)
+    assert run(script, capsys, optimise=False).cache.misses == 1
+    assert run(script, capsys).cache.hits == 1
+
+def test_new_version_misses(script, capsys, monkeypatch):
+    run(script, capsys)
+    monkeypatch.setattr("pylox.engine.cache.__version__", "999")
+    assert run(script, capsys).cache.misses == 1
+
+def test_corrupt_entry_misses_and_is_replaced(script, capsys):
+    run(script, capsys)
+    entry = script.parent / CACHE_DIR / "add.opt.loxc"
+    entry.write_bytes(entry.read_bytes()[:-10])
+    assert run(script, capsys).cache.misses == 1
+    assert run(script, capsys).cache.hits == 1
+
+def test_errors_are_not_cached(tmp_path, capsys):
+    script = tmp_path / "broken.lox"
+    script.write_text("print ;", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        Lox(cache=True).run_file(script)
+    assert not (tmp_path / CACHE_DIR).exists()
+
+def test_no_cache_writes_nothing(script, capsys):
+    lox = Lox()
+    lox.run_file(script)
+    assert lox.cache is None
+    assert not (script.parent / CACHE_DIR).exists()
+
+class Payload:
+    """Creates its file when unpickled"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (pathlib.Path.touch, (self.path,))
+
+def forge(script, body: bytes) -> None:
+    """Writes an entry with a valid header for the script, as anyone who can write next to it could"""
+    cache = ProgramCache()
+    entry = cache.path(script, optimise=True)
+    entry.parent.mkdir(exist_ok=True)
+    entry.write_bytes(MAGIC + cache.key(script.read_text(encoding="utf-8"), optimise=True) + body)
+
+def test_pickled_entries_are_never_loaded(script, capsys, tmp_path):
+    marker = tmp_path / "pwned"
+    forge(script, pickle.dumps(Payload(marker)))
+    assert run(script, capsys).cache.misses == 1
+    assert not marker.exists()
+
+@pytest.mark.parametrize("body", [b'["list",[["Payload","x"]]]', b'["list",[["Token","PRINT","print",null,1]]]', b'["set",[]]'])
+def test_entries_only_decode_into_programs(script, capsys, body):
+    forge(script, body)
+    assert run(script, capsys).cache.misses == 1
+    assert run(script, capsys).cache.hits == 1
+
+@pytest.mark.parametrize("body", [
+    b'["list",[["Print",["Token","PRINT","print",null,1]]]]',
+    b'["list",[["Print",["Literal",["list",[]],false]]]]',
+    b'["list",[["Print",["Variable",["Token","IDENTIFIER","a",null,"1"],null,null]]]]',
+    b'["list",[["Block",["list",[]],0,["frozenset",["x"]],false]]]',
+])
+def test_ill_typed_fields_miss(script, capsys, body):
+    # Each of these would decode into a program that only fails once it's run
+    forge(script, body)
+    assert run(script, capsys).cache.misses == 1
+
+def test_hits_are_interned(script, capsys):
+    script.write_text('var total = "sum";\nprint total;\n', encoding="utf-8")
+    Lox(cache=True).run_file(script)
+    statements = ProgramCache().load(script, script.read_text(encoding="utf-8"), optimise=True)
+    assert capsys.readouterr().out == "'sum'\n"
+    name, value = statements[0].name.lexeme, statements[0].initializer.value
+    assert name is sys.intern("".join(["to", "tal"]))
+    assert value is sys.intern("".join(["s", "um"]))
+    assert decode(["Token", "IDENTIFIER", "".join(["to", "tal"]), None, 1]).lexeme is name
+
+def test_limited_runs_skip_the_cache(script, capsys):
+    lox = Lox(cache=True, max_steps=1000)
+    lox.run_file(script)
+    assert capsys.readouterr().out == "3\n"
+    assert lox.cache is None
+    assert not (script.parent / CACHE_DIR).exists()
@@ -0,0 +1,48 @@
+from pathlib import Path
+import logging
+import pytest
+from pylox.engine.lox import Lox, ENGINES
+
+SAMPLES = Path("./tests/samples")
+# The benchmarks are far too slow for a tree-walker test run
+SOURCES = sorted(path for path in SAMPLES.rglob("*.lox") if path.parent.name != "benchmark")
+
+def run_sample(path: Path, engine: str, capsys, caplog, optimise: bool = True, stream: bool = False, scanner: str = "fast") -> tuple:
+    caplog.clear()
+    lox = Lox(engine, optimise, scanner=scanner, stream=stream)
+    with caplog.at_level(logging.ERROR):
+        lox.run(path.read_text(encoding="utf-8"))
+    out = capsys.readouterr().out
+    errors = [record.getMessage() for record in caplog.records]
+    return out, errors, lox.had_error, lox.had_runtime_error
+
+@pytest.mark.parametrize("engine", [engine for engine in ENGINES if engine != "tree"])
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_engine_matches_tree_walker(path, engine, capsys, caplog):
+    expected = run_sample(path, "tree", capsys, caplog)
+    assert run_sample(path, engine, capsys, caplog) == expected
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_global_caches_follow_redefinitions(engine, capsys, caplog):
+    lox = Lox(engine)
+    read = lox.parse("a = a + 1; print a;")
+    lox.run("var a = 1;", repl_mode=True)
+    lox.execute(read)
+    lox.execute(read)
+    # Redefined (as in the REPL): the same nodes must see the new binding
+    lox.run('var a = 10;', repl_mode=True)
+    lox.execute(read)
+    lox.run("var a;", repl_mode=True)
+    lox.execute(read)
+    assert capsys.readouterr().out.splitlines() == ["2", "3", "11"]
+    assert "Uninitialized variable 'a'" in caplog.text
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_global_caches_are_per_interpreter(engine, capsys):
+    # Nodes (and their caches) are shared by every Lox that executes them
+    statements = Lox(engine).parse("var i = 1; while (i < 4) { total = total + i; i = i + 1; } print total;")
+    for start in (1, 100):
+        lox = Lox(engine)
+        lox.run(f"var total = {start};")
+        lox.execute(statements)
+    assert capsys.readouterr().out.splitlines() == ["7", "106"]
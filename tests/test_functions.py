@@ -0,0 +1,108 @@
+import sys
+import pytest
+from pylox.engine.lox import Lox, ENGINES
+from pylox.engine.loxfunction import FRAMES_MAX
+from pylox.engine.transpiler import Transpiler
+from tests.test_transpiler import load_module
+
+COUNTDOWN = """
+fun countdown(n) {
+    var next = n - 1;
+    if (n > 1) return countdown(next) + 1;
+    return 1;
+}
+print countdown(3);
+print countdown(10);
+"""
+
+def test_frames_are_reused(capsys):
+    lox = Lox("tree", timings=True)
+    lox.run(COUNTDOWN)
+    assert capsys.readouterr().out.splitlines() == ["3", "10"]
+    function = lox.interpreter.globals.values["countdown"]
+    # The deepest recursion needed 10 frames, which were all handed back
+    assert len(function.frames) == 10
+    assert lox.timings.environments == 10
+
+@pytest.mark.parametrize("engine", ["tree", "closure"])
+def test_captured_frames_are_not_reused(engine, capsys):
+    lox = Lox(engine)
+    lox.run("""
+        fun counter() { var i = 0; fun count() { i = i + 1; return i; } return count; }
+        var a = counter();
+        var b = counter();
+        a(); a();
+        print a();
+        print b();
+    """)
+    assert capsys.readouterr().out.splitlines() == ["3", "1"]
+    assert lox.interpreter.globals.values["counter"].frames is None
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_return_unwinds_loops_and_blocks(engine, capsys):
+    lox = Lox(engine)
+    lox.run("""
+        fun find(limit) {
+            var i = 1;
+            while (true) {
+                { if (i * i > limit) return i; }
+                i = i + 1;
+            }
+        }
+        print find(50);
+        print find(5);
+    """)
+    assert capsys.readouterr().out.splitlines() == ["8", "3"]
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_stack_overflow(engine, capsys, caplog):
+    lox = Lox(engine)
+    lox.run(f"""
+        fun depth(n) {{
+            print n;
+            return depth(n + 1);
+        }}
+        depth(1);
+    """)
+    assert capsys.readouterr().out.split()[-1] == str(FRAMES_MAX)
+    assert "[line 4] Stack overflow." in caplog.text
+    # Nothing is left over for the next run
+    lox.had_runtime_error = False
+    lox.run("print depth;")
+    assert not lox.had_runtime_error
+    assert lox.interpreter.depth == 0
+
+DEEP = """
+fun sum(n) {
+    if (n == 0) return 0;
+    {
+        var rest = sum(n - 1);
+        while (true) return n + rest;
+    }
+}
+print sum(500);
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_deep_recursion(engine, capsys):
+    limit = sys.getrecursionlimit()
+    lox = Lox(engine)
+    lox.run(DEEP)
+    assert not lox.had_runtime_error
+    assert capsys.readouterr().out == "125250\n"
+    assert sys.getrecursionlimit() == limit
+
+def test_transpiled_deep_recursion(tmp_path, capsys):
+    output = tmp_path / "deep_lox.py"
+    output.write_text(Transpiler().transpile(Lox().parse(DEEP)), encoding="utf-8")
+    load_module(output).run()
+    assert capsys.readouterr().out == "125250\n"
+
+@pytest.mark.parametrize("engine", ["tree", "closure"])
+def test_python_stack_overflow(engine, capsys, caplog):
+    # Nested deeply enough that Python's stack runs out before FRAMES_MAX calls
+    lox = Lox(engine)
+    lox.run("fun f(n) {" + " if (n != 0) {" * 60 + " print n; f(n + 1);" + " }" * 60 + " } f(1);")
+    assert int(capsys.readouterr().out.split()[-1]) < FRAMES_MAX
+    assert "[line 1] Stack overflow." in caplog.text
+    assert lox.interpreter.depth == 0
@@ -0,0 +1,51 @@
+import pytest
+from pylox.engine.lox import Lox
+from pylox.engine.scanner import FastScanner
+
+SOURCE = """
+var i = 0;
+while (i < 3) {
+    var j = i;
+    i = j + 1;
+}
+print i;
+"""
+
+def run(engine: str, capsys) -> Lox:
+    lox = Lox(engine, timings=True)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == "3\n"
+    return lox
+
+def test_timings_are_collected(capsys):
+    timings = run("tree", capsys).timings
+    assert timings.tokens == 28
+    assert timings.nodes == 16
+    # The loop body's environment is kept from one iteration to the next
+    assert timings.environments == 1
+    # var, while, print, then var and assignment per iteration
+    assert timings.statements == 3 + 3 * 3
+    assert timings.total == pytest.approx(timings.scan + timings.parse + timings.optimise + timings.resolve + timings.execute)
+    assert timings.execute > 0
+
+def test_engines_count_the_same(capsys):
+    expected = run("tree", capsys).timings
+    closure = run("closure", capsys).timings
+    assert (closure.environments, closure.statements) == (expected.environments, expected.statements)
+    vm = run("vm", capsys).timings
+    assert (vm.environments, vm.statements) == (0, None)
+
+def test_disabled_instrumentation_installs_nothing(capsys):
+    lox = Lox("tree")
+    lox.run(SOURCE)
+    assert lox.timings is None
+    assert "execute" not in vars(lox.interpreter)
+
+def test_debug_rendering_is_skipped(monkeypatch, capsys):
+    def fail(*args):
+        raise AssertionError("rendered with logging disabled")
+    lox = Lox("tree")
+    monkeypatch.setattr(lox.astprinter, "print", fail)
+    monkeypatch.setattr(FastScanner, "log_tokens", fail)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == "3\n"
@@ -0,0 +1,108 @@
+import pytest
+from pylox.engine.lox import Lox
+from pylox.engine.interpreter import BudgetExceededError
+from pylox.engine.limits import Budget
+
+ENGINES = ["tree", "closure", "vm"]
+
+SOURCE = """var i = 1;
+while (i < 4) {
+    i = i + 1;
+}
+print i;
+"""
+
+FOREVER = """var i = 1;
+while (i > -1) {
+    i = i + 1;
+}
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_steps_are_loop_iterations_and_block_entries(engine, capsys):
+    lox = Lox(engine, max_steps=3)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == "4\n"
+    assert not lox.had_runtime_error
+    # 3 iterations, each charged once when entering the body's block
+    assert lox.budget.used == 3
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_function_calls_are_steps(engine, caplog):
+    # Recursion can run for ever without a loop or a block
+    lox = Lox(engine, max_steps=10)
+    lox.run("fun f(n) {\n  return f(n + 1);\n}\nf(0);")
+    assert lox.had_runtime_error
+    assert "[line 1] Step budget of 10 exhausted" in caplog.text
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_step_budget_exhausted(engine, capsys):
+    lox = Lox(engine, max_steps=2)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == ""
+    assert lox.had_runtime_error
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_budget_error_reports_the_line(engine):
+    lox = Lox(engine, max_steps=100)
+    statements = lox.parse(FOREVER)
+    lox.budget.start()
+    with pytest.raises(BudgetExceededError) as e:
+        lox.interpreter.interpret(statements)
+    # The first statement of the loop's body
+    assert e.value.line == 3
+    assert e.value.message == "Step budget of 100 exhausted"
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_timeout(engine):
+    lox = Lox(engine, timeout=0.05)
+    statements = lox.parse(FOREVER)
+    lox.budget.start()
+    with pytest.raises(BudgetExceededError, match="Timeout of 0.05s exceeded"):
+        lox.interpreter.interpret(statements)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_budget_error_reports_the_line_across_runs(engine, caplog):
+    # The program of each run is garbage once it's over, and the next one's nodes may reuse its ids
+    lox = Lox(engine, max_steps=5)
+    for run in range(30):
+        caplog.clear()
+        lox.run("\n" * (run % 3) + FOREVER)
+        assert f"[line {run % 3 + 3}] Step budget of 5 exhausted" in caplog.text
+
+def test_budget_is_reset_for_every_run(capsys):
+    lox = Lox(max_steps=3)
+    lox.run(SOURCE)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == "4\n4\n"
+    assert not lox.had_runtime_error
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_loop_without_block_is_charged_per_iteration(engine, capsys):
+    lox = Lox(engine, max_steps=3)
+    lox.run("var i = 0; while (i < 3) i = i + 1; print i;")
+    assert capsys.readouterr().out == "3\n"
+    assert lox.budget.used == 3
+
+def test_straight_line_code_is_free(capsys):
+    lox = Lox(max_steps=0)
+    lox.run("var a = 1; print a + 1;")
+    assert capsys.readouterr().out == "2\n"
+    assert lox.budget.used == 0
+
+def test_clock_is_only_read_at_checkpoints():
+    budget = Budget(seconds=60)
+    assert budget.checkpoint == Budget.CLOCK_INTERVAL
+    budget = Budget(steps=10, seconds=60)
+    assert budget.checkpoint == 11
+
+def test_invalid_budgets():
+    with pytest.raises(ValueError):
+        Budget(steps=-1)
+    with pytest.raises(ValueError):
+        Budget(seconds=0)
+
+def test_unlimited_installs_nothing():
+    lox = Lox()
+    assert lox.budget is None
+    assert "visit_while" not in vars(lox.interpreter)
@@ -0,0 +1,35 @@
+import pytest
+from pylox.engine.scanner import Scanner
+from pylox.engine.loxparser import Parser
+from pylox.engine.optimiser import Optimiser
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+from tests.test_engines import SOURCES, run_sample
+
+def optimise(source: str) -> list[stmt.Stmt]:
+    tokens = Scanner(source).scan_tokens()
+    return Optimiser().optimise(Parser(tokens, repl_mode=False).parse())
+
+def test_folds_constant_subtrees():
+    printed, = optimise("print (2 + 3) * 4 == 20;")
+    assert printed.expression == expr.Literal(True, folded=True)
+
+def test_errors_are_left_for_runtime():
+    printed, = optimise("print 1 +\n (2 / 0);")
+    division = printed.expression.right
+    assert isinstance(division, expr.Binary)
+    assert division.operator.line == 2
+
+def test_prunes_constant_branches():
+    statements = optimise("if (1 > 2) print 1; else print 2; while (false) print 3; if (nil) print 4;")
+    assert statements == [stmt.Print(expr.Literal(2.0))]
+
+def test_simplifies_multiplication_by_one():
+    assignment, = optimise("a = (a - 1) * 1;")
+    assert isinstance(assignment.expression.value, expr.Binary)
+    assert assignment.expression.value.operator.lexeme == "-"
+
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_optimised_program_behaves_the_same(path, capsys, caplog):
+    optimised = run_sample(path, "tree", capsys, caplog)
+    assert run_sample(path, "tree", capsys, caplog, optimise=False) == optimised
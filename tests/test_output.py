@@ -0,0 +1,30 @@
+import logging
+from pylox.engine.lox import Lox
+from pylox.engine.natives import NATIVES
+from pylox.engine.output import PlainOutput, to_text
+
+def test_to_text_matches_stringify_without_markup():
+    assert [to_text(value) for value in (None, 3.0, -0.5, True, False, "s", NATIVES["clock"])] \
+        == ["nil", "3", "-0.5", "true", "false", "'s'", "<native fn>"]
+
+def test_plain_output_flushes_in_batches(capsys):
+    output = PlainOutput()
+    for i in range(PlainOutput.BATCH + 1):
+        output.write(float(i))
+    assert capsys.readouterr().out.count("\n") == PlainOutput.BATCH
+    output.flush()
+    assert capsys.readouterr().out == f"{PlainOutput.BATCH}\n"
+
+def test_output_is_flushed_before_runtime_errors(capsys, caplog):
+    lox = Lox()
+    with caplog.at_level(logging.ERROR):
+        lox.run('print 1; print "a" + 1;')
+    assert capsys.readouterr().out == "1\n"
+    assert lox.had_runtime_error
+
+def test_colour_output_prints_the_same_text(capsys):
+    source = 'print 1.5; print "text"; print nil; print 1 < 2; print clock;'
+    Lox().run(source)
+    plain = capsys.readouterr().out
+    Lox(colour=True).run(source)
+    assert capsys.readouterr().out == plain
@@ -0,0 +1,81 @@
+import pytest
+from pylox.engine.scanner import FastScanner, BufferScanner, ScannerError
+from pylox.engine.tokenbuffer import TokenBuffer
+from pylox.engine.loxparser import Parser, BufferParser, ParserError
+import pylox.engine.stmt as stmt
+from tests.test_engines import SOURCES, run_sample
+
+def test_parser_pulls_tokens_lazily():
+    pulled = list()
+
+    def tokens():
+        for token in FastScanner("print 1; print 2 + 3; var a = 4;").stream_tokens():
+            pulled.append(token)
+            yield token
+
+    statements = Parser(tokens(), repl_mode=False).statements()
+    first = next(statements)
+    assert isinstance(first, stmt.Print)
+    # 'print 1 ;' and one token of lookahead
+    assert len(pulled) == 4
+    assert len(list(statements)) == 2
+
+def test_synchronize_with_streamed_tokens():
+    parser = Parser(FastScanner("print 1 2; var a = 3;").stream_tokens(), repl_mode=False)
+    with pytest.raises(ParserError):
+        parser.declaration()
+    # synchronize skipped past the ';' of the broken statement
+    assert parser.previous().lexeme == ";"
+    assert isinstance(parser.declaration(), stmt.Var)
+
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_streamed_program_behaves_the_same(path, capsys, caplog):
+    expected = run_sample(path, "tree", capsys, caplog)
+    assert run_sample(path, "tree", capsys, caplog, stream=True) == expected
+
+def test_tokens_and_nodes_are_slotted():
+    statement, = Parser(FastScanner("var name = name + 1;").stream_tokens(), repl_mode=False).parse()
+    assert not hasattr(statement, "__dict__")
+    assert not hasattr(statement.initializer, "__dict__")
+    assert not hasattr(statement.name, "__dict__")
+    # Identifier lexemes are interned
+    assert statement.name.lexeme is statement.initializer.left.name.lexeme
+
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_token_buffer_program_behaves_the_same(path, capsys, caplog):
+    expected = run_sample(path, "tree", capsys, caplog)
+    assert run_sample(path, "tree", capsys, caplog, scanner="buffer") == expected
+
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_token_buffer_parses_the_same_tree(path):
+    source = path.read_text(encoding="utf-8")
+    try:
+        parser = Parser(BufferScanner(source).scan_tokens(), repl_mode=False)
+    except ScannerError:
+        pytest.skip("scanner error")
+    assert isinstance(parser, BufferParser)
+    try:
+        expected = Parser(FastScanner(source).scan_tokens(), repl_mode=False).parse()
+    except ParserError as e:
+        with pytest.raises(ParserError) as error:
+            parser.parse()
+        assert (error.value.token, error.value.message) == (e.token, e.message)
+        return
+    assert parser.parse() == expected
+
+def test_token_buffer_builds_only_kept_tokens(monkeypatch):
+    built = []
+    getitem = TokenBuffer.__getitem__
+    monkeypatch.setattr(TokenBuffer, "__getitem__", lambda buffer, index: built.append(getitem(buffer, index)) or built[-1])
+    parser = Parser(BufferScanner('var a = 1 + 2; print a; print "s";').scan_tokens(), repl_mode=False)
+    parser.parse()
+    assert [token.lexeme for token in built] == ["a", "+", "a"]
+    assert parser.current + 1 == 14
+
+def test_synchronize_with_token_buffer():
+    parser = Parser(BufferScanner("print 1 2; var a = 3;").scan_tokens(), repl_mode=False)
+    with pytest.raises(ParserError) as error:
+        parser.declaration()
+    assert error.value.token.lexeme == "2"
+    assert parser.previous().lexeme == ";"
+    assert isinstance(parser.declaration(), stmt.Var)
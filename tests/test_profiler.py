@@ -0,0 +1,72 @@
+import pytest
+from pylox.engine.lox import Lox, ENGINES
+
+SOURCE = """var i = 1;
+while (i < 4) {
+    i = i + 1;
+}
+print i;
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_hits_are_attributed_to_lines(engine, capsys):
+    lox = Lox(engine, profile=True)
+    lox.run(SOURCE)
+    assert capsys.readouterr().out == "4\n"
+    assert dict(lox.profiler.hits) == {1: 1, 2: 1, 3: 3, 5: 1}
+    # The loop's total time includes its body, its self time doesn't
+    profiler = lox.profiler
+    assert profiler.total_time[2] >= profiler.self_time[2] + profiler.self_time[3]
+
+def test_collapsed_stacks(tmp_path, capsys):
+    output = tmp_path / "profile.folded"
+    lox = Lox(profile_output=output)
+    lox.run(SOURCE)
+    lox.report_profile(SOURCE, "loop.lox")
+    stacks = [line.rsplit(" ", 1)[0] for line in output.read_text().splitlines()]
+    assert stacks == ["loop.lox:1", "loop.lox:2", "loop.lox:2;loop.lox:3", "loop.lox:5"]
+    assert "i = i + 1;" in capsys.readouterr().err
+
+def test_profiler_off_installs_nothing(capsys):
+    lox = Lox()
+    lox.run(SOURCE)
+    assert lox.profiler is None
+    assert "execute" not in vars(lox.interpreter)
+
+RETURNS = """fun fib(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+}
+print fib(5);
+fun first(n) {
+    while (true) {
+        if (n > 2) return n;
+        n = n + 1;
+    }
+}
+print first(0);
+print 1 + nil;
+"""
+
+def test_engines_agree_on_nested_statements(capsys):
+    # Returns leave the statements they're nested in, and so does an error
+    profiles = []
+    for engine in ENGINES:
+        lox = Lox(engine, profile=True)
+        lox.run(RETURNS)
+        profiler = lox.profiler
+        assert profiler.stack == profiler.nested == profiler.starts == []
+        profiles.append((dict(profiler.hits), sorted(profiler.stacks)))
+    assert capsys.readouterr().out == "5\n3\n" * len(ENGINES)
+    assert all(profile == profiles[0] for profile in profiles)
+    # 15 calls test n < 2, and 8 of them return n
+    assert profiles[0][0][2] == 23
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_lines_are_right_across_runs(engine):
+    # The program of each run is garbage once it's over, and the next one's nodes may reuse its ids
+    lox = Lox(engine, profile=True)
+    for run in range(30):
+        lox.profiler.hits.clear()
+        lox.run("\n" * (run % 3) + "var x = 1;")
+        assert dict(lox.profiler.hits) == {run % 3 + 1: 1}
@@ -0,0 +1,89 @@
+import io
+import pytest
+import pylox
+from pylox.engine.program import Program, to_lox
+
+ENGINES = ["tree", "closure", "vm"]
+
+SOURCE = """var total = 0;
+var i = 1;
+while (i < 4) {
+    total = total + price * i;
+    i = i + 1;
+}
+print total;
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_compile_once_run_many(engine):
+    program = pylox.compile(SOURCE, engine=engine)
+    assert isinstance(program, Program)
+    for price in (1, 2.5, 10):
+        out = io.StringIO()
+        result = program.run(globals={"price": price}, stdout=out)
+        assert out.getvalue() == f"{pylox.engine.output.to_text(price * 6.0)}\n"
+        assert result == {"price": float(price), "total": price * 6.0, "i": 4.0}
+
+def test_runs_are_isolated():
+    program = pylox.compile("var count = 1; print count;")
+    first = program.run(stdout=io.StringIO())
+    second = program.run(globals={"other": "x"}, stdout=io.StringIO())
+    assert first == {"count": 1.0}
+    assert second == {"other": "x", "count": 1.0}
+
+@pytest.mark.parametrize("source, error", [
+    ("var a = 1;\nprint (;", "[line 2] Error at ';': Expect expression."),
+    ('print "abc;', "[line 1] Error : Unterminated string."),
+])
+def test_compile_errors_are_raised(source, error, capsys):
+    with pytest.raises(pylox.CompileError) as e:
+        pylox.compile(source)
+    assert e.value.errors == [error]
+    assert str(e.value) == error
+    assert capsys.readouterr() == ("", "")
+
+def test_runtime_errors_are_raised(capsys):
+    program = pylox.compile("print missing;")
+    with pytest.raises(pylox.LoxRuntimeError) as e:
+        program.run()
+    assert (e.value.line, e.value.message) == (1, "Undefined variable 'missing'.")
+    # Nothing is printed or exited on
+    assert capsys.readouterr() == ("", "")
+
+def test_output_before_an_error_is_written():
+    out = io.StringIO()
+    with pytest.raises(pylox.LoxRuntimeError):
+        pylox.compile("print 1;\nprint nil + 1;").run(stdout=out)
+    assert out.getvalue() == "1\n"
+
+def test_python_functions_become_natives():
+    out = io.StringIO()
+    pylox.compile('print shout("hi") + "!"; print twice(21);').run(
+        globals={"shout": lambda s: s.upper(), "twice": lambda n: int(n) * 2},
+        stdout=out,
+    )
+    assert out.getvalue() == "'HI!'\n42\n"
+
+def test_budget():
+    program = pylox.compile("var i = 1; while (i > -1) { i = i + 1; }")
+    with pytest.raises(pylox.BudgetExceededError):
+        program.run(max_steps=100)
+
+def test_unconvertible_globals():
+    assert to_lox("n", 3) == 3.0
+    assert to_lox("b", True) is True
+    with pytest.raises(TypeError, match="Global 'xs' has no Lox equivalent: list"):
+        to_lox("xs", [1, 2])
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        pylox.compile("print 1;", engine="jit")
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_runs_with_other_types_reuse_the_tree(engine):
+    # Each run specialises the tree for its own operands, which the next run mustn't rely on
+    program = pylox.compile("print a + b;", engine=engine)
+    for a, b, text in [("x", "y", "'xy'"), (1, 2, "3"), ("x", "y", "'xy'"), (1.5, 1, "2.5")]:
+        out = io.StringIO()
+        program.run(globals={"a": a, "b": b}, stdout=out)
+        assert out.getvalue() == f"{text}\n"
@@ -0,0 +1,115 @@
+from dataclasses import fields
+import pickle
+import pytest
+from pylox.engine.lox import Lox
+from pylox.cli.astprinter import AstPrinter
+import pylox.engine.expr as expr
+import pylox.engine.stmt as stmt
+from pylox.engine import quicken
+from pylox.engine.cache import encode, decode
+
+def binaries(node: object) -> list[expr.Binary | expr.Unary]:
+    """Every Binary and Unary node under node, in source order"""
+    found = [node] if isinstance(node, (expr.Binary, expr.Unary)) else []
+    children = []
+    if isinstance(node, (expr.Expr, stmt.Stmt)):
+        children = [getattr(node, field.name) for field in fields(node)]
+    elif isinstance(node, list):
+        children = node
+    for child in children:
+        found.extend(binaries(child))
+    return found
+
+def run(source: str, capsys, quicken: bool = True) -> tuple[list[str], list, Lox]:
+    lox = Lox("tree", quicken=quicken)
+    statements = lox.parse(source)
+    lox.execute(statements)
+    return capsys.readouterr().out.splitlines(), statements, lox
+
+LOOP = """
+var i = 1;
+var s = "";
+while (i <= 3) {
+    s = s + "a";
+    print -i * 2 != !(i > 5);
+    i = i + 1;
+}
+print s;
+"""
+
+def test_nodes_specialise_for_what_they_see(capsys):
+    out, statements, _ = run(LOOP, capsys)
+    assert out == ["true"] * 3 + ["'aaa'"]
+    assert [type(node) for node in binaries(statements)] == [
+        quicken.LessEqualFloats,
+        quicken.ConcatenateStrings,
+        quicken.NotEqual, quicken.MultiplyFloats, quicken.NegateFloat, quicken.Not, quicken.GreaterFloats,
+        quicken.AddFloats,
+    ]
+
+def test_without_quickening_nodes_stay_generic(capsys):
+    out, statements, _ = run(LOOP, capsys, quicken=False)
+    assert out == ["true"] * 3 + ["'aaa'"]
+    assert {type(node) for node in binaries(statements)} == {expr.Binary, expr.Unary}
+
+def test_guard_failure_deoptimises(capsys):
+    out, statements, lox = run("""
+        var x = 1;
+        var i = 1;
+        while (i < 4) {
+            print x + x;
+            print -x;
+            if (i == 2) x = "s";
+            i = i + 1;
+        }
+    """, capsys)
+    assert out == ["2", "-1", "2", "-1", "'ss'"]
+    assert lox.had_runtime_error
+    plus, negate = binaries(statements)[1:3]
+    assert (type(plus), type(negate)) == (quicken.GenericBinary, quicken.GenericUnary)
+
+def test_deoptimised_in_a_recursive_call_stays_generic(capsys):
+    # The outer evaluations of the '+' are still running when the inner call (with strings) de-optimises it
+    out, statements, _ = run("""
+        fun g(n, t) {
+            if (n == 0) return t;
+            return g(n - 1, t) + k(n, t);
+        }
+        fun k(n, t) {
+            if (n == 3) g(1, "s");
+            return t;
+        }
+        print g(3, 1);
+    """, capsys)
+    assert out == ["4"]
+    plus, = [node for node in binaries(statements) if node.operator.lexeme == "+"]
+    assert type(plus) is quicken.GenericBinary
+
+def test_adding_zero_keeps_the_specialisation(capsys):
+    out, statements, _ = run("var i = 0; while (i < 3) { print i + 0; i = i + 1; }", capsys)
+    assert out == ["0", "1", "2"]
+    assert [type(node) for node in binaries(statements)] == [quicken.LessFloats, quicken.AddFloats, quicken.AddFloats]
+
+@pytest.mark.parametrize("source, printed, message", [
+    ("var i = 1; while (i < 4) { print 6 / (3 - i); i = i + 1; }", ["3", "6"], "[line 1] Division by Zero is undefined"),
+    ('var x = 2; var i = 1; while (i < 3) { print x - 1; x = "s"; i = i + 1; }', ["1"], "[line 1] Operands must be the numbers."),
+    ('var x = "a"; var i = 1; while (i < 3) { print x + "b"; x = 1; i = i + 1; }', ["'ab'"], "[line 1] Operands must be two numbers or two strings"),
+])
+def test_errors_after_specialising(source, printed, message, capsys, caplog):
+    out, _, lox = run(source, capsys)
+    assert out == printed
+    assert lox.had_runtime_error
+    assert message in caplog.text
+
+def test_other_visitors_see_plain_nodes(capsys):
+    out, statements, _ = run(LOOP, capsys)
+    printed = [AstPrinter(rev_polish_notation=False).print(statement) for statement in statements]
+    assert printed == [AstPrinter(rev_polish_notation=False).print(statement) for statement in Lox().parse(LOOP)]
+    # Compiled to bytecode after the tree-walker specialised them
+    vm = Lox("vm")
+    vm.execute(statements)
+    assert capsys.readouterr().out.splitlines() == out
+    # And pickled as plain nodes
+    assert {type(node) for node in binaries(pickle.loads(pickle.dumps(statements)))} == {expr.Binary, expr.Unary}
+    # And cached the same way
+    assert {type(node) for node in binaries(decode(encode(statements)))} == {expr.Binary, expr.Unary}
@@ -0,0 +1,69 @@
+import pytest
+from pylox.engine.scanner import Scanner
+from pylox.engine.loxparser import Parser
+from pylox.engine.resolver import Resolver, ResolverError
+import pylox.engine.stmt as stmt
+
+def resolve(source: str) -> list[stmt.Stmt]:
+    tokens = Scanner(source).scan_tokens()
+    statements = Parser(tokens, repl_mode=False).parse()
+    return Resolver().resolve(statements)
+
+def test_resolves_depth_and_slot():
+    # The function could capture the blocks' locals, so each block gets an environment of its own
+    outer, = resolve("var g; { var a; var b; { var c; b = c; print g; fun f() {} } }")[1:]
+    assert outer.size == 2
+    inner = outer.statements[2]
+    assert inner.size == 2
+    assign = inner.statements[1].expression
+    assert (assign.depth, assign.slot) == (1, 1)
+    assert (assign.value.depth, assign.value.slot) == (0, 0)
+    # Globals are left unresolved
+    assert inner.statements[2].expression.depth is None
+    assert not outer.reused and not inner.reused
+
+def test_blocks_are_flattened_into_the_enclosing_environment():
+    function, = resolve("fun f(a) { { var b; { var c = a + b; } } { var d; d = a; } }")
+    # c's slot is handed back when its block ends, and d reuses b's
+    assert function.size == 3
+    first, second = function.body
+    assert (first.size, first.statements[1].size, second.size) == (0, 0, 0)
+    c = first.statements[1].statements[0]
+    assert c.slot == 2
+    assert (c.initializer.left.depth, c.initializer.left.slot) == (0, 0)
+    assert (c.initializer.right.depth, c.initializer.right.slot) == (0, 1)
+    assign = second.statements[1].expression
+    assert (assign.depth, assign.slot, assign.value.slot) == (0, 1, 0)
+
+def test_top_level_blocks_keep_their_environment():
+    outer, = resolve("var i = 1; while (i < 3) { var j = i; { var k = j; } i = j + 1; }")[1:]
+    body = outer.body
+    assert (body.size, body.reused) == (2, True)
+    assert (body.statements[1].size, body.statements[1].reused) == (0, False)
+
+def test_declaration_free_blocks_need_no_environment():
+    function, = resolve("fun f(a) { var b; while (a < 3) { { a = a + b; } } }")
+    loop = function.body[1]
+    assert (loop.body.size, loop.body.statements[0].size) == (0, 0)
+    assign = loop.body.statements[0].statements[0].expression
+    assert (assign.depth, assign.slot, assign.value.right.slot) == (0, 0, 1)
+
+def test_duplicate_local_is_an_error():
+    with pytest.raises(ResolverError):
+        resolve("{ var a = 1; var a = 2; }")
+
+def test_local_in_own_initializer_is_an_error():
+    with pytest.raises(ResolverError):
+        resolve("var a = 1; { var a = a; }")
+
+def test_records_captured_locals():
+    function, = resolve("fun f(a, b) { var c; { var d; fun g() { print b + d; } } }")
+    assert (function.size, function.captured) == (3, frozenset({1}))
+    block = function.body[1]
+    assert (block.size, block.captured) == (2, frozenset({0}))
+    # g's own scope isn't captured by anything
+    assert block.statements[1].captured == frozenset()
+
+def test_return_at_top_level_is_an_error():
+    with pytest.raises(ResolverError):
+        resolve("return 1;")
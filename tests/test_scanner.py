@@ -0,0 +1,62 @@
+import pytest
+import pickle
+from pylox.engine.loxtoken import TokenType
+from pylox.engine.scanner import Scanner, FastScanner, BufferScanner, ScannerError
+from tests.test_engines import SAMPLES
+
+def scan(scanner: type[Scanner], source: str):
+    try:
+        return [(t.tokentype, t.lexeme, t.literal, t.line) for t in scanner(source).scan_tokens()]
+    except ScannerError as e:
+        return str(e), e.line
+
+TRICKY = [
+    "",
+    "  \t\r\n",
+    "print 1.5 + .5 * 3.;",
+    "// line comment\n/* block\ncomment */ var x;",
+    "/* unterminated",
+    '"unterminated',
+    '"multi\nline" x',
+    "a/b /**/ !=<=>===!",
+    "héllo é1 1é ١٢",
+    "x @ y",
+]
+
+@pytest.mark.parametrize("scanner", [FastScanner, BufferScanner])
+@pytest.mark.parametrize("source", TRICKY)
+def test_scanner_matches_classic_scanner(source, scanner):
+    assert scan(scanner, source) == scan(Scanner, source)
+
+@pytest.mark.parametrize("scanner", [FastScanner, BufferScanner])
+@pytest.mark.parametrize("path", sorted(SAMPLES.rglob("*.lox")), ids=str)
+def test_scanner_matches_classic_scanner_on_samples(path, scanner):
+    source = path.read_text(encoding="utf-8")
+    assert scan(scanner, source) == scan(Scanner, source)
+
+@pytest.mark.parametrize("scanner", [Scanner, FastScanner])
+@pytest.mark.parametrize("path", sorted(SAMPLES.rglob("*.lox")), ids=str)
+def test_streamed_tokens_match_scanned_tokens(path, scanner):
+    source = path.read_text(encoding="utf-8")
+    try:
+        expected = scanner(source).scan_tokens()
+    except ScannerError as e:
+        expected = e.line, e.message
+
+    try:
+        streamed = list(scanner(source).stream_tokens())
+    except ScannerError as e:
+        streamed = e.line, e.message
+    assert streamed == expected
+
+def test_token_buffer_materialises_tokens_lazily():
+    buffer = BufferScanner('var name = "text" + 1.5;').scan_tokens()
+    assert len(buffer) == 8
+    assert buffer.nbytes() == 8 * 4 * buffer.types.itemsize
+    assert buffer[1].lexeme is buffer[1].lexeme
+    assert buffer[3].literal == "text"
+    assert buffer.tokentype(-1) == TokenType.EOF
+
+def test_token_buffer_pickles():
+    buffer = BufferScanner("print 1 + 2;\nvar a;").scan_tokens()
+    assert list(pickle.loads(pickle.dumps(buffer))) == list(buffer)
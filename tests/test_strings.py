@@ -0,0 +1,95 @@
+import io
+import pytest
+import pylox
+from pylox.engine.lox import Lox, ENGINES, SCANNERS
+from pylox.engine.ropes import Rope, ROPE_MIN, concatenate
+
+@pytest.mark.parametrize("scanner", SCANNERS)
+def test_equal_literals_are_the_same_object(scanner):
+    first, second = [token.literal for token in SCANNERS[scanner]('"some" "some"').scan_tokens()][:2]
+    assert first == second == "some"
+    assert first is second
+
+def test_folded_strings_are_interned():
+    lox = Lox(optimise=True)
+    statements = lox.parse('print "so" + "me"; print "some";')
+    folded, literal = [statement.expression.value for statement in statements]
+    assert folded is literal
+
+CONCATENATION = """
+var a = "so";
+var b = a + "me";
+var c = a + "me";
+print b == c;
+print b != "some";
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("intern_strings", [False, True])
+def test_concatenation_results(engine, intern_strings, capsys):
+    lox = Lox(engine, intern_strings=intern_strings)
+    lox.run(CONCATENATION)
+    assert capsys.readouterr().out.splitlines() == ["true", "false"]
+    b, c = lox.interpreter.globals.values["b"], lox.interpreter.globals.values["c"]
+    assert (b is c) == intern_strings
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_nan_is_still_not_equal_to_itself(engine, capsys):
+    lox = Lox(engine)
+    lox.run("""
+        var inf = 10;
+        while (inf < inf * 10) inf = inf * inf;
+        var nan = inf - inf;
+        print nan == nan;
+        print nan != nan;
+    """)
+    assert capsys.readouterr().out.splitlines() == ["false", "true"]
+
+def test_ropes_are_strings():
+    rope = concatenate("a" * ROPE_MIN, "b")
+    assert isinstance(rope, Rope) and rope.text is None
+    assert len(rope) == ROPE_MIN + 1 and rope.text is None
+    text = "a" * ROPE_MIN + "b"
+    assert rope == text and text == rope and not (rope != text)
+    assert hash(rope) == hash(text)
+    assert f"'{rope}'" == f"'{text}'"
+    assert concatenate("a", "b") == "ab" and concatenate("a", "b").__class__ is str
+
+def test_ropes_branch_without_sharing_their_pieces():
+    base = concatenate("a" * ROPE_MIN, "b")
+    left = concatenate(base, "c")
+    right = concatenate(base, "d")
+    longer = concatenate(left, "e")
+    assert (str(base), str(left), str(right), str(longer)) == tuple("a" * ROPE_MIN + end for end in ["b", "bc", "bd", "bce"])
+
+ROPES = """
+var s = "ab";
+var i = 1;
+while (i <= 10) { s = s + s; i = i + 1; }
+var t = s + "x";
+var u = s + "y";
+print t == u;
+print t == s + "x";
+print "!" + t == "!" + s + "x";
+var short = "ab";
+print short + t == short + s + "x";
+print u;
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ropes_behave_like_strings(engine, capsys):
+    lox = Lox(engine)
+    lox.run(ROPES)
+    s = "ab" * 1024
+    assert capsys.readouterr().out.splitlines() == ["false", "true", "true", "true", f"'{s}y'"]
+    assert isinstance(lox.interpreter.globals.values["t"], Rope)
+
+def test_programs_return_plain_strings():
+    values = pylox.compile(ROPES).run(stdout=io.StringIO())
+    assert values["t"] == "ab" * 1024 + "x"
+    assert values["t"].__class__ is str
+
+def test_folded_literals_stay_plain():
+    lox = Lox(optimise=True)
+    statement, = lox.parse(f'print "{"a" * ROPE_MIN}" + "b";')
+    assert statement.expression.value.__class__ is str
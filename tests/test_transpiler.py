@@ -0,0 +1,55 @@
+from pathlib import Path
+import importlib.util
+import logging
+import pytest
+from pylox.engine.lox import Lox
+from pylox.engine.interpreter import LoxRuntimeError
+from pylox.engine.transpiler import Transpiler
+from tests.test_engines import SOURCES
+
+def load_module(path: Path):
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.mark.parametrize("path", SOURCES, ids=str)
+def test_transpiled_module_matches_tree_walker(path, tmp_path, capsys, caplog):
+    source = path.read_text(encoding="utf-8")
+    lox = Lox()
+    statements = lox.parse(source)
+    if statements is None:
+        pytest.skip("static error")
+    output = tmp_path / f"{path.stem}_lox.py"
+    output.write_text(Transpiler().transpile(statements), encoding="utf-8")
+
+    with caplog.at_level(logging.ERROR):
+        lox.run(source)
+    expected = capsys.readouterr().out, [record.getMessage() for record in caplog.records]
+
+    errors = []
+    try:
+        load_module(output).run()
+    except LoxRuntimeError as e:
+        errors.append(f"[line {e.line}] {e.message}")
+    assert (capsys.readouterr().out, errors) == expected
+
+LONG_EXPRESSIONS = {
+    "chain": "var x = 1; print " + " + ".join(["x"] * 300) + ";",
+    "nested": "var x = 1; print " + "x + (" * 40 + "x" + ")" * 40 + ";",
+    # Spilled operands are still evaluated left to right
+    "calls": "var n = 0; fun f(a) { n = n + 1; return n * 10 + a; } print " + " - ".join(f"f({i})" for i in range(70)) + "; print n;",
+    "assignment": "var a = 1; print a + (a = 2) + " + " + ".join(["a"] * 70) + ";",
+    "condition": "var i = 0; while (i + " + " + ".join(["1"] * 70) + " < 73) { print i; i = i + 1; }",
+    "local": "fun g(x) { var y = -x; return " + " * ".join(["(y + 3)"] * 40) + "; } print g(1); print g(-2);",
+}
+
+@pytest.mark.parametrize("source", LONG_EXPRESSIONS.values(), ids=LONG_EXPRESSIONS)
+def test_long_expressions(source, tmp_path, capsys):
+    lox = Lox()
+    lox.run(source)
+    expected = capsys.readouterr().out
+    output = tmp_path / "long_lox.py"
+    output.write_text(Transpiler().transpile(lox.parse(source)), encoding="utf-8")
+    load_module(output).run()
+    assert capsys.readouterr().out == expected
@@ -0,0 +1,96 @@
+import sys
+import pytest
+from pylox.engine.lox import Lox
+from pylox.engine.transpiler import Transpiler
+from pylox.engine import vectors
+from tests.test_transpiler import load_module
+
+ENGINES = ["tree", "closure", "vm"]
+
+def run(source: str, engine: str, capsys) -> tuple[list[str], Lox]:
+    lox = Lox(engine)
+    lox.run(source)
+    return capsys.readouterr().out.splitlines(), lox
+
+@pytest.fixture
+def numpy():
+    return pytest.importorskip("numpy")
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_arithmetic_broadcasts(engine, numpy, capsys):
+    out, lox = run("""
+        var v = arange(0, 5, 1);
+        print v * 2 + 1;
+        print 1 - v;
+        print v + v;
+        print -v / 2;
+    """, engine, capsys)
+    assert not lox.had_runtime_error
+    assert out == ["[1, 3, 5, 7, 9]", "[1, 0, -1, -2, -3]", "[0, 2, 4, 6, 8]", "[-0, -0.5, -1, -1.5, -2]"]
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_comparisons_give_masks(engine, numpy, capsys):
+    out, lox = run("""
+        var v = arange(0, 5, 1);
+        print v > 2;
+        print 2 < v;
+        print sum(v >= 2);
+        print select(v, v < 2);
+        print equal(v, 3);
+        print v == arange(0, 5, 1);
+        print v == 3;
+    """, engine, capsys)
+    assert not lox.had_runtime_error
+    assert out == ["[0, 0, 0, 1, 1]", "[0, 0, 0, 1, 1]", "3", "[0, 1]", "[0, 0, 0, 1, 0]", "true", "false"]
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_reductions_and_indexing(engine, numpy, capsys):
+    out, lox = run("""
+        var v = linspace(1, 4, 4);
+        print sum(v);
+        print min(v);
+        print max(v);
+        print dot(v, v);
+        print len(v);
+        print at(v, -1);
+        put(v, 0, 10);
+        print slice(v, 0, 2);
+        print vector(3, 0.5);
+    """, engine, capsys)
+    assert not lox.had_runtime_error
+    assert out == ["10", "1", "4", "30", "4", "4", "[10, 2]", "[0.5, 0.5, 0.5]"]
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("source, message", [
+    ("print arange(0, 3, 1) + arange(0, 2, 1);", "Vector lengths differ: 3 and 2."),
+    ("print vector(2, 1) / vector(2, 0);", "Division by Zero is undefined"),
+    ("print vector(2, 1) + \"a\";", "Operands must be two numbers or two strings"),
+    ("print vector(2, 1) * nil;", "Operands must be the numbers."),
+    ("print at(vector(2, 1), 2);", "Index 2 is out of range for a vector of length 2."),
+    ("print at(vector(2, 1), 0.5);", "Index must be a whole number."),
+    ("print sum(1);", "Argument must be a vector."),
+])
+def test_errors_report_the_line(engine, source, message, numpy, capsys, caplog):
+    out, lox = run(f"var a = 1;\n{source}", engine, capsys)
+    assert lox.had_runtime_error
+    assert f"[line 2] {message}" in caplog.text
+
+def test_transpiled_module_broadcasts(numpy, tmp_path, capsys):
+    source = "var v = arange(0, 4, 1); print v * v - 1; print -v; print sum(v < 2);"
+    lox = Lox()
+    output = tmp_path / "vectors_lox.py"
+    output.write_text(Transpiler().transpile(lox.parse(source)), encoding="utf-8")
+    load_module(output).run()
+    assert capsys.readouterr().out.splitlines() == ["[-1, 0, 3, 8]", "[-0, -1, -2, -3]", "2"]
+
+def test_long_vectors_are_elided(numpy, capsys):
+    out, _ = run("print arange(0, 100, 1);", "tree", capsys)
+    assert out == ["[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ..., 90, 91, 92, 93, 94, 95, 96, 97, 98, 99]"]
+
+def test_without_numpy(monkeypatch, capsys, caplog):
+    # A None entry in sys.modules makes the import fail
+    monkeypatch.setattr(vectors, "np", None)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    _, lox = run("print vector(3, 1);", "tree", capsys)
+    assert lox.had_runtime_error
+    assert "Vectors need NumPy" in caplog.text